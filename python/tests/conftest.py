@@ -0,0 +1,60 @@
+"""测试共用的小规模模拟：固定种子、少量修士与年份，整套测试数秒内完成"""
+import os
+import sys
+from typing import Dict
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xiuxian import CultivationWorld, SimulationConfig, create_world  # noqa: E402
+
+@pytest.fixture
+def make_config():
+    """返回创建小规模配置的函数（关键字参数覆盖配置的同名属性）"""
+    def make(seed: int = 11, years: int = 60, intake: int = 120, absorption_rate: float = 0.5,
+             **attributes) -> SimulationConfig:
+        # 较高的吸取比率使少量修士在数十年内晋升到多个等级，覆盖各等级的相遇
+        config = SimulationConfig(years, absorption_rate, seed)
+        config.new_cultivators_per_year = intake
+        for name, value in attributes.items():
+            if not hasattr(config, name):
+                raise AttributeError(name)
+            setattr(config, name, value)
+        return config
+    return make
+
+def summarize(world: CultivationWorld) -> Dict:
+    """用于比较的模拟结果：逐年统计、年份、下一个修士编号、最强修士与杀戮之王"""
+    strongest = world.get_strongest()
+    top_killer = world.get_top_killer()
+    return {
+        'statistics': world.statistics,
+        'year': world.year,
+        'next_id': world.next_id,
+        'strongest': (strongest.id, strongest.cultivation_points) if strongest is not None else None,
+        'top_killer': (top_killer.id, top_killer.defeats_count) if top_killer is not None else None,
+    }
+
+@pytest.fixture
+def simulate():
+    """返回完整运行一次模拟并返回模拟世界的函数（可传入已开始的世界，从当前年份继续）"""
+    def simulate(config: SimulationConfig, engine: str = 'object', world: CultivationWorld = None) -> CultivationWorld:
+        if world is None:
+            world = create_world(config, engine)
+            world.add_new_cultivators()
+        while not world.is_finished():
+            world.simulate_year()
+        return world
+    return simulate
+
+@pytest.fixture
+def run(simulate):
+    """返回完整运行一次模拟并给出summarize结果的函数（运行结束后释放引擎资源）"""
+    def run(config: SimulationConfig, engine: str = 'object', world: CultivationWorld = None) -> Dict:
+        world = simulate(config, engine, world)
+        try:
+            return summarize(world)
+        finally:
+            world.close()
+    return run
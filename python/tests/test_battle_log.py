@@ -0,0 +1,109 @@
+"""战斗日志：记录数与逐年统计的战斗次数一致，各引擎的日志逐条相同，开启日志不改变结果；查询与检查点"""
+import os
+
+import numpy as np
+import pytest
+
+from xiuxian import BattleLog, CultivationWorld, create_world
+
+def logged_run(make_config, run, path: str, engine: str, **attributes):
+    """开启战斗日志（小缓冲区，多次写出到文件）完整运行，返回(summarize结果, 全部战斗记录)"""
+    world = create_world(make_config(**attributes), engine)
+    world.enable_battle_log(path, capacity=64)
+    world.add_new_cultivators()
+    result = run(make_config(**attributes), world=world)
+    return result, BattleLog.open(path).events()
+
+@pytest.mark.parametrize('engine', ['object', 'vectorized', 'event', 'memmap'])
+def test_log_matches_battle_statistics(make_config, run, tmp_path, engine):
+    result, events = logged_run(make_config, run, str(tmp_path / f'{engine}.bin'), engine)
+    battles = result['statistics']['battles']
+    assert len(events) == sum(battles) > 0
+    assert np.bincount(events['year'], minlength=len(battles) + 1)[1:].tolist() == battles
+    assert result == run(make_config(), engine)
+
+@pytest.mark.parametrize('engine', ['vectorized', 'event', 'memmap'])
+@pytest.mark.parametrize('use_jit', [True, False])
+def test_logs_are_identical_across_engines(make_config, run, tmp_path, engine, use_jit):
+    _, reference = logged_run(make_config, run, str(tmp_path / 'object.bin'), 'object')
+    _, events = logged_run(make_config, run, str(tmp_path / f'{engine}.bin'), engine, use_jit=use_jit)
+    assert np.array_equal(events, reference)
+
+def test_batched_log_matches_battle_statistics(make_config, run, tmp_path):
+    result, events = logged_run(make_config, run, str(tmp_path / 'batched.bin'), 'vectorized',
+                                encounter_mode='batched')
+    assert len(events) == sum(result['statistics']['battles']) > 0
+
+def test_memory_log_matches_file_log(make_config, run, simulate, tmp_path):
+    _, reference = logged_run(make_config, run, str(tmp_path / 'file.bin'), 'vectorized')
+    world = create_world(make_config(), 'vectorized')
+    log = world.enable_battle_log(capacity=64)
+    world.add_new_cultivators()
+    simulate(make_config(), world=world)
+    world.close()
+    assert np.array_equal(log.events(), reference)
+    # 未指定文件时写满的缓冲区写入临时文件，内存中只保留缓冲区；关闭世界后仍可查询
+    assert log.path is None and log.spilled == os.fstat(log._file.fileno()).st_size // BattleLog.DTYPE.itemsize
+    assert log.spilled > 10 * log.capacity and log.buffer.nbytes == log.capacity * BattleLog.DTYPE.itemsize
+
+def test_queries(make_config, simulate):
+    world = create_world(make_config(), 'vectorized')
+    log = world.enable_battle_log(capacity=64)
+    world.add_new_cultivators()
+    simulate(make_config(), world=world)
+    events = log.events()
+    winners, losers = BattleLog.winners(events), BattleLog.losers(events)
+
+    # 击杀最多的修士：击杀记录即其作为胜者的全部记录
+    killer = np.bincount(winners).argmax()
+    kills = log.kill_history(killer)
+    assert len(kills) == np.count_nonzero(winners == killer) > 0
+    assert np.all(np.diff(kills['year']) >= 0)
+    # 每名败者恰好战死一次
+    victim = int(kills['opponent'][0] if kills['flags'][0] & BattleLog.INITIATOR_WINS else kills['initiator'][0])
+    assert log.death_record(victim) is not None
+    assert BattleLog.losers(log.death_record(victim)[None])[0] == victim
+    assert len(np.unique(losers)) == len(losers)
+
+    chain = log.kill_chain(killer)
+    assert np.array_equal(chain[0], kills)
+    for previous, layer in zip(chain, chain[1:]):
+        assert set(BattleLog.winners(layer).tolist()) <= set(BattleLog.losers(previous).tolist())
+
+    years = [year for year, _ in log.replay()]
+    assert years == sorted(set(events['year'].tolist()))
+    assert sum(len(part) for _, part in log.replay(10, 20)) == np.count_nonzero(
+        (events['year'] >= 10) & (events['year'] <= 20))
+
+    summary = log.summary()
+    assert summary['records'] == len(events)
+    assert sum(summary['battles_by_level'].values()) == len(events)
+    assert sum(summary['absorbed_by_level'].values()) == int(events['absorbed'].sum())
+    assert summary['initiator_only'] + summary['opponent_only'] + summary['both_willing'] == len(events)
+    # 被吸收的修为全部计入流动矩阵
+    assert world.get_cultivation_flow().sum() == int(events['absorbed'].sum())
+
+@pytest.mark.parametrize('path', [None, 'log.bin'])
+def test_resume_truncates_log(make_config, run, simulate, tmp_path, path):
+    _, reference = logged_run(make_config, run, str(tmp_path / 'reference.bin'), 'vectorized')
+    world = create_world(make_config(), 'vectorized')
+    world.enable_battle_log(path and str(tmp_path / path), capacity=64)
+    world.add_new_cultivators()
+    for _ in range(25):
+        world.simulate_year()
+    checkpoint = str(tmp_path / 'world.npz')
+    world.save_checkpoint(checkpoint)
+    # 检查点之后多记录的战斗在继续时被截去
+    for _ in range(5):
+        world.simulate_year()
+    world.close()
+
+    resumed = simulate(make_config(), world=CultivationWorld.load_checkpoint(checkpoint))
+    assert np.array_equal(resumed.battle_log.events(), reference)
+    resumed.close()
+
+def test_mean_field_refuses_log(make_config):
+    with pytest.raises(ValueError):
+        create_world(make_config(), 'meanfield').enable_battle_log()
+    with pytest.raises(ValueError):
+        BattleLog(capacity=0)
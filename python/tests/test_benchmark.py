@@ -0,0 +1,46 @@
+"""基准测试：用例在子进程中运行并给出各项指标，与基线比较时标记性能回退；峰值内存的平台差异"""
+import os
+import subprocess
+import sys
+import types
+
+from xiuxian import BenchmarkSuite, benchmark
+
+def test_tiny_suite_reports_metrics():
+    suite = BenchmarkSuite(engines=['vectorized'], populations=[50], years=[5], intakes=[20], repeat=1,
+                           plot=False)
+    result = suite.run()
+    case, = result['cases']
+    assert {key: case[key] for key in BenchmarkSuite.CASE_KEYS} == \
+        {'engine': 'vectorized', 'population': 50, 'years': 5, 'intake': 20}
+    assert case['final_population'] > 0
+    assert case['years_per_sec'] > 0 and case['cultivators_per_sec'] > 0
+    assert case['plot_statistics_s'] is None
+    assert case['peak_rss_mb'] > 0
+
+def test_compare_flags_regressions():
+    case = {'engine': 'object', 'population': 1000, 'years': 50, 'intake': 1000}
+    baseline = {'cases': [dict(case, years_per_sec=100.0, simulate_year_s=2.0, plot_statistics_s=None),
+                          dict(case, population=10000, years_per_sec=10.0)]}
+    current = {'cases': [dict(case, years_per_sec=80.0, simulate_year_s=2.1, plot_statistics_s=0.5)]}
+    changes = {change['metric']: change for change in BenchmarkSuite.compare(baseline, current)}
+    # 基线中没有数值的指标与当前结果中没有的用例不参与比较
+    assert sorted(changes) == ['simulate_year_s', 'years_per_sec']
+    assert changes['years_per_sec']['regression'] and changes['years_per_sec']['change'] == -0.2
+    assert not changes['simulate_year_s']['regression']
+    assert BenchmarkSuite.compare(baseline, current, threshold=0.01)[1]['regression']
+
+def test_peak_rss_units_follow_platform(monkeypatch):
+    usage = types.SimpleNamespace(ru_maxrss=2 * 1024 * 1024)
+    fake = types.SimpleNamespace(RUSAGE_SELF=0, getrusage=lambda who: usage)
+    monkeypatch.setitem(sys.modules, 'resource', fake)
+    monkeypatch.setattr(sys, 'platform', 'linux')
+    assert benchmark._peak_rss_mb() == 2048  # KB
+    monkeypatch.setattr(sys, 'platform', 'darwin')
+    assert benchmark._peak_rss_mb() == 2  # 字节
+
+def test_import_without_resource():
+    # 没有resource模块的平台（Windows）仍能导入模拟器，峰值内存未知
+    code = ("import sys; sys.modules['resource'] = None; import xiuxian; "
+            "assert xiuxian.benchmark._peak_rss_mb() is None")
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
@@ -0,0 +1,40 @@
+"""从检查点继续模拟的结果与不中断运行完全相同"""
+import numpy as np
+import pytest
+
+from xiuxian import CultivationWorld, create_world
+
+@pytest.mark.parametrize('engine', ['object', 'vectorized', 'event', 'memmap'])
+def test_resume_is_exact(make_config, run, simulate, tmp_path, engine):
+    reference = simulate(make_config(), engine)
+
+    world = create_world(make_config(), engine)
+    world.add_new_cultivators()
+    for _ in range(25):
+        world.simulate_year()
+    path = str(tmp_path / 'world.npz')
+    world.save_checkpoint(path)
+    # 保存后原世界继续模拟，不影响检查点
+    assert run(make_config(), world=world) == run(make_config(), engine)
+
+    resumed = CultivationWorld.load_checkpoint(path)
+    assert resumed.engine_name == engine
+    assert resumed.year == 25
+    resumed = simulate(make_config(), world=resumed)
+    assert resumed.statistics == reference.statistics
+    assert resumed.get_status_report() == reference.get_status_report()
+    records, expected = resumed.graveyard.get_records(), reference.graveyard.get_records()
+    assert all(np.array_equal(records[field], expected[field]) for field in expected)
+
+@pytest.mark.parametrize('saved, resumed', [('object', 'event'), ('event', 'vectorized')])
+def test_resume_with_another_engine(make_config, run, tmp_path, saved, resumed):
+    reference = run(make_config(), 'object')
+    world = create_world(make_config(), saved)
+    world.add_new_cultivators()
+    for _ in range(25):
+        world.simulate_year()
+    path = str(tmp_path / 'world.npz')
+    world.save_checkpoint(path)
+    world = CultivationWorld.load_checkpoint(path, resumed)
+    assert world.engine_name == resumed
+    assert run(make_config(), world=world) == reference
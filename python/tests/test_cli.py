@@ -0,0 +1,43 @@
+"""命令行与绘图：作为库导入时不加载matplotlib，图表可直接保存为文件"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def simulator(*args: str) -> subprocess.CompletedProcess:
+    """以子进程运行命令行入口"""
+    return subprocess.run([sys.executable, 'cultivation_simulator.py', *args], cwd=PYTHON_DIR,
+                          capture_output=True, text=True, timeout=120)
+
+def test_import_does_not_load_matplotlib():
+    code = "import sys, cultivation_simulator, xiuxian; assert 'matplotlib' not in sys.modules"
+    result = subprocess.run([sys.executable, '-c', code], cwd=PYTHON_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+def test_plot_out_writes_image(tmp_path):
+    path = tmp_path / 'statistics.png'
+    result = simulator('--years', '8', '--intake', '30', '--seed', '1', '--no-progress', '--plot-out', str(path))
+    assert result.returncode == 0, result.stderr
+    assert path.read_bytes().startswith(b'\x89PNG')
+
+def test_no_plot_and_plot_out_are_exclusive(tmp_path):
+    result = simulator('--no-plot', '--plot-out', str(tmp_path / 'statistics.png'))
+    assert result.returncode == 2
+    assert not (tmp_path / 'statistics.png').exists()
+
+def test_graveyard_capacity_must_be_non_negative():
+    result = simulator('--graveyard-capacity', '-1', '--no-plot')
+    assert result.returncode == 2 and '不能为负数' in result.stderr
+    result = simulator('--graveyard-capacity', 'many', '--no-plot')
+    assert result.returncode == 2 and '不是整数' in result.stderr
+
+# 测试环境可能缺少中文字体
+@pytest.mark.filterwarnings('ignore:Glyph')
+def test_plot_statistics_saves_without_pyplot(make_config, simulate, tmp_path):
+    world = simulate(make_config(years=10))
+    world.plot_statistics(str(tmp_path / 'statistics.png'))
+    assert (tmp_path / 'statistics.png').stat().st_size > 0
+    assert 'matplotlib.pyplot' not in sys.modules
@@ -0,0 +1,82 @@
+"""随机数提供者的可复现性与子随机流、整批抽取的修士属性分布，以及修士的等级表"""
+import numpy as np
+import pytest
+
+from xiuxian import CultivationLevel, Cultivator, RandomStreams, SimulationConfig, create_world
+
+def test_random_streams_are_reproducible():
+    assert np.array_equal(RandomStreams(42).generator.random(8), RandomStreams(42).generator.random(8))
+    assert not np.array_equal(RandomStreams(42).generator.random(8), RandomStreams(43).generator.random(8))
+    assert RandomStreams(42).entropy == 42
+
+def test_unseeded_streams_record_their_entropy():
+    streams = RandomStreams()
+    draws = streams.generator.random(4)
+    assert np.array_equal(RandomStreams(streams.entropy).generator.random(4), draws)
+
+def test_spawned_streams_are_reproducible_and_distinct():
+    children = [child.generator.random(6) for child in RandomStreams(9).spawn(3)]
+    again = [child.generator.random(6) for child in RandomStreams(9).spawn(3)]
+    assert all(np.array_equal(a, b) for a, b in zip(children, again))
+    assert not np.array_equal(children[0], children[1]) and not np.array_equal(children[1], children[2])
+    # 子随机流与父随机流本身的输出无关
+    assert not any(np.array_equal(child, RandomStreams(9).generator.random(6)) for child in children)
+
+def test_fresh_seed_sequence_restarts_spawning():
+    streams = RandomStreams(9)
+    first = streams.fresh_seed_sequence().spawn(2)
+    streams.seed_sequence.spawn(5)  # 直接从根种子派生会推进派生计数
+    again = streams.fresh_seed_sequence().spawn(2)
+    assert [child.spawn_key for child in again] == [child.spawn_key for child in first]
+    assert [child.entropy for child in again] == [9, 9]
+
+def test_explicit_stream_matches_config_seed(make_config, run):
+    world = create_world(make_config(4), 'object', RandomStreams(4))
+    world.add_new_cultivators()
+    assert run(make_config(4), world=world) == run(make_config(4))
+
+def test_draw_cohort_ranges_and_moments():
+    ages, courages = SimulationConfig().draw_cohort(20000, np.random.default_rng(1))
+    assert ages.dtype == np.int64 and len(ages) == len(courages) == 20000
+    assert ages.min() == 6 and ages.max() == 10
+    assert 0 <= courages.min() and courages.max() <= 1
+    assert abs(ages.mean() - 8) < 0.05
+    assert abs(courages.mean() - 0.5) < 0.01
+    assert abs(courages.std() - 0.15) < 0.01
+
+def test_draw_cohort_is_reproducible():
+    first = SimulationConfig().draw_cohort(100, np.random.default_rng(7))
+    second = SimulationConfig().draw_cohort(100, np.random.default_rng(7))
+    assert all(np.array_equal(a, b) for a, b in zip(first, second))
+
+def test_cultivator_uses_slots(make_config):
+    cultivator = Cultivator(1, make_config(), age=16, courage=0.5)
+    assert not hasattr(cultivator, '__dict__')
+    with pytest.raises(AttributeError):
+        cultivator.nickname = '韩立'
+    # 修士不引用配置与所属世界，吸取比率由世界传入
+    assert not {'config', 'aggregates'} & set(Cultivator.__slots__)
+    loser = Cultivator(2, make_config(), age=16, courage=0.5)
+    loser.cultivation_points = 101
+    assert cultivator.absorb_cultivation(loser, 0.3) == 30
+    assert cultivator.cultivation_points == 30 and cultivator.defeats_count == cultivator.battles_count == 1
+
+def test_level_tables_follow_level_configs():
+    configs = list(Cultivator.LEVEL_CONFIGS.values())
+    assert Cultivator.LEVELS == tuple(CultivationLevel)
+    assert Cultivator.ADVANCE_THRESHOLDS[:-1] == tuple(c.required_cultivation for c in configs[1:])
+    assert Cultivator.LIFESPAN_BONUSES == tuple(c.lifespan_bonus for c in configs)
+
+def test_advance_uses_level_tables(make_config):
+    cultivator = Cultivator(1, make_config(), age=16, courage=0.5)
+    cultivator.level = CultivationLevel.ZHUJI
+    cultivator.cultivation_points = 999
+    assert not cultivator.advance_level()
+    cultivator.cultivation_points = 1000
+    assert cultivator.advance_level()
+    assert cultivator.level == CultivationLevel.JIEDAN and cultivator.level_index == 2
+    assert cultivator.max_lifespan == 100 + 800
+    # 最高等级不可晋升
+    cultivator.level = CultivationLevel.DACHENG
+    cultivator.cultivation_points = 10 ** 12
+    assert not cultivator.can_advance() and not cultivator.advance_level()
@@ -0,0 +1,82 @@
+"""相遇结算：同级存活成员索引（含有序索引）的抽取与交换删除，以及整批结算的战斗规则"""
+import numpy as np
+
+from xiuxian import BattleLog, LiveMemberIndex, SortedLiveMemberIndex, resolve_encounters_batched
+
+def assert_consistent(index: LiveMemberIndex):
+    assert len(index.positions) == len(index)
+    for member, position in index.positions.items():
+        assert index.members[position] == member
+
+def test_sample_other_never_returns_caller():
+    index = LiveMemberIndex(range(5))
+    for member in range(5):
+        drawn = [index.sample_other(member, u) for u in np.linspace(0, 1, 40, endpoint=False)]
+        assert member not in drawn
+        assert sorted(set(drawn)) == sorted(set(range(5)) - {member})
+
+def test_sample_other_is_uniform():
+    index = LiveMemberIndex(['a', 'b', 'c', 'd'])
+    counts = {}
+    for u in np.linspace(0, 1, 300, endpoint=False):
+        opponent = index.sample_other('b', u)
+        counts[opponent] = counts.get(opponent, 0) + 1
+    assert counts == {'a': 100, 'c': 100, 'd': 100}
+
+def test_remove_swaps_last_member_in():
+    index = LiveMemberIndex(range(6))
+    index.remove(1)
+    assert index.members == [0, 5, 2, 3, 4]
+    index.remove(4)
+    index.remove(0)
+    assert sorted(index.members) == [2, 3, 5]
+    assert_consistent(index)
+    for u in np.linspace(0, 1, 10, endpoint=False):
+        assert index.sample_other(3, u) in (2, 5)
+
+def test_sorted_index_matches_live_index():
+    rng = np.random.default_rng(2)
+    members = sorted(rng.choice(1000, 60, replace=False).tolist())
+    index, sorted_index = LiveMemberIndex(members), SortedLiveMemberIndex(members)
+    alive = list(members)
+    while len(alive) > 1:
+        member = alive[int(rng.integers(len(alive)))]
+        u = rng.random()
+        opponent = index.sample_other(member, u)
+        assert sorted_index.sample_other(member, u) == opponent
+        index.remove(opponent)
+        sorted_index.remove(opponent)
+        alive.remove(opponent)
+        assert sorted_index.members == index.members
+
+def test_batched_resolution_fights_at_most_once():
+    rng = np.random.default_rng(4)
+    points = rng.integers(10, 1000, 200)
+    courages = rng.random(200)
+    winners, losers, absorbed, events = resolve_encounters_batched(points, courages, 0.5, rng.random((200, 3)), 0.1)
+    assert len(winners) > 0
+    assert events.shape == (len(winners), BattleLog.EVENT_COLUMNS)
+    fighters = np.concatenate([winners, losers])
+    assert len(np.unique(fighters)) == len(fighters)
+    assert np.array_equal(absorbed, (points[losers] * 0.1).astype(np.int64))
+
+def test_batched_resolution_follows_the_draws():
+    points = np.array([300, 100, 100])
+    courages = np.array([0.9, 0.0, 0.0])
+    # 只有0号修士相遇并选中1号（除自己外的第一个），胜率0.75，战斗随机数0.5时获胜
+    draws = np.array([[0.0, 0.0, 0.5], [0.9, 0.0, 0.0], [0.9, 0.0, 0.0]])
+    winners, losers, absorbed, events = resolve_encounters_batched(points, courages, 0.1, draws, 0.5)
+    assert winners.tolist() == [0] and losers.tolist() == [1] and absorbed.tolist() == [50]
+    # 发起者、对手、双方修为、双方意愿、发起者获胜、吸收修为
+    assert events.tolist() == [[0, 1, 300, 100, 1, 0, 1, 50]]
+    draws[0, 2] = 0.8
+    winners, losers, absorbed, _ = resolve_encounters_batched(points, courages, 0.1, draws, 0.5)
+    assert winners.tolist() == [1] and losers.tolist() == [0] and absorbed.tolist() == [150]
+
+def test_batched_opponent_uses_its_own_defeat_rate():
+    # 对手的勇气值恰为1 - 71980/71983（Cultivator.will_fight的败率），在浮点下大于发起者的胜率3/71983
+    points = np.array([3, 71980])
+    courages = np.array([0.0, 1 - 71980 / 71983])
+    draws = np.array([[0.0, 0.0, 0.0], [0.9, 0.0, 0.0]])
+    winners, _, _, events = resolve_encounters_batched(points, courages, 0.5, draws, 0.5)
+    assert len(winners) == 0 and len(events) == 0
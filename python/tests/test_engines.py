@@ -0,0 +1,138 @@
+"""各引擎在相同种子下的结果与对象引擎逐位相同"""
+import os
+
+import numpy as np
+import pytest
+
+from xiuxian import (CultivationLevel, MemmapPopulation, ParameterSweep, SimulationConfig, create_world, jit_available,
+                     kernels)
+from xiuxian.engines import memmap, vectorized
+
+@pytest.mark.parametrize('engine', ['vectorized', 'event', 'memmap'])
+@pytest.mark.parametrize('seed', [3, 11])
+def test_engine_matches_object(make_config, run, engine, seed):
+    reference = run(make_config(seed), 'object')
+    assert sum(reference['statistics']['battles']) > 0
+    assert run(make_config(seed), engine) == reference
+
+def test_runs_are_reproducible(make_config, run):
+    assert run(make_config(5), 'object') == run(make_config(5), 'object')
+
+def test_seeds_change_the_run(make_config, run):
+    assert run(make_config(5), 'object') != run(make_config(6), 'object')
+
+def test_unknown_engine_is_rejected(make_config):
+    with pytest.raises(ValueError):
+        create_world(make_config(), 'gpu')
+
+def test_memmap_with_small_memory_budget(make_config, run, tmp_path):
+    reference = run(make_config(intake=400), 'object')
+    # 分块行数与每批结算的修士数都取下限，整个运行分为多个分块与批次
+    world = create_world(make_config(intake=400, memory_budget=1 << 16, storage_dir=str(tmp_path)), 'memmap')
+    assert world.chunk_rows == 1024 and world.encounter_batch == 16
+    assert os.listdir(tmp_path)  # 列文件位于指定目录
+    world.add_new_cultivators()
+    assert run(make_config(intake=400), world=world) == reference
+
+def test_memmap_columns_are_compact(make_config):
+    assert MemmapPopulation.ROW_BYTES == 42
+    # 外存引擎只支持逐个结算相遇
+    with pytest.raises(ValueError):
+        create_world(make_config(encounter_mode='batched'), 'memmap')
+
+def test_mean_field_is_deterministic(make_config, run, tmp_path):
+    reference = run(make_config(), 'meanfield')
+    assert sum(reference['statistics']['battles']) > 0
+    # 均场引擎不使用随机数，种子不影响结果
+    assert run(make_config(seed=12), 'meanfield') == reference
+    world = create_world(make_config(), 'meanfield')
+    with pytest.raises(ValueError):
+        world.save_checkpoint(str(tmp_path / 'world.npz'))
+    with pytest.raises(ValueError):
+        create_world(make_config(encounter_mode='batched'), 'meanfield')
+
+@pytest.mark.parametrize('engine', ['vectorized', 'event'])
+def test_batched_encounters_match_object(make_config, run, engine):
+    reference = run(make_config(encounter_mode='batched'), 'object')
+    assert sum(reference['statistics']['battles']) > 0
+    assert reference != run(make_config(), 'object')
+    assert run(make_config(encounter_mode='batched'), engine) == reference
+
+@pytest.mark.parametrize('engine', ['object', 'vectorized'])
+def test_intake_cohort(make_config, engine):
+    world = create_world(make_config(intake=50), engine)
+    world.add_new_cultivators()
+    world.add_new_cultivators(30)
+    assert world.next_id == 81
+    cohort = [world.get_cultivator(i) for i in range(80)] if engine == 'vectorized' else world.cultivators
+    assert [c.id for c in cohort] == list(range(1, 81))
+    # 筑基成功年龄 = 开始修炼年龄（6-10岁） + 10年
+    assert all(16 <= c.age <= 20 and 0 <= c.courage <= 1 for c in cohort)
+    assert all(c.level == CultivationLevel.ZHUJI and c.cultivation_points == 10 for c in cohort)
+
+@pytest.mark.parametrize('engine', ['vectorized', 'memmap'])
+def test_jit_kernels_match_pure_python(make_config, run, engine):
+    world = create_world(make_config(), engine)
+    assert world.use_jit == jit_available()
+    reference = create_world(make_config(use_jit=False), engine)
+    assert not reference.use_jit
+    world.add_new_cultivators()
+    reference.add_new_cultivators()
+    assert run(make_config(), world=world) == run(make_config(), world=reference)
+
+# 各引擎逐个结算的修炼与相遇使用的内核
+ENGINE_KERNELS = {'vectorized': ['cultivate_kernel', 'encounter_kernel'],
+                  'memmap': ['cultivate_kernel', 'encounter_range_kernel']}
+
+@pytest.mark.parametrize('engine', sorted(ENGINE_KERNELS))
+@pytest.mark.parametrize('use_jit', [True, False])
+def test_use_jit_selects_the_kernels(make_config, run, monkeypatch, engine, use_jit):
+    calls = []
+    for name in ENGINE_KERNELS[engine]:
+        def counted(*args, kernel=getattr(kernels, name), name=name):
+            calls.append(name)
+            return kernel(*args)
+        monkeypatch.setattr(kernels, name, counted)
+    # 未安装numba时内核是普通Python函数，同样可以调用
+    monkeypatch.setattr(vectorized, 'jit_available', lambda: True)
+    monkeypatch.setattr(memmap, 'jit_available', lambda: True)
+    world = create_world(make_config(years=5, use_jit=use_jit), engine)
+    assert world.use_jit == use_jit
+    world.add_new_cultivators()
+    result = run(make_config(years=5), world=world)
+    assert sum(result['statistics']['battles']) > 0
+    # 两条路径确实不同：只有use_jit时调用内核，且结果与对象引擎相同
+    assert sorted(set(calls)) == (ENGINE_KERNELS[engine] if use_jit else [])
+    assert result == run(make_config(years=5), 'object')
+
+@pytest.mark.parametrize('engine', ['object', 'vectorized', 'event', 'memmap'])
+@pytest.mark.parametrize('use_jit', [True, False])
+def test_fight_decision_matches_will_fight(make_config, monkeypatch, engine, use_jit):
+    monkeypatch.setattr(vectorized, 'jit_available', lambda: True)
+    monkeypatch.setattr(memmap, 'jit_available', lambda: True)
+    # 修炼一年后同为化神期、修为3对71980：对手的勇气值恰为1 - 71980/71983（也能以memmap引擎的float32
+    # 精确保存），在浮点下大于3/71983
+    courage = 1 - 71980 / 71983
+    assert 3 / 71983 < courage == np.float32(courage)
+    pair = np.array([1, 1])
+    world = create_world(make_config(intake=0, use_jit=use_jit), engine)
+    world.import_population({'id': np.array([1, 2]), 'age': 20 * pair, 'cultivation_points': np.array([2, 71979]),
+                             'level': 4 * pair, 'courage': np.array([0.0, courage]), 'max_lifespan': 100 * pair,
+                             'defeats': 0 * pair, 'battles': 0 * pair, 'birth_year': pair})
+    world.simulate_year()
+    # 与对象引擎的will_fight相同：对手的败率按1 - 对手修为/总修为计算，双方都不愿战斗
+    assert world.statistics['battles'] == [0]
+    world.close()
+
+def test_execution_options_reach_workers(make_config, tmp_path):
+    config = make_config(use_jit=False, storage_dir=str(tmp_path), memory_budget=1 << 20)
+    # 执行选项随模拟参数一起传给工作进程，但不属于模拟参数
+    options = config.get_options()
+    assert options == {'use_jit': False, 'storage_dir': str(tmp_path), 'memory_budget': 1 << 20}
+    assert not set(options) & set(config.get_params())
+    restored = SimulationConfig.from_params(config.get_params(), options=options)
+    assert restored.get_options() == options
+    tasks = ParameterSweep(config, {'absorption_rate': [0.3, 0.5]}).tasks()
+    assert [task['options'] for task in tasks] == [config.get_options()] * 2
+    with pytest.raises(ValueError):
+        SimulationConfig.from_params({}, options={'threads': 4})
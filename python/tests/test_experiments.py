@@ -0,0 +1,177 @@
+"""参数扫描与集合模拟：多进程结果与逐个顺序运行完全相同，与进程数无关；运行缓存的命中与淘汰；均场引擎校验"""
+import os
+
+import numpy as np
+import pytest
+
+from xiuxian import (EXACT_ENGINES, CultivationWorld, MonteCarloEnsemble, ParameterSweep, RunCache, SimulationConfig,
+                     WelfordAccumulator, cached_run, flatten_statistics, run_headless, validate_mean_field)
+
+def test_parse_grid_uses_config_types(make_config):
+    grid = ParameterSweep.parse_grid(['absorption_rate=0.1,0.2', 'simulation-years=10,20'], make_config())
+    assert grid == {'absorption_rate': [0.1, 0.2], 'simulation_years': [10, 20]}
+    with pytest.raises(ValueError):
+        ParameterSweep.parse_grid(['gravity=1'], make_config())
+
+def test_sweep_matches_sequential_runs(make_config):
+    base = make_config(years=20, intake=60)
+    sweep = ParameterSweep(base, {'absorption_rate': [0.3, 0.5]}, replicas=2, engine='vectorized', workers=2)
+    results = sweep.run()
+    assert sweep.failures == []
+    expected = []
+    # 重新派生同一组子随机流，逐个运行
+    for task in ParameterSweep(make_config(years=20, intake=60), sweep.grid, replicas=2).tasks():
+        world = run_headless(SimulationConfig.from_params(task['params'], seed=task['seed_sequence']), 'vectorized')
+        for row in flatten_statistics(world.statistics):
+            expected.append(dict(task['params'], replica=task['replica'], stream=task['stream'], seed=11,
+                                 equilibrium_year=world.equilibrium_year, **row))
+    assert len(results) == 4 * 20
+    assert results == expected
+    # 不同副本使用不同的随机流
+    assert [row for row in results if row['stream'] == 0] != [row for row in results if row['stream'] == 1]
+
+def test_welford_matches_numpy():
+    samples = np.random.default_rng(3).normal(5, 2, size=(30, 4, 2))
+    accumulator = WelfordAccumulator((4, 2))
+    assert np.all(np.isinf(accumulator.variance()))
+    for sample in samples:
+        accumulator.add(sample)
+    assert accumulator.count == 30
+    assert np.allclose(accumulator.mean, samples.mean(axis=0))
+    assert np.allclose(accumulator.variance(), samples.var(axis=0, ddof=1))
+    assert np.allclose(accumulator.half_width(0.95), 1.959964 * samples.std(axis=0, ddof=1) / np.sqrt(30))
+
+def test_welford_skips_missing_values():
+    samples = np.random.default_rng(3).normal(5, 2, size=(6, 3))
+    samples[::2, 0] = np.nan  # 稀疏采样未统计的年份
+    samples[1:, 2] = np.nan
+    accumulator = WelfordAccumulator((3,))
+    for sample in samples:
+        accumulator.add(sample)
+    assert accumulator.count == 6 and accumulator.counts.tolist() == [3, 6, 1]
+    assert np.allclose(accumulator.mean, np.nanmean(samples, axis=0))
+    assert np.allclose(accumulator.variance()[:2], np.nanvar(samples[:, :2], axis=0, ddof=1))
+    assert np.isinf(accumulator.variance()[2])
+
+def ensemble(make_config, workers: int, **options) -> MonteCarloEnsemble:
+    return MonteCarloEnsemble(make_config(years=10, intake=30), 'vectorized', workers=workers, **options).run()
+
+def test_ensemble_does_not_depend_on_workers(make_config):
+    single = ensemble(make_config, 1, rel_width=1e-6, abs_width=1e-6, min_replicas=3, max_replicas=4)
+    parallel = ensemble(make_config, 3, rel_width=1e-6, abs_width=1e-6, min_replicas=3, max_replicas=4)
+    assert single.accumulator.count == parallel.accumulator.count == 4 and not single.converged
+    for metric, values in single.summary().items():
+        for name, column in values.items():
+            assert np.array_equal(parallel.summary()[metric][name], column), (metric, name)
+
+def test_ensemble_stops_when_intervals_are_narrow(make_config, tmp_path):
+    result = ensemble(make_config, 2, abs_width=1e6, min_replicas=3, max_replicas=10)
+    assert result.converged and result.accumulator.count == 3
+    result.write_csv(str(tmp_path / 'ensemble.csv'))
+    lines = (tmp_path / 'ensemble.csv').read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 11 and lines[1].startswith('1,3,')
+    with pytest.raises(ValueError):
+        MonteCarloEnsemble(make_config(), min_replicas=1)
+
+def test_ensemble_runs_are_repeatable(make_config, tmp_path):
+    config = make_config(years=10, intake=30)
+    cache = RunCache(str(tmp_path / 'cache'))
+    options = {'rel_width': 1e-6, 'abs_width': 1e-6, 'min_replicas': 3, 'max_replicas': 3, 'workers': 2,
+               'cache': cache}
+    first = MonteCarloEnsemble(config, 'vectorized', **options).run()
+    entries = sorted(os.listdir(cache.directory))
+    # 同一配置再次运行得到相同的副本，全部命中缓存
+    second = MonteCarloEnsemble(config, 'vectorized', **options).run()
+    assert sorted(os.listdir(cache.directory)) == entries and len(entries) == 3
+    assert np.array_equal(first.accumulator.mean, second.accumulator.mean)
+    sweep = ParameterSweep(config, {'absorption_rate': [0.3, 0.5]})
+    assert [task['seed_sequence'].spawn_key for task in sweep.tasks()] == \
+        [task['seed_sequence'].spawn_key for task in sweep.tasks()]
+
+def test_failed_replicas_are_skipped(make_config):
+    # 外存引擎不支持批量结算，每个副本都在工作进程中出错
+    result = MonteCarloEnsemble(make_config(years=10, intake=30, encounter_mode='batched'), 'memmap', min_replicas=2,
+                                max_replicas=3, workers=2).run()
+    assert sorted(failure['replica'] for failure in result.failures) == [0, 1, 2]
+    assert all(failure['error'].startswith('ValueError') for failure in result.failures)
+    assert result.accumulator.count == 0 and not result.converged
+
+def test_cached_run_hits_after_first_run(make_config, tmp_path):
+    cache = RunCache(str(tmp_path / 'cache'))
+    first = cached_run(make_config(years=20), 'vectorized', cache)
+    second = cached_run(make_config(years=20), 'vectorized', cache)
+    assert not first['cached'] and second['cached']
+    assert second['statistics'] == first['statistics']
+    assert second['summary'] == first['summary']
+    assert first['statistics'] == run_headless(make_config(years=20), 'vectorized').statistics
+
+def test_cache_key_covers_params_and_seed(make_config):
+    key = RunCache.key(make_config())
+    assert RunCache.key(make_config()) == key
+    assert RunCache.key(make_config(seed=12)) != key
+    assert RunCache.key(make_config(absorption_rate=0.4)) != key
+    # 由同一根种子spawn出的子随机流有各自的键
+    child, = make_config().rng.seed_sequence.spawn(1)
+    assert RunCache.key(SimulationConfig.from_params(make_config().get_params(), seed=child)) != key
+    # 逐位相同的引擎共用同一个键，其余引擎（memmap与近似引擎）各自缓存
+    assert {RunCache.key(make_config(), engine) for engine in EXACT_ENGINES} == {key}
+    assert len({key, RunCache.key(make_config(), 'memmap'), RunCache.key(make_config(), 'meanfield')}) == 3
+
+def test_cached_run_is_keyed_by_engine(make_config, tmp_path):
+    cache = RunCache(str(tmp_path / 'cache'))
+    assert not cached_run(make_config(years=10), 'vectorized', cache)['cached']
+    assert cached_run(make_config(years=10), 'event', cache)['cached']
+    assert not cached_run(make_config(years=10), 'memmap', cache)['cached']
+    assert cached_run(make_config(years=10), 'memmap', cache)['cached']
+
+def test_cached_run_closes_the_world(make_config, tmp_path, monkeypatch):
+    closed = []
+    close = CultivationWorld.close
+    monkeypatch.setattr(CultivationWorld, 'close', lambda world: closed.append(world.engine_name) or close(world))
+    cache = RunCache(str(tmp_path / 'cache'))
+    cached_run(make_config(years=10), 'memmap', cache)
+    assert closed == ['memmap']
+    # 写入缓存出错时同样关闭世界
+    def broken(config, world):
+        raise OSError('磁盘已满')
+    monkeypatch.setattr(cache, 'put', broken)
+    with pytest.raises(OSError):
+        cached_run(make_config(seed=12, years=10), 'vectorized', cache)
+    assert closed == ['memmap', 'vectorized']
+
+def test_cache_evicts_least_recently_used(make_config, tmp_path):
+    cache = RunCache(str(tmp_path / 'cache'))
+    for seed in (1, 2, 3):
+        cached_run(make_config(seed, years=10), 'vectorized', cache)
+        os.utime(cache._path(RunCache.key(make_config(seed, years=10))), (seed, seed))
+    # 读取会更新最近使用时间
+    assert cache.get(make_config(1, years=10)) is not None
+    size = os.path.getsize(cache._path(RunCache.key(make_config(1, years=10))))
+    cache.max_bytes = 2 * size + size // 2
+    cache.evict()
+    assert cache.get(make_config(2, years=10)) is None
+    assert cache.get(make_config(1, years=10)) is not None and cache.get(make_config(3, years=10)) is not None
+
+def test_sweep_reuses_cached_runs(make_config, tmp_path):
+    def sweep():
+        return ParameterSweep(make_config(years=10, intake=30), {'absorption_rate': [0.3, 0.5]}, engine='vectorized',
+                              workers=2, cache=RunCache(str(tmp_path / 'cache')))
+    first, second = sweep(), sweep()
+    assert first.run() == second.run()
+    assert first.cache_hits == 0 and second.cache_hits == 2
+
+def test_mean_field_is_close_to_reference(make_config):
+    result = validate_mean_field(make_config(years=40, intake=300), 'vectorized', replicas=3)
+    assert result['years'] == 40 and result['replicas'] == 3
+    metrics = result['metrics']
+    assert metrics['battles']['relative_error'] < 0.05
+    assert metrics['deaths']['relative_error'] < 0.05
+    assert metrics['total_cultivators']['relative_error'] < 0.2
+    # 没有修士的等级相对误差无意义
+    assert metrics['DACHENG']['relative_error'] is None
+
+def test_mean_field_validation_needs_exact_reference(make_config):
+    with pytest.raises(ValueError):
+        validate_mean_field(make_config(), 'meanfield')
+    with pytest.raises(ValueError):
+        validate_mean_field(make_config(), 'vectorized', replicas=0)
@@ -0,0 +1,110 @@
+"""分阶段计时：每年记录各阶段耗时，开启计时不改变模拟结果；均衡检测：各检验方式与达到均衡后的处理"""
+import numpy as np
+import pytest
+
+from xiuxian import CultivationLevel, CultivationWorld, ConvergenceMonitor, PhaseProfiler, StatisticsSink, create_world
+
+@pytest.mark.parametrize('engine', ['object', 'vectorized', 'event'])
+def test_profiling_records_every_year(make_config, run, engine):
+    world = create_world(make_config(years=20), engine)
+    profiler = world.enable_profiling()
+    world.add_new_cultivators()
+    result = run(make_config(years=20), world=world)
+    assert result == run(make_config(years=20), engine)
+    timings = world.get_phase_timings()
+    assert sorted(timings) == sorted(PhaseProfiler.PHASES)
+    assert all(len(values) == 20 and min(values) > 0 for values in timings.values())
+    assert profiler.years == list(range(1, 21))
+    assert profiler.populations == result['statistics']['total_cultivators']
+    report = profiler.get_report(remaining_years=5)
+    assert '第20年' in report and '预计剩余' in report
+    assert all(name in report for name in PhaseProfiler.PHASE_NAMES.values())
+    world.disable_profiling()
+    world.simulate_year()
+    assert len(world.get_phase_timings()['cultivate']) == 0
+
+def test_profiling_does_not_read_back_statistics(make_config, simulate, tmp_path, monkeypatch):
+    sink = StatisticsSink.create('jsonl', str(tmp_path / 'statistics.jsonl'))
+    world = create_world(make_config(years=20), 'vectorized', sink=sink)
+    profiler = world.enable_profiling()
+    world.add_new_cultivators()
+    # 计时时人口取自本年记录的统计行，不从流式接收器读回全部历史
+    reads = []
+    monkeypatch.setattr(CultivationWorld, 'statistics', property(lambda self: reads.append(self.year)))
+    simulate(make_config(years=20), world=world)
+    monkeypatch.undo()
+    assert reads == []
+    assert profiler.populations == world.statistics['total_cultivators']
+    sink.close()
+
+def test_throughput_uses_recent_years():
+    profiler = PhaseProfiler()
+    # 前两年每年1秒、100人；后两年每年0.5秒、200人
+    profiler.record_year(1, 100, (500_000_000, 500_000_000, 0, 0, 0))
+    profiler.record_year(2, 100, (1_000_000_000, 0, 0, 0, 0))
+    profiler.record_year(3, 200, (250_000_000, 250_000_000, 0, 0, 0))
+    profiler.record_year(4, 200, (0, 0, 500_000_000, 0, 0))
+    assert profiler.get_throughput() == pytest.approx((4 / 3, 600 / 3))
+    assert profiler.get_throughput(last=2) == pytest.approx((2.0, 400.0))
+    assert profiler.get_totals()['cultivate'] == 1_750_000_000
+
+def observe(monitor: ConvergenceMonitor, series) -> ConvergenceMonitor:
+    """逐年送入各指标取值相同的合成统计行"""
+    for year, value in enumerate(series, 1):
+        monitor.observe({'year': year, 'total_cultivators': value, 'battles': value, 'deaths': value,
+                         'level_distribution': {level.name: value for level in CultivationLevel}})
+    return monitor
+
+@pytest.mark.parametrize('test', ConvergenceMonitor.TESTS)
+def test_constant_series_converges(test):
+    monitor = observe(ConvergenceMonitor(window=10, test=test, patience=3), [100.0] * 40)
+    assert monitor.converged
+    # 第20年起两个窗口已满，连续3年平稳后判定；均衡从首次平稳时较早窗口的起始年开始
+    assert monitor.detected_year == 22 and monitor.equilibrium_year == 1
+
+@pytest.mark.parametrize('test', ConvergenceMonitor.TESTS)
+def test_growing_series_does_not_converge(test):
+    monitor = observe(ConvergenceMonitor(window=10, test=test, tolerance=0.05), np.arange(100, 400, 2.0))
+    assert not monitor.converged
+
+def test_welch_accounts_for_noise():
+    noisy = 100 + np.random.default_rng(0).normal(0, 10, 200)
+    means = observe(ConvergenceMonitor(window=20, test='means', tolerance=0.05, patience=5), noisy)
+    welch = observe(ConvergenceMonitor(window=20, test='welch', tolerance=0.05, patience=5), noisy)
+    assert means.converged and not welch.converged
+    assert observe(ConvergenceMonitor(window=20, test='welch', tolerance=0.2, patience=5), noisy).converged
+
+def test_invalid_settings_are_rejected():
+    for options in ({'window': 1}, {'test': 'ks'}, {'action': 'pause'}, {'tolerance': 0}, {'sparse_interval': 0}):
+        with pytest.raises(ValueError):
+            ConvergenceMonitor(**options)
+
+def equilibrium_attributes(action: str):
+    """较快达到均衡的设置"""
+    return {'years': 300, 'intake': 60, 'absorption_rate': 0.1, 'convergence_window': 20,
+            'convergence_tolerance': 0.5, 'convergence_action': action, 'sparse_interval': 7}
+
+def test_stop_ends_the_run_at_equilibrium(make_config, simulate):
+    world = simulate(make_config(**equilibrium_attributes('stop')), 'vectorized')
+    assert world.monitor.converged and world.is_finished()
+    assert world.year == world.monitor.detected_year < 300
+    assert len(world.statistics['battles']) == world.year
+    world.close()
+
+def test_sparse_sampling_keeps_the_simulation(make_config, simulate):
+    reference = simulate(make_config(years=300, intake=60, absorption_rate=0.1), 'vectorized')
+    world = simulate(make_config(**equilibrium_attributes('sparse')), 'vectorized')
+    detected = world.monitor.detected_year
+    assert detected is not None and world.year == 300
+    statistics, expected = world.statistics, reference.statistics
+    # 模拟本身不变：战斗与陨落逐年记录，采样年份的人口与完整运行相同
+    assert statistics['battles'] == expected['battles'] and statistics['deaths'] == expected['deaths']
+    for year in range(detected, 301, 7):
+        assert statistics['total_cultivators'][year - 1] == expected['total_cultivators'][year - 1]
+    # 未采样的年份记为缺失，不沿用最近一次采样
+    assert statistics['total_cultivators'][detected] is None
+    assert statistics['level_distribution'][detected] is None and statistics['top_killers'][detected] is None
+    sampled = [total is not None for total in statistics['total_cultivators']]
+    assert sampled == [year < detected or (year - detected) % 7 == 0 for year in range(1, 301)]
+    world.close()
+    reference.close()
@@ -0,0 +1,94 @@
+"""逐等级增量统计与扫描结果一致；墓园各保存方式收纳的陨落修士与模拟过程一致，recent模式只保留最近的记录"""
+import numpy as np
+import pytest
+
+from xiuxian import CultivationLevel, CultivationWorld, Graveyard
+
+def recount(world):
+    """逐个扫描存活修士得到的各等级(人数, 平均勇气, 平均战斗次数, 平均剩余寿元)"""
+    summaries = {}
+    for level in CultivationLevel:
+        members = [c for c in world.cultivators if c.is_alive and c.level == level]
+        if members:
+            summaries[level] = (len(members),
+                                np.mean([c.courage for c in members]),
+                                np.mean([c.battles_count for c in members]),
+                                np.mean([c.get_remaining_lifespan() for c in members]))
+    return summaries
+
+def test_level_aggregates_match_a_full_scan(make_config, simulate):
+    world = simulate(make_config(years=0))
+    for _ in range(50):
+        world.simulate_year()
+        alive = [c for c in world.cultivators if c.is_alive]
+        expected = recount(world)
+        summaries = world.get_level_summaries()
+        assert set(summaries) == set(expected)
+        for level, (count, courage, battles, remaining) in expected.items():
+            assert summaries[level][0] == count
+            assert summaries[level][1:] == pytest.approx((courage, battles, remaining))
+        assert world.get_level_counts() == [len([c for c in alive if c.level == level]) for level in CultivationLevel]
+        # 并列时取最先加入者，与按加入顺序取最大值一致
+        assert world.get_strongest() is max(alive, key=lambda c: c.cultivation_points)
+        assert world.get_top_killer() is max(alive, key=lambda c: c.defeats_count)
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        Graveyard('archive')
+    with pytest.raises(ValueError):
+        Graveyard('recent', capacity=-1)
+
+@pytest.mark.parametrize('engine', ['object', 'vectorized', 'event'])
+def test_graveyard_holds_every_dead_cultivator(make_config, simulate, engine):
+    world = simulate(make_config(), engine)
+    graveyard = world.graveyard
+    assert graveyard.total_deaths > 0
+    assert sum(graveyard.deaths_by_level) == graveyard.total_deaths
+    # 活跃集合中只剩存活修士，与墓园合起来恰好是全部修士
+    assert world.statistics['total_cultivators'][-1] + graveyard.total_deaths == world.next_id - 1
+    records = graveyard.get_records()
+    assert len(records['id']) == graveyard.total_deaths
+    assert len(np.unique(records['id'])) == graveyard.total_deaths
+    assert np.all(np.diff(records['year']) >= 0)
+    assert np.bincount(records['level'], minlength=len(graveyard.deaths_by_level)).tolist() == \
+        graveyard.deaths_by_level
+    assert records['defeats'].sum() == graveyard.total_defeats
+
+def test_graveyard_modes(make_config, simulate):
+    reference = simulate(make_config(graveyard_mode='summary'))
+    full = simulate(make_config(graveyard_mode='full'))
+    discard = simulate(make_config(graveyard_mode='discard'))
+    # 保存方式不影响模拟本身
+    assert full.statistics == discard.statistics == reference.statistics
+    assert full.graveyard.deaths_by_level == discard.graveyard.deaths_by_level == reference.graveyard.deaths_by_level
+    assert [c.id for c in full.graveyard.cultivators] == reference.graveyard.get_records()['id'].tolist()
+    assert not any(c.is_alive for c in full.graveyard.cultivators)
+    assert reference.graveyard.cultivators == []
+    assert len(discard.graveyard.get_records()['id']) == 0
+
+@pytest.mark.parametrize('engine', ['object', 'vectorized'])
+def test_recent_graveyard_keeps_latest_records(make_config, simulate, tmp_path, engine):
+    reference = simulate(make_config(graveyard_mode='summary'), engine).graveyard
+    world = simulate(make_config(graveyard_capacity=50), engine)
+    graveyard = world.graveyard
+    assert graveyard.mode == 'recent' and reference.total_deaths > 200
+    # 计数与summary模式相同，记录只保留最近50条
+    assert graveyard.total_deaths == reference.total_deaths
+    assert graveyard.deaths_by_level == reference.deaths_by_level
+    assert graveyard.total_defeats == reference.total_defeats
+    for field, column in reference.get_records().items():
+        assert np.array_equal(graveyard.get_records()[field], column[-50:]), field
+    # 累积的记录不超过容量的两倍，检查点至多保存容量条记录
+    assert graveyard._record_count <= 100
+    path = str(tmp_path / 'world.npz')
+    world.save_checkpoint(path)
+    assert len(CultivationWorld.load_checkpoint(path).graveyard.get_records()['id']) == 50
+    with np.load(path) as data:
+        assert len(data['graveyard_record_id']) == 50
+
+@pytest.mark.parametrize('engine', ['vectorized', 'event'])
+def test_engines_bury_identical_records(make_config, simulate, engine):
+    reference = simulate(make_config(), 'object').graveyard.get_records()
+    records = simulate(make_config(), engine).graveyard.get_records()
+    for field, column in reference.items():
+        assert np.array_equal(records[field], column), field
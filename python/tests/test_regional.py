@@ -0,0 +1,78 @@
+"""分区世界：相同种子的结果可复现，且与各区域使用的引擎无关；各引擎只移出、并入迁徙的修士"""
+import numpy as np
+import pytest
+
+from xiuxian import RegionalWorld, create_world
+
+def regional_run(make_config, run, engine: str = 'object', regions: int = 3, migration_rate: float = 0.05,
+                 **attributes):
+    """以分区世界完整运行（较少年份），返回summarize结果"""
+    config = make_config(years=30, **attributes)
+    world = RegionalWorld(config, regions, engine, migration_rate)
+    try:
+        world.add_new_cultivators()
+        return run(config, world=world)
+    finally:
+        world.close()
+
+def test_regional_run_is_reproducible(make_config, run):
+    result = regional_run(make_config, run)
+    assert sum(result['statistics']['battles']) > 0
+    assert regional_run(make_config, run) == result
+    assert regional_run(make_config, run, seed=12) != result
+
+@pytest.mark.parametrize('engine', ['vectorized', 'event', 'memmap'])
+def test_regional_engines_agree(make_config, run, engine):
+    assert regional_run(make_config, run, engine) == regional_run(make_config, run, 'object')
+
+@pytest.mark.parametrize('engine', ['object', 'vectorized', 'event', 'memmap'])
+def test_removed_population_merges_back(make_config, run, engine):
+    reference = run(make_config(), engine)
+    world = create_world(make_config(), engine)
+    world.add_new_cultivators()
+    for _ in range(20):
+        world.simulate_year()
+    population = world.export_population()
+    summaries = world.get_level_summaries()
+    selected = np.random.default_rng(0).random(len(population['id'])) < 0.3
+    removed = world.remove_population(selected)
+    remaining = world.export_population()
+    for field, column in population.items():
+        assert np.array_equal(removed[field], column[selected]), field
+        assert np.array_equal(remaining[field], column[~selected]), field
+    assert sum(world.get_level_counts()) == int((~selected).sum())
+    # 并回后按编号排列，与移出前完全相同，模拟照常继续
+    world.merge_population(removed)
+    for field, column in world.export_population().items():
+        assert np.array_equal(column, population[field]), field
+    assert world.get_level_summaries() == pytest.approx(summaries)
+    assert run(make_config(), world=world) == reference
+
+def test_migration_changes_the_run(make_config, run):
+    settled = regional_run(make_config, run, migration_rate=0.0)
+    migrating = regional_run(make_config, run, migration_rate=0.2)
+    assert settled['statistics']['battles'] != migrating['statistics']['battles']
+
+def test_invalid_regions_are_rejected(make_config):
+    with pytest.raises(ValueError):
+        RegionalWorld(make_config(), 0)
+    with pytest.raises(ValueError):
+        RegionalWorld(make_config(), 2, 'gpu')
+
+def test_unsupported_operations_raise_value_error(make_config, tmp_path):
+    world = RegionalWorld(make_config(years=5), 2)
+    try:
+        world.add_new_cultivators()
+        world.simulate_year()
+        # 与均场引擎一样以ValueError拒绝，调用方可以统一处理
+        with pytest.raises(ValueError):
+            world.save_checkpoint(str(tmp_path / 'world.npz'))
+        with pytest.raises(ValueError):
+            world.enable_battle_log()
+        with pytest.raises(ValueError):
+            world.import_population(create_world(make_config(), 'vectorized').export_population())
+        with pytest.raises(ValueError):
+            world.remove_population(np.zeros(0, dtype=bool))
+        assert not (tmp_path / 'world.npz').exists()
+    finally:
+        world.close()
@@ -0,0 +1,182 @@
+"""模拟服务：WebSocket握手、命令、逐年增量与确认（ack）背压；会话锁与关闭服务"""
+import asyncio
+import json
+import os
+import threading
+
+from xiuxian import SimulationConfig, SimulationServer, SimulationSession
+
+# RFC 6455第1.3节的握手示例
+SAMPLE_KEY = 'dGhlIHNhbXBsZSBub25jZQ=='
+SAMPLE_ACCEPT = 's3pPLMBiTxaQ9kYGzzhZRbK+xOo='
+
+def serve(scenario, years: int = 12, max_lag: int = 32):
+    """在新的事件循环中启动服务（随机端口），运行scenario(server)后关闭服务"""
+    async def main():
+        config = SimulationConfig(years, 0.5, 7)
+        config.new_cultivators_per_year = 50
+        server = SimulationServer(SimulationSession(config, 'vectorized'), port=0, max_lag=max_lag)
+        await server.start()
+        try:
+            return await asyncio.wait_for(scenario(server), 30)
+        finally:
+            await server.stop()
+    return asyncio.run(main())
+
+async def request(port: int, head: str, body: bytes = b''):
+    """发送一个HTTP请求，返回(响应头, 响应体)"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return head.decode('latin-1'), body
+
+class Client:
+    """最小的WebSocket客户端（发送带掩码的文本帧，接收不分片的文本帧）"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, head: str):
+        self.reader = reader
+        self.writer = writer
+        self.head = head
+
+    @classmethod
+    async def connect(cls, port: int, key: str = SAMPLE_KEY) -> 'Client':
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write((f"GET /ws HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nUpgrade: websocket\r\n"
+                      f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n")
+                     .encode('latin-1'))
+        head = await reader.readuntil(b'\r\n\r\n')
+        return cls(reader, writer, head.decode('latin-1'))
+
+    async def send(self, message: dict):
+        payload = json.dumps(message).encode('utf-8')
+        mask = os.urandom(4)
+        masked = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+        self.writer.write(bytes((0x81, 0x80 | len(payload))) + mask + masked)
+        await self.writer.drain()
+
+    async def receive(self) -> dict:
+        head = await self.reader.readexactly(2)
+        assert head[0] == 0x81 and not head[1] & 0x80
+        length = head[1] & 0x7F
+        if length == 126:
+            length = int.from_bytes(await self.reader.readexactly(2), 'big')
+        elif length == 127:
+            length = int.from_bytes(await self.reader.readexactly(8), 'big')
+        return json.loads(await self.reader.readexactly(length))
+
+    async def receive_year(self) -> dict:
+        """跳过状态消息，返回下一条逐年增量"""
+        while True:
+            message = await self.receive()
+            if message['type'] == 'year':
+                return message
+
+    def close(self):
+        self.writer.close()
+
+def test_handshake_and_initial_state():
+    async def scenario(server):
+        client = await Client.connect(server.port)
+        assert client.head.startswith('HTTP/1.1 101')
+        assert f'Sec-WebSocket-Accept: {SAMPLE_ACCEPT}\r\n' in client.head
+        state = await client.receive()
+        client.close()
+        return state
+    state = serve(scenario)
+    assert state['type'] == 'state' and state['state'] == 'idle' and state['year'] == 0
+    assert state['engine'] == 'vectorized'
+
+def test_handshake_requires_key():
+    async def scenario(server):
+        return await request(server.port, "GET /ws HTTP/1.1\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n\r\n")
+    head, body = serve(scenario)
+    assert head.startswith('HTTP/1.1 400')
+    assert json.loads(body)['type'] == 'error'
+
+def test_run_to_completion_streams_every_year():
+    async def scenario(server):
+        client = await Client.connect(server.port)
+        await client.send({'command': 'start', 'seed': 3})
+        deltas = [await client.receive_year() for _ in range(12)]
+        while (await client.receive())['state'] != 'finished':
+            pass
+        _, history = await request(server.port, "GET /history HTTP/1.1\r\n\r\n")
+        client.close()
+        return deltas, json.loads(history), server.session.world.statistics
+    deltas, history, statistics = serve(scenario)
+    assert [delta['year'] for delta in deltas] == list(range(1, 13))
+    assert [delta['battles'] for delta in deltas] == statistics['battles'] == history['battles']
+    assert [delta['total_cultivators'] for delta in deltas] == history['total_cultivators']
+
+def test_ack_limits_lead():
+    async def scenario(server):
+        client = await Client.connect(server.port)
+        await client.send({'command': 'ack', 'year': 0})
+        await client.send({'command': 'start'})
+        years = [(await client.receive_year())['year'] for _ in range(3)]
+        # 确认停在第0年：模拟最多领先max_lag年，停在第3年
+        await asyncio.sleep(0.3)
+        stalled = server.session.year
+        await client.send({'command': 'ack', 'year': 3})
+        years += [(await client.receive_year())['year'] for _ in range(3)]
+        await asyncio.sleep(0.3)
+        stalled_again = server.session.year
+        await client.send({'command': 'ack', 'year': 'x'})
+        error = await client.receive()
+        client.close()
+        return years, stalled, stalled_again, error
+    years, stalled, stalled_again, error = serve(scenario, max_lag=3)
+    assert years == [1, 2, 3, 4, 5, 6]
+    assert stalled == 3 and stalled_again == 6
+    assert error['type'] == 'error'
+
+def test_invalid_command_reports_error():
+    async def scenario(server):
+        client = await Client.connect(server.port)
+        await client.receive()
+        await client.send({'command': 'pause'})
+        error = await client.receive()
+        head, body = await request(server.port, "POST /command HTTP/1.1\r\nContent-Length: 19\r\n\r\n",
+                                   b'{"command": "jump"}')
+        client.close()
+        return error, head, json.loads(body)
+    error, head, body = serve(scenario)
+    assert error['type'] == 'error'
+    assert head.startswith('HTTP/1.1 400') and body['type'] == 'error'
+
+def test_reads_wait_for_the_step_lock():
+    config = SimulationConfig(12, 0.5, 7)
+    config.new_cultivators_per_year = 50
+    session = SimulationSession(config, 'vectorized')
+    session.start()
+    described = []
+    reader = threading.Thread(target=lambda: described.append(session.describe()))
+    # 模拟一年期间（持有会话锁）读取状态会等待这一年结束
+    with session.lock:
+        reader.start()
+        reader.join(0.2)
+        assert reader.is_alive() and described == []
+        session.step()
+    reader.join(5)
+    assert described[0]['year'] == 1
+    session.reset()
+
+def test_stop_closes_open_connections():
+    async def main():
+        config = SimulationConfig(12, 0.5, 7)
+        server = SimulationServer(SimulationSession(config, 'vectorized'), port=0)
+        await server.start()
+        client = await Client.connect(server.port)
+        await client.receive()
+        # 客户端保持连接时关闭服务：连接被关闭，处理任务结束而不是被事件循环取消
+        await asyncio.wait_for(server.stop(), 10)
+        remaining = await asyncio.wait_for(client.reader.read(), 10)
+        others = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        client.close()
+        return remaining, others, server.clients
+    remaining, others, clients = asyncio.run(main())
+    assert remaining[:1] == bytes((0x88,))  # 关闭帧
+    assert others == [] and not clients
@@ -0,0 +1,151 @@
+"""各统计接收器保存的逐年统计完全相同，内存接收器逐步生成列表结构，流式接收器从检查点继续后接着原文件写入；绘图用的保形降采样"""
+import numpy as np
+import pytest
+
+from xiuxian import (STATISTICS_SINKS, CultivationWorld, MemorySink, StatisticsSink, create_world, decimate_minmax,
+                     statistics_from_arrays, statistics_to_arrays)
+
+def sink_world(make_config, tmp_path, kind: str, name: str = 'statistics', **attributes) -> CultivationWorld:
+    """创建使用指定接收器的世界并加入第一批修士"""
+    sink = StatisticsSink.create(kind, str(tmp_path / f'{name}.{kind}'))
+    world = create_world(make_config(**attributes), 'vectorized', sink=sink)
+    world.add_new_cultivators()
+    return world
+
+def sparse_attributes():
+    """较快达到均衡并在之后每7年才完整统计一次的设置"""
+    return {'years': 300, 'intake': 60, 'absorption_rate': 0.1, 'convergence_window': 20,
+            'convergence_tolerance': 0.5, 'convergence_action': 'sparse', 'sparse_interval': 7}
+
+@pytest.mark.parametrize('kind', sorted(set(STATISTICS_SINKS) - {'memory'}))
+def test_sinks_agree(make_config, simulate, tmp_path, kind):
+    reference = simulate(make_config(), 'vectorized').statistics
+    world = simulate(make_config(), world=sink_world(make_config, tmp_path, kind))
+    assert len(world.sink) == 60
+    assert world.statistics == reference
+    world.sink.close()
+
+@pytest.mark.parametrize('kind', sorted(set(STATISTICS_SINKS) - {'memory'}))
+def test_sinks_agree_on_missing_years(make_config, simulate, tmp_path, kind):
+    reference = simulate(make_config(**sparse_attributes()), 'vectorized')
+    arrays = reference.sink.get_arrays()
+    assert None in reference.statistics['total_cultivators'] and not arrays['sampled'].all()
+    world = simulate(make_config(), world=sink_world(make_config, tmp_path, kind, **sparse_attributes()))
+    assert world.statistics == reference.statistics
+    assert sorted(world.sink.get_arrays()) == sorted(arrays)
+    for name, column in arrays.items():
+        assert np.array_equal(world.sink.get_arrays()[name], column), name
+    world.close()
+    reference.close()
+
+def test_memory_sink_extends_statistics(make_config, simulate):
+    reference = simulate(make_config(), 'vectorized').statistics
+    world = create_world(make_config(), 'vectorized')
+    assert isinstance(world.sink, MemorySink)
+    world.add_new_cultivators()
+    for _ in range(20):
+        world.simulate_year()
+    # 运行中读取的统计在之后的年份中原地延长
+    statistics = world.statistics
+    assert len(statistics['battles']) == 20
+    simulate(make_config(), world=world)
+    assert world.statistics is statistics and statistics == reference
+    # 列式数组直接取自接收器的列
+    arrays = world.sink.get_arrays()
+    assert np.shares_memory(arrays['battles'], world.sink.columns['battles'])
+    assert all(np.array_equal(arrays[key], column) for key, column in statistics_to_arrays(reference).items())
+
+def test_arrays_without_sampled_column_are_fully_sampled(make_config, simulate):
+    statistics = simulate(make_config(), 'vectorized').statistics
+    arrays = statistics_to_arrays(statistics)
+    assert arrays['sampled'].all()
+    # 较早的检查点与缓存没有sampled列
+    del arrays['sampled']
+    assert statistics_from_arrays(arrays) == statistics
+
+@pytest.mark.parametrize('kind', ['jsonl', 'csv'])
+def test_streaming_sink_is_readable_while_running(make_config, tmp_path, kind):
+    world = sink_world(make_config, tmp_path, kind)
+    for _ in range(10):
+        world.simulate_year()
+    # 每年写入一行并立即刷新，其他程序可以随时读取
+    lines = (tmp_path / f'statistics.{kind}').read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 10 + (kind == 'csv')
+    world.sink.close()
+
+@pytest.mark.parametrize('kind', ['jsonl', 'csv'])
+def test_streaming_sink_parses_only_appended_rows(make_config, simulate, tmp_path, monkeypatch, kind):
+    reference = simulate(make_config(), 'vectorized').statistics
+    world = sink_world(make_config, tmp_path, kind)
+    decoded = []
+    def counted(f, at_start, decode=world.sink._decode):
+        rows = decode(f, at_start)
+        decoded.append(len(rows))
+        return rows
+    monkeypatch.setattr(world.sink, '_decode', counted)
+    # 每次读取只解析上次读取之后追加的年份，每行只解析一次
+    for year in range(1, 61):
+        world.simulate_year()
+        if year % 20 == 0:
+            assert len(world.statistics['battles']) == year
+    assert world.statistics == reference
+    assert decoded == [20, 20, 20]
+    world.sink.close()
+
+@pytest.mark.parametrize('kind', ['jsonl', 'csv'])
+def test_streaming_sink_resumes_from_checkpoint(make_config, simulate, tmp_path, kind):
+    reference = simulate(make_config(), 'vectorized').statistics
+    world = sink_world(make_config, tmp_path, kind, 'resumed')
+    for _ in range(25):
+        world.simulate_year()
+    path = str(tmp_path / 'world.npz')
+    world.save_checkpoint(path)
+    # 检查点之后多写入的年份在继续时被截去
+    for _ in range(5):
+        world.simulate_year()
+    world.sink.close()
+
+    resumed = simulate(make_config(), world=CultivationWorld.load_checkpoint(path))
+    assert resumed.statistics == reference
+    assert len(resumed.sink) == 60
+    resumed.sink.close()
+
+@pytest.mark.parametrize('kind', ['jsonl', 'csv'])
+def test_streaming_sink_resumes_sparse_run(make_config, simulate, tmp_path, kind):
+    reference = simulate(make_config(**sparse_attributes()), 'vectorized').statistics
+    world = sink_world(make_config, tmp_path, kind, **sparse_attributes())
+    for _ in range(150):
+        world.simulate_year()
+    path = str(tmp_path / 'world.npz')
+    world.save_checkpoint(path)
+    world.close()
+    # 检查点中的均衡状态与缺失年份在继续后保持不变
+    resumed = simulate(make_config(), world=CultivationWorld.load_checkpoint(path))
+    assert resumed.statistics == reference
+    resumed.close()
+
+def test_decimate_keeps_short_series():
+    indices, values = decimate_minmax(np.arange(10), max_points=10)
+    assert indices.tolist() == list(range(10)) and values.tolist() == list(range(10))
+
+def test_decimate_keeps_at_least_two_buckets():
+    values = np.array([0.0, 5.0, -5.0, 1.0, 2.0, 3.0, 4.0, 0.5])
+    # max_points小于4时按4处理：分为两个桶，后半段的最大值同样保留
+    for max_points in (0, 1, 2, 4):
+        indices, _ = decimate_minmax(values, max_points=max_points)
+        assert indices.tolist() == [0, 1, 2, 6, 7]
+
+def test_decimate_keeps_extremes_and_endpoints():
+    values = np.random.default_rng(5).normal(size=100_000)
+    values[31_337], values[77_777] = 50.0, -50.0  # 单点尖峰与骤降
+    indices, decimated = decimate_minmax(values, max_points=200)
+    assert len(indices) <= 202
+    assert np.all(np.diff(indices) > 0)
+    assert np.array_equal(decimated, values[indices])
+    assert indices[0] == 0 and indices[-1] == len(values) - 1
+    assert {31_337, 77_777} <= set(indices.tolist())
+    # 每个桶的最小值与最大值都被保留
+    bucket = -(-len(values) // 100)
+    for start in range(0, len(values), bucket):
+        chunk = values[start:start + bucket]
+        assert chunk.max() in decimated and chunk.min() in decimated
@@ -0,0 +1,26 @@
+"""修仙世界模拟器
+
+各模块按职责划分：core（修士、境界、随机数与配置）、encounters（相遇结算）、
+records（增量统计、墓园与战斗日志）、sinks（逐年统计的保存后端）、
+monitors（分阶段计时与均衡检测）、engines（各模拟引擎）、regional（分区世界）、
+runner（运行方式）、experiments（运行缓存、参数扫描与集合模拟）、
+benchmark（基准测试）、server（本地模拟服务）、cli（命令行）。
+matplotlib只在绘图时导入，numba只在使用编译内核时导入（见kernels），导入本包或服务时均无需加载。
+"""
+from .core import (SIMULATOR_VERSION, CultivationLevel, Cultivator, LevelConfig, RandomStreams, SimulationConfig,
+                   jit_available, load_matplotlib)
+from .encounters import LiveMemberIndex, SortedLiveMemberIndex, resolve_encounters_batched
+from .records import BattleLog, Graveyard, LevelAggregates
+from .sinks import (STATISTICS_SINKS, ArraySink, CsvSink, JsonlSink, MemorySink, StatisticsSink, StreamingSink,
+                    decimate_minmax, empty_statistics, flatten_row, statistics_from_arrays, statistics_rows,
+                    statistics_to_arrays, unflatten_row)
+from .monitors import ConvergenceMonitor, PhaseProfiler
+from .engines import (APPROXIMATE_ENGINES, ENGINES, EXACT_ENGINES, CultivationWorld, EventDrivenCultivationWorld,
+                      MeanFieldCultivationWorld, MemmapCultivationWorld, VectorizedCultivationWorld, create_world)
+from .engines.memmap import MemmapPopulation
+from .regional import RegionalWorld
+from .runner import run_demo, run_headless, run_simulation
+from .experiments import (MonteCarloEnsemble, ParameterSweep, RunCache, WelfordAccumulator, cached_run,
+                          flatten_statistics, validate_mean_field)
+from .benchmark import BenchmarkSuite
+from .server import SimulationServer, SimulationSession, WebSocketClosed, WebSocketConnection
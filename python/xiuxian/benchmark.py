@@ -0,0 +1,180 @@
+"""基准测试"""
+import numpy as np
+from typing import List, Dict, Optional
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from .core import SimulationConfig
+from .engines import create_world
+
+def _timed(func, timings: List[int]):
+    """包装函数，将每次调用耗时（纳秒）追加到timings"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter_ns()
+        result = func(*args, **kwargs)
+        timings.append(time.perf_counter_ns() - start)
+        return result
+    return wrapper
+
+def _run_benchmark_case(case: Dict) -> Dict:
+    """运行单个基准测试用例（在独立子进程中执行，以便单独统计峰值内存）"""
+    best = None
+    for _ in range(case['repeat']):
+        config = SimulationConfig(case['years'], case['absorption_rate'], case['seed'])
+        config.new_cultivators_per_year = case['intake']
+        config.graveyard_mode = 'discard'
+        world = create_world(config, case['engine'])
+        
+        # 初始人口规模
+        start = time.perf_counter_ns()
+        world.add_new_cultivators(case['population'])
+        initial_ns = time.perf_counter_ns() - start
+        
+        # 逐年模拟，同时记录相遇与新增修士两个阶段的耗时
+        year_ns, encounter_ns, intake_ns = [], [], []
+        world.simulate_encounters = _timed(world.simulate_encounters, encounter_ns)
+        world.add_new_cultivators = _timed(world.add_new_cultivators, intake_ns)
+        simulate_year = _timed(world.simulate_year, year_ns)
+        for _ in range(case['years']):
+            simulate_year()
+        cultivator_years = sum(world.statistics['total_cultivators'])
+        
+        report_ns = []
+        get_status_report = _timed(world.get_status_report, report_ns)
+        for _ in range(case['report_repeat']):
+            get_status_report()
+        
+        plot_ns = None
+        if case['plot']:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                start = time.perf_counter_ns()
+                world.plot_statistics(os.path.join(tmp_dir, 'benchmark.png'))
+                plot_ns = time.perf_counter_ns() - start
+        
+        total_s = sum(year_ns) / 1e9
+        result = {
+            'initial_population_s': initial_ns / 1e9,
+            'simulate_year_s': total_s,
+            'simulate_encounters_s': sum(encounter_ns) / 1e9,
+            'add_new_cultivators_s': sum(intake_ns) / 1e9,
+            'get_status_report_s': sum(report_ns) / len(report_ns) / 1e9,
+            'plot_statistics_s': None if plot_ns is None else plot_ns / 1e9,
+            'years_per_sec': case['years'] / total_s if total_s > 0 else None,
+            'cultivators_per_sec': cultivator_years / total_s if total_s > 0 else None,
+            'final_population': world.statistics['total_cultivators'][-1],
+        }
+        # 多次重复取最快的一次
+        if best is None or result['simulate_year_s'] < best['simulate_year_s']:
+            best = result
+    
+    best['peak_rss_mb'] = _peak_rss_mb()
+    return best
+
+def _peak_rss_mb() -> Optional[float]:
+    """当前进程的峰值常驻内存（MB）；没有resource模块的平台（Windows）返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class BenchmarkSuite:
+    """性能基准测试
+    
+    在不同引擎、初始人口、模拟年数与每年新增人数的组合上，以固定随机种子测量
+    simulate_year、simulate_encounters、add_new_cultivators、get_status_report与
+    plot_statistics的耗时，输出每秒模拟年数、每秒处理修士数（修士·年）与峰值内存。
+    每个用例在独立子进程中运行，结果可保存为JSON并与基线比较。
+    """
+    
+    # 比较时数值越大越好的指标，其余耗时指标越小越好
+    THROUGHPUT_METRICS = ('years_per_sec', 'cultivators_per_sec')
+    TIME_METRICS = ('simulate_year_s', 'simulate_encounters_s', 'add_new_cultivators_s',
+                    'get_status_report_s', 'plot_statistics_s')
+    CASE_KEYS = ('engine', 'population', 'years', 'intake')
+    
+    def __init__(self, engines: List[str] = ('object', 'vectorized'), populations: List[int] = (1000, 10000),
+                 years: List[int] = (50,), intakes: List[int] = (1000,), seed: int = 0, repeat: int = 3,
+                 plot: bool = True, absorption_rate: float = 0.1):
+        self.engines = list(engines)
+        self.populations = list(populations)
+        self.years = list(years)
+        self.intakes = list(intakes)
+        self.seed = seed
+        self.repeat = repeat
+        self.plot = plot
+        self.absorption_rate = absorption_rate
+    
+    def cases(self) -> List[Dict]:
+        """生成全部用例"""
+        return [{
+            'engine': engine,
+            'population': population,
+            'years': years,
+            'intake': intake,
+            'absorption_rate': self.absorption_rate,
+            'seed': self.seed,
+            'repeat': self.repeat,
+            'report_repeat': 5,
+            'plot': self.plot,
+        } for engine, population, years, intake in itertools.product(
+            self.engines, self.populations, self.years, self.intakes)]
+    
+    def run(self, progress: bool = False) -> Dict:
+        """运行全部用例，返回可序列化为JSON的结果"""
+        results = []
+        context = multiprocessing.get_context('spawn')
+        for i, case in enumerate(self.cases()):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                metrics = executor.submit(_run_benchmark_case, case).result()
+            results.append({**{key: case[key] for key in self.CASE_KEYS}, **metrics})
+            if progress:
+                print(f"[{i + 1}/{len(self.cases())}] {case['engine']} 人口{case['population']} "
+                      f"{case['years']}年 每年新增{case['intake']}: {metrics['years_per_sec']:.1f}年/秒, "
+                      f"{metrics['cultivators_per_sec']:.0f}修士/秒, 峰值内存"
+                      + ('未知' if metrics['peak_rss_mb'] is None else f"{metrics['peak_rss_mb']:.1f}MB"))
+        return {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': self.seed,
+            'cases': results,
+        }
+    
+    @classmethod
+    def compare(cls, baseline: Dict, current: Dict, threshold: float = 0.1) -> List[Dict]:
+        """比较两份结果，返回各用例各指标的变化；变差超过threshold（相对比例）的标记为性能回退"""
+        def key(case):
+            return tuple(case[k] for k in cls.CASE_KEYS)
+        
+        baseline_cases = {key(case): case for case in baseline['cases']}
+        changes = []
+        for case in current['cases']:
+            base = baseline_cases.get(key(case))
+            if base is None:
+                continue
+            for metric in cls.THROUGHPUT_METRICS + cls.TIME_METRICS:
+                old, new = base.get(metric), case.get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old
+                worse = -change if metric in cls.THROUGHPUT_METRICS else change
+                changes.append({
+                    **{k: case[k] for k in cls.CASE_KEYS},
+                    'metric': metric,
+                    'baseline': old,
+                    'current': new,
+                    'change': change,
+                    'regression': worse > threshold,
+                })
+        return changes
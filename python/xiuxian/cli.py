@@ -0,0 +1,444 @@
+"""命令行入口与各子命令"""
+import asyncio
+import numpy as np
+from typing import Optional
+import argparse
+import json
+import sys
+
+from .core import CultivationLevel, Cultivator, SimulationConfig
+from .records import BattleLog, Graveyard
+from .sinks import STATISTICS_SINKS, StatisticsSink
+from .monitors import ConvergenceMonitor
+from .engines import APPROXIMATE_ENGINES, ENGINES
+from .runner import run_demo, run_simulation
+from .experiments import MonteCarloEnsemble, ParameterSweep, RunCache, validate_mean_field
+from .benchmark import BenchmarkSuite
+from .server import SimulationServer, SimulationSession
+
+def non_negative_int(value: str) -> int:
+    """argparse参数类型：非负整数"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"不是整数: {value}")
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"不能为负数: {value}")
+    return number
+
+def open_run_cache(args) -> Optional[RunCache]:
+    """按命令行参数打开运行缓存（未指定--cache时不使用缓存）"""
+    if not args.cache:
+        return None
+    return RunCache(args.cache, int(args.cache_size * 1024 * 1024))
+
+def run_sweep(config: SimulationConfig, args):
+    """运行参数扫描子命令"""
+    try:
+        grid = ParameterSweep.parse_grid(args.grid, config)
+    except ValueError as e:
+        print(f"错误：{e}")
+        return
+    
+    sweep = ParameterSweep(config, grid, args.replicas, args.engine or 'object', args.workers,
+                           cache=open_run_cache(args))
+    print(f"\n=== 参数扫描: {len(sweep.tasks())}次运行, {sweep.workers}个工作进程 ===")
+    sweep.run(progress=not args.no_progress)
+    
+    sweep.write_csv(args.out)
+    print(f"\n扫描完成: {len(sweep.results)}行结果已写入{args.out}")
+    if sweep.cache is not None:
+        print(f"运行缓存命中{sweep.cache_hits}次")
+    for failure in sweep.failures:
+        print(f"运行失败(第{failure['stream']}次): {failure['error']}")
+    return sweep
+
+def run_ensemble(config: SimulationConfig, args):
+    """运行集合模拟子命令"""
+    try:
+        ensemble = MonteCarloEnsemble(config, args.engine or 'object', args.ci_width, args.ci_floor,
+                                      args.confidence, args.min_replicas, args.max_replicas, args.workers,
+                                      open_run_cache(args))
+    except ValueError as e:
+        print(f"错误：{e}")
+        return
+    
+    print(f"\n=== 集合模拟: 置信水平{args.confidence:.0%}, 半宽不超过均值的{args.ci_width:.1%}"
+          f"（且不低于{args.ci_floor}）, {ensemble.min_replicas}-{ensemble.max_replicas}个副本 ===")
+    ensemble.run(progress=not args.no_progress)
+    
+    ensemble.write_csv(args.out)
+    status = "已收敛" if ensemble.converged else "未收敛（达到副本上限）"
+    print(f"\n集合模拟{status}: 共{ensemble.accumulator.count}个副本，结果已写入{args.out}")
+    for failure in ensemble.failures:
+        print(f"副本失败(第{failure['replica']}个): {failure['error']}")
+    final = ensemble.summary()
+    for metric in ('total_cultivators', 'battles', 'deaths'):
+        # 稀疏采样时末年可能没有有效样本，取最后一个有样本的年份
+        observed = np.flatnonzero(final[metric]['count'] > 0)
+        if len(observed) == 0:
+            continue
+        year = observed[-1]
+        print(f"第{year + 1}年 {metric}: {final[metric]['mean'][year]:.1f} ± {final[metric]['half_width'][year]:.1f}")
+    return ensemble
+
+def run_validation(config: SimulationConfig, args):
+    """运行均场引擎验证子命令"""
+    print(f"\n=== 均场引擎验证: 基准引擎{args.reference}，{args.replicas}个副本 ===")
+    try:
+        result = validate_mean_field(config, args.reference, args.replicas)
+    except ValueError as e:
+        print(f"错误：{e}")
+        return
+    
+    print(f"{'指标':<18}{'平均绝对误差':>12}{'相对误差':>10}{'基准波动':>10}{'末年基准':>12}{'末年均场':>12}")
+    for metric, values in result['metrics'].items():
+        if values['final_reference'] == 0 and values['final_meanfield'] == 0 and values['mean_absolute_error'] == 0:
+            continue
+        relative = f"{values['relative_error']:.1%}" if values['relative_error'] is not None else '-'
+        print(f"{metric:<18}{values['mean_absolute_error']:>12.1f}{relative:>10}{values['reference_noise']:>10.1f}"
+              f"{values['final_reference']:>12.1f}{values['final_meanfield']:>12.1f}")
+    seconds = result['seconds']
+    print(f"单次运行耗时: 基准{seconds['reference']:.2f}秒，均场{seconds['meanfield']:.2f}秒")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入{args.out}")
+    return result
+
+def run_battle_query(args) -> int:
+    """查询战斗日志文件（battles子命令），返回退出码"""
+    try:
+        log = BattleLog.open(args.log)
+    except OSError as e:
+        print(f"错误：无法打开战斗日志: {e}")
+        return 1
+    
+    summary = log.summary()
+    print(f"\n=== 战斗日志 {args.log} ===")
+    if summary['records'] == 0:
+        print("日志中没有战斗记录")
+        return 0
+    print(f"共{summary['records']}场战斗（第{summary['first_year']}年至第{summary['last_year']}年）")
+    for level in CultivationLevel:
+        battles = summary['battles_by_level'][level.name]
+        if battles > 0:
+            print(f"  {Cultivator.LEVEL_CONFIGS[level].name}期: {battles}场，"
+                  f"吸收修为{summary['absorbed_by_level'][level.name]}点")
+    print(f"发起者求战{summary['initiator_only']}场，对手求战{summary['opponent_only']}场，"
+          f"双方皆愿战{summary['both_willing']}场；发起者获胜{summary['initiator_wins']}场")
+    
+    if args.cultivator is not None:
+        kills = log.kill_history(args.cultivator)
+        print(f"\n修士{args.cultivator}的击败记录（共{len(kills)}场）:")
+        for event in kills[:args.limit]:
+            print("  " + log.describe(event))
+        if len(kills) > args.limit:
+            print(f"  ……另有{len(kills) - args.limit}场")
+        death = log.death_record(args.cultivator)
+        print("战死: " + (log.describe(death) if death is not None else "日志中未战死"))
+        chain = log.kill_chain(args.cultivator, args.depth)
+        if chain:
+            print("击杀链（各层败者人数及其被吸收的修为）:")
+            for depth, layer in enumerate(chain):
+                print(f"  第{depth + 1}层: {len(layer)}人，{int(layer['absorbed'].sum())}点")
+    
+    if args.year is not None:
+        for year, events in log.replay(args.year, args.year):
+            print(f"\n第{year}年的战斗（共{len(events)}场）:")
+            for event in events[:args.limit]:
+                print("  " + log.describe(event))
+            if len(events) > args.limit:
+                print(f"  ……另有{len(events) - args.limit}场")
+    
+    if args.flow:
+        flow = log.cultivation_flow()
+        print("\n修为流动（被吸收时的等级 → 胜者在日志中到达的最高等级）:")
+        for source, destination in zip(*np.nonzero(flow)):
+            source_name = Cultivator.LEVEL_CONFIGS[Cultivator.LEVELS[source]].name
+            destination_name = Cultivator.LEVEL_CONFIGS[Cultivator.LEVELS[destination]].name
+            print(f"  {source_name}期 → {destination_name}期: {flow[source, destination]}点")
+    return 0
+
+def run_benchmark(args) -> int:
+    """运行基准测试子命令，存在性能回退时返回1"""
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f:
+            current = json.load(f)
+        changes = BenchmarkSuite.compare(baseline, current, args.threshold)
+        regressions = [c for c in changes if c['regression']]
+        for c in changes:
+            flag = '  <-- 性能回退' if c['regression'] else ''
+            print(f"{c['engine']} 人口{c['population']} {c['years']}年 每年新增{c['intake']} {c['metric']}: "
+                  f"{c['baseline']:.4g} -> {c['current']:.4g} ({c['change']:+.1%}){flag}")
+        print(f"\n共比较{len(changes)}项指标，{len(regressions)}项性能回退（阈值{args.threshold:.0%}）")
+        return 1 if regressions else 0
+    
+    def parse_list(text):
+        return [int(v) for v in text.split(',')]
+    
+    suite = BenchmarkSuite(args.engines.split(','), parse_list(args.populations), parse_list(args.years_list),
+                           parse_list(args.intakes), args.seed, args.repeat, not args.no_plot)
+    print(f"=== 基准测试: {len(suite.cases())}个用例 ===")
+    results = suite.run(progress=True)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入{args.out}")
+    return 0
+
+def run_server(config: SimulationConfig, args):
+    """运行模拟服务子命令"""
+    session = SimulationSession(config, args.engine or 'object')
+    try:
+        server = SimulationServer(session, args.host, args.port, args.max_lag)
+    except ValueError as e:
+        print(f"错误：{e}")
+        return
+    
+    async def serve():
+        await server.start()
+        print(f"模拟服务已启动: http://{server.host}:{server.port}（WebSocket: ws://{server.host}:{server.port}/ws），"
+              "按Ctrl+C退出")
+        try:
+            await server.serve_forever()
+        finally:
+            await server.stop()
+    
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\n模拟服务已停止")
+
+def main():
+    """主程序"""
+    parser = argparse.ArgumentParser(description='修仙世界模拟器')
+    parser.add_argument('--years', type=int, default=100, help='模拟时长（年），默认100年')
+    parser.add_argument('--absorption-rate', type=float, default=0.1, help='修为吸取比率，默认0.1（10%%）')
+    parser.add_argument('--demo', action='store_true', help='运行演示模式')
+    parser.add_argument('--no-progress', action='store_true', help='不显示进度报告')
+    parser.add_argument('--profile', action='store_true',
+                        help='记录各阶段耗时，以性能剖析报告（阶段耗时、年/秒、修士/秒、预计剩余时间）代替进度报告')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子，指定后结果可完全复现')
+    parser.add_argument('--intake', type=int, default=1000, help='每年新增修士数量，默认1000人')
+    parser.add_argument('--graveyard', choices=Graveyard.MODES, default='recent',
+                        help='陨落修士保存方式：full（完整对象）、summary（全部紧凑记录）、recent（最近--graveyard-capacity条'
+                             '紧凑记录）或 discard（仅计数），默认recent')
+    parser.add_argument('--graveyard-capacity', type=non_negative_int, default=100000, metavar='N',
+                        help='recent墓园保留的陨落记录条数，默认100000')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default=None,
+                        help='模拟引擎：object（逐个对象）、vectorized（结构数组）、event（事件驱动）、memmap（磁盘列文件，'
+                             '常驻内存受--memory-budget限制）或 meanfield（均场近似，演化人数分布而不模拟个体），'
+                             '默认object；继续模拟时默认沿用检查点的引擎')
+    parser.add_argument('--storage-dir', metavar='DIR', default=None,
+                        help='memmap引擎存放修士列文件的目录，默认系统临时目录（运行结束后删除）')
+    parser.add_argument('--memory-budget', type=float, default=256, metavar='MB',
+                        help='memmap引擎分块处理的常驻内存预算（MB），默认256')
+    parser.add_argument('--no-jit', action='store_true', help='不使用numba编译内核（未安装numba时本参数无影响）')
+    parser.add_argument('--encounters', choices=SimulationConfig.ENCOUNTER_MODES, default='sequential',
+                        help='相遇结算方式：sequential（逐个结算）或 batched（按等级整批结算，每人每年至多一战），默认sequential')
+    parser.add_argument('--regions', type=int, default=1, metavar='N',
+                        help='分区世界的区域数，每个区域由一个工作进程模拟，默认1（不分区）')
+    parser.add_argument('--migration-rate', type=float, default=0.0, metavar='X',
+                        help='分区世界中每名修士每年迁往其他区域的概率，默认0')
+    parser.add_argument('--converge-window', type=int, default=0, metavar='YEARS',
+                        help='统计均衡检测的窗口长度（年），比较相邻两个窗口，默认0（不检测）')
+    parser.add_argument('--converge-test', choices=ConvergenceMonitor.TESTS, default='means',
+                        help='平稳性检验：means（窗口均值之差）、welch（均值之差的95%%置信上界）或 trend（线性趋势），默认means')
+    parser.add_argument('--converge-tolerance', type=float, default=0.05,
+                        help='各指标允许的变化量相对均值的比例，默认0.05（5%%）')
+    parser.add_argument('--converge-action', choices=ConvergenceMonitor.ACTIONS, default='stop',
+                        help='达到均衡后：stop（结束模拟）或 sparse（继续模拟，每--sparse-interval年完整统计一次），默认stop')
+    parser.add_argument('--sparse-interval', type=int, default=10, metavar='N',
+                        help='稀疏采样时完整统计的间隔年数，默认10')
+    parser.add_argument('--checkpoint', metavar='FILE', default=None, help='检查点文件路径')
+    parser.add_argument('--checkpoint-every', type=int, default=0, metavar='N',
+                        help='每N年保存一次检查点（需同时指定--checkpoint）')
+    parser.add_argument('--resume', metavar='FILE', default=None,
+                        help='从检查点继续模拟，模拟参数与随机数状态以检查点为准')
+    parser.add_argument('--cache', metavar='DIR', default=None,
+                        help='运行缓存目录：sweep与ensemble中已完成过的相同运行（参数、种子与模拟器版本均相同）直接读取结果')
+    parser.add_argument('--cache-size', type=float, default=1024, metavar='MB', help='运行缓存的大小上限（MB），默认1024')
+    parser.add_argument('--stats-sink', choices=sorted(STATISTICS_SINKS), default='memory',
+                        help='逐年统计的保存方式：memory（内存列表）、array（NumPy列式缓冲）、'
+                             'jsonl/csv（逐行写入--stats-out文件），默认memory')
+    parser.add_argument('--stats-out', metavar='FILE', default=None, help='流式统计输出文件（jsonl/csv）')
+    parser.add_argument('--battle-log', metavar='FILE', default=None,
+                        help='把每场战斗（年份、双方编号与修为、等级、战斗意愿、胜者、吸收修为）记录到FILE，'
+                             '结束时输出战斗日志报告；可用battles子命令查询')
+    parser.add_argument('--battle-log-buffer', type=int, default=65536, metavar='N',
+                        help='战斗日志缓冲区容量（条），写满时整块写入文件，默认65536')
+    plot_group = parser.add_mutually_exclusive_group()
+    plot_group.add_argument('--no-plot', action='store_true', help='不生成统计图表（无界面运行）')
+    plot_group.add_argument('--plot-out', metavar='FILE', default=None,
+                            help='将统计图表渲染到图片文件（如 report.png），不弹出窗口')
+    
+    subparsers = parser.add_subparsers(dest='command')
+    sweep_parser = subparsers.add_parser('sweep', help='参数扫描：在进程池中并行运行参数网格的多个副本')
+    sweep_parser.add_argument('--grid', action='append', required=True,
+                              help='扫描参数及取值，如 absorption_rate=0.05,0.1,0.2，可重复指定')
+    sweep_parser.add_argument('--replicas', type=int, default=1, help='每个参数组合的副本数，默认1')
+    sweep_parser.add_argument('--workers', type=int, default=None, help='工作进程数，默认CPU核数')
+    sweep_parser.add_argument('--out', default='sweep_results.csv', help='结果CSV文件，默认sweep_results.csv')
+    
+    ensemble_parser = subparsers.add_parser('ensemble', help='集合模拟：并行运行副本直到逐年统计的置信区间足够窄')
+    ensemble_parser.add_argument('--ci-width', type=float, default=0.05,
+                                 help='置信区间半宽相对均值的上限，默认0.05（5%%）')
+    ensemble_parser.add_argument('--ci-floor', type=float, default=1.0,
+                                 help='置信区间半宽的绝对容许值（均值接近0的指标以此为准），默认1.0')
+    ensemble_parser.add_argument('--confidence', type=float, default=0.95, help='置信水平，默认0.95')
+    ensemble_parser.add_argument('--min-replicas', type=int, default=5, help='最少副本数，默认5')
+    ensemble_parser.add_argument('--max-replicas', type=int, default=100, help='最多副本数，默认100')
+    ensemble_parser.add_argument('--workers', type=int, default=None, help='工作进程数，默认CPU核数')
+    ensemble_parser.add_argument('--out', default='ensemble_results.csv', help='结果CSV文件（逐年均值与置信区间）')
+    
+    bench_parser = subparsers.add_parser('benchmark', help='性能基准测试：测量不同人口规模下的模拟吞吐量')
+    bench_parser.add_argument('--engines', default='object,vectorized', help='参与测试的引擎，逗号分隔')
+    bench_parser.add_argument('--populations', default='1000,10000', help='初始人口规模，逗号分隔')
+    bench_parser.add_argument('--years', dest='years_list', default='50', help='模拟年数，逗号分隔')
+    bench_parser.add_argument('--intakes', default='1000', help='每年新增修士数量，逗号分隔')
+    bench_parser.add_argument('--seed', type=int, default=0, help='随机种子，默认0')
+    bench_parser.add_argument('--repeat', type=int, default=3, help='每个用例重复次数（取最快一次），默认3')
+    bench_parser.add_argument('--no-plot', action='store_true', help='不测量plot_statistics')
+    bench_parser.add_argument('--out', default='benchmark_results.json', help='结果JSON文件')
+    bench_parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                              help='比较两份结果文件并标记性能回退')
+    bench_parser.add_argument('--threshold', type=float, default=0.1, help='判定性能回退的相对变化阈值，默认0.1')
+    
+    validate_parser = subparsers.add_parser('validate', help='均场引擎验证：与逐个修士模拟的结果比较，报告各指标的误差')
+    validate_parser.add_argument('--reference', default='vectorized',
+                                 choices=sorted(set(ENGINES) - set(APPROXIMATE_ENGINES)),
+                                 help='基准引擎，默认vectorized')
+    validate_parser.add_argument('--replicas', type=int, default=3, help='基准引擎的副本数，默认3')
+    validate_parser.add_argument('--out', default=None, help='将验证结果写入JSON文件')
+    
+    battles_parser = subparsers.add_parser('battles', help='查询战斗日志文件：概况、某修士的击败记录与击杀链、某年的战斗、等级间修为流动')
+    battles_parser.add_argument('log', metavar='FILE', help='--battle-log写出的战斗日志文件')
+    battles_parser.add_argument('--cultivator', type=int, default=None, metavar='ID',
+                                help='输出该修士的击败记录、战死记录与击杀链')
+    battles_parser.add_argument('--depth', type=int, default=3, help='击杀链的最大层数，默认3')
+    battles_parser.add_argument('--year', type=int, default=None, help='重放该年的全部战斗')
+    battles_parser.add_argument('--flow', action='store_true', help='输出等级间的修为流动')
+    battles_parser.add_argument('--limit', type=int, default=20, help='每项最多列出的战斗场数，默认20')
+    
+    serve_parser = subparsers.add_parser('serve', help='本地模拟服务：经HTTP/WebSocket接收命令并逐年推送增量统计')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='监听地址，默认127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765, help='监听端口，默认8765')
+    serve_parser.add_argument('--max-lag', type=int, default=32, metavar='YEARS',
+                              help='模拟最多领先最慢客户端的年数（超过时暂停推进），默认32')
+    
+    args = parser.parse_args()
+    
+    if args.command == 'benchmark':
+        sys.exit(run_benchmark(args))
+    if args.command == 'battles':
+        sys.exit(run_battle_query(args))
+    
+    # 验证参数
+    if args.years <= 0:
+        print("错误：模拟时长必须大于0")
+        return
+    
+    if not 0 < args.absorption_rate <= 1:
+        print("错误：修为吸取比率必须在0-1之间")
+        return
+    
+    if args.intake < 0:
+        print("错误：每年新增修士数量不能为负数")
+        return
+    
+    if args.checkpoint_every > 0 and not args.checkpoint:
+        print("错误：--checkpoint-every 需要同时指定 --checkpoint")
+        return
+    
+    if args.regions < 1:
+        print("错误：区域数必须大于0")
+        return
+    
+    if not 0 <= args.migration_rate <= 1:
+        print("错误：迁徙率必须在0-1之间")
+        return
+    
+    if args.engine == 'memmap' and args.encounters != 'sequential':
+        print("错误：memmap引擎只支持逐个结算相遇（--encounters sequential）")
+        return
+    
+    try:
+        if args.converge_window > 0:
+            ConvergenceMonitor(args.converge_window, args.converge_test, args.converge_tolerance,
+                               args.converge_action, args.sparse_interval)
+    except ValueError as e:
+        print(f"错误：{e}")
+        return
+    
+    if args.regions > 1 and args.converge_window > 0 and args.converge_action == 'sparse':
+        print("错误：分区世界的均衡检测不支持稀疏采样")
+        return
+    
+    if args.engine == 'meanfield' and (args.encounters != 'sequential' or args.regions > 1
+                                       or args.checkpoint or args.resume):
+        print("错误：均场引擎不支持批量相遇结算、分区世界与检查点")
+        return
+    
+    if args.memory_budget <= 0:
+        print("错误：内存预算必须大于0")
+        return
+    
+    if args.battle_log and (args.engine == 'meanfield' or args.regions > 1):
+        print("错误：均场引擎与分区世界不支持战斗日志")
+        return
+    
+    if args.battle_log_buffer <= 0:
+        print("错误：战斗日志缓冲区容量必须大于0")
+        return
+    
+    if args.regions > 1 and (args.checkpoint or args.resume or args.profile):
+        print("错误：分区世界不支持 --checkpoint、--resume 与 --profile")
+        return
+    
+    try:
+        sink = StatisticsSink.create(args.stats_sink, args.stats_out)
+    except ValueError as e:
+        print(f"错误：{e}")
+        return
+    
+    # 创建配置
+    config = SimulationConfig(args.years, args.absorption_rate, args.seed)
+    config.new_cultivators_per_year = args.intake
+    config.graveyard_mode = args.graveyard
+    config.graveyard_capacity = args.graveyard_capacity
+    config.encounter_mode = args.encounters
+    config.convergence_window = args.converge_window
+    config.convergence_test = args.converge_test
+    config.convergence_tolerance = args.converge_tolerance
+    config.convergence_action = args.converge_action
+    config.sparse_interval = args.sparse_interval
+    config.use_jit = not args.no_jit
+    config.storage_dir = args.storage_dir
+    config.memory_budget = int(args.memory_budget * (1 << 20))
+    
+    print("修仙世界模拟器启动...")
+    print(f"模拟参数: {args.years}年, 吸取比率{args.absorption_rate*100:.1f}%, 随机种子{config.rng.entropy}")
+    
+    if args.command == 'sweep':
+        run_sweep(config, args)
+    elif args.command == 'ensemble':
+        run_ensemble(config, args)
+    elif args.command == 'validate':
+        run_validation(config, args)
+    elif args.command == 'serve':
+        run_server(config, args)
+    elif args.demo:
+        # 运行演示模式
+        run_demo(config)
+        
+        # 运行模拟（使用用户指定的年数）
+        run_simulation(config, not args.no_progress, args.engine, not args.no_plot, args.plot_out,
+                       args.checkpoint, args.checkpoint_every, args.resume, sink, args.profile,
+                       args.regions, args.migration_rate, args.battle_log, args.battle_log_buffer)
+    else:
+        # 运行完整模拟
+        run_simulation(config, not args.no_progress, args.engine, not args.no_plot, args.plot_out,
+                       args.checkpoint, args.checkpoint_every, args.resume, sink, args.profile,
+                       args.regions, args.migration_rate, args.battle_log, args.battle_log_buffer)
@@ -0,0 +1,280 @@
+"""修士、境界、随机数与模拟配置"""
+import numpy as np
+from typing import List, Dict, Tuple, Optional
+from dataclasses import dataclass
+from enum import Enum
+import sys
+
+# 模拟器版本：模拟语义变化时递增，使运行缓存中的旧结果失效
+SIMULATOR_VERSION = '2.6'
+
+def load_matplotlib():
+    """按需导入matplotlib并设置中文字体（仅在绘图时调用，作为库导入时无需加载）"""
+    import matplotlib
+    matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'DejaVu Sans']
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    return matplotlib
+
+def jit_available() -> bool:
+    """是否可以使用numba编译的内核（按需导入numba，作为库导入时无需加载）"""
+    from .kernels import JIT_AVAILABLE
+    return JIT_AVAILABLE
+
+class CultivationLevel(Enum):
+    """修炼等级枚举"""
+    LIANQI = 0    # 炼气
+    ZHUJI = 1     # 筑基
+    JIEDAN = 2    # 结丹
+    YUANYING = 3  # 元婴
+    HUASHEN = 4   # 化神
+    LIANXU = 5    # 炼虚
+    HETI = 6      # 合体
+    DACHENG = 7   # 大乘
+
+@dataclass
+class LevelConfig:
+    """等级配置"""
+    name: str
+    required_cultivation: int  # 晋升所需总修为
+    lifespan_bonus: int       # 晋升后增加的寿元
+    base_lifespan: int        # 基础寿元
+
+class RandomStreams:
+    """随机数提供者
+    
+    以numpy.random.Generator作为唯一随机源，由SeedSequence派生。相同种子得到完全
+    相同的模拟结果；spawn派生的子随机流在统计上相互独立，供多副本与多进程使用。
+    """
+    
+    def __init__(self, seed=None):
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+        self.generator = np.random.default_rng(self.seed_sequence)
+    
+    @property
+    def entropy(self) -> int:
+        """根种子（未指定种子时为系统随机生成的熵，可用于复现）"""
+        return self.seed_sequence.entropy
+    
+    def spawn(self, count: int) -> List['RandomStreams']:
+        """派生count个相互独立且可复现的子随机流"""
+        return [RandomStreams(child) for child in self.seed_sequence.spawn(count)]
+    
+    def fresh_seed_sequence(self) -> np.random.SeedSequence:
+        """根种子序列的副本（派生计数从零开始）
+        
+        SeedSequence.spawn会推进派生计数，直接从根种子派生时同一配置的第二次运行得到不同的子随机流；
+        每次运行从新副本派生，子随机流（及其运行缓存键）只取决于种子与派生顺序。
+        """
+        seed_sequence = self.seed_sequence
+        return np.random.SeedSequence(seed_sequence.entropy, spawn_key=seed_sequence.spawn_key,
+                                      pool_size=seed_sequence.pool_size)
+
+class SimulationConfig:
+    """模拟配置类"""
+    
+    # 描述一次模拟的参数（不含随机种子）
+    PARAMETERS = ('simulation_years', 'absorption_rate', 'new_cultivators_per_year', 'graveyard_mode',
+                  'graveyard_capacity', 'encounter_mode', 'convergence_window', 'convergence_test', 'convergence_tolerance',
+                  'convergence_action', 'sparse_interval')
+    # 只影响执行方式、不影响模拟结果的选项：不参与运行缓存键，由get_options随模拟参数一起传给工作进程
+    OPTIONS = ('use_jit', 'storage_dir', 'memory_budget')
+    # 相遇结算方式：sequential逐个结算，batched按等级整批结算（见resolve_encounters_batched）
+    ENCOUNTER_MODES = ('sequential', 'batched')
+    
+    def __init__(self, simulation_years: int = 100, absorption_rate: float = 0.1, seed: int = None):
+        self.simulation_years = simulation_years  # 模拟时长（年）
+        self.absorption_rate = absorption_rate    # 修为吸取比率
+        self.seed = seed                          # 随机种子，None表示不固定
+        self.rng = RandomStreams(seed)            # 随机数提供者
+        self.new_cultivators_per_year = 1000     # 每年新增修士数量
+        self.graveyard_mode = 'recent'           # 陨落修士保存方式（见Graveyard.MODES）
+        self.graveyard_capacity = 100000         # recent模式保留的最近陨落记录条数
+        self.encounter_mode = 'sequential'       # 相遇结算方式（见ENCOUNTER_MODES）
+        # 统计均衡检测（见ConvergenceMonitor），窗口为0表示不检测
+        self.convergence_window = 0
+        self.convergence_test = 'means'
+        self.convergence_tolerance = 0.05
+        self.convergence_action = 'stop'
+        self.sparse_interval = 10
+        # 执行选项（见OPTIONS）
+        self.use_jit = True                      # 安装了numba时是否使用编译内核
+        self.storage_dir: Optional[str] = None   # memmap引擎磁盘列文件所在目录（None为系统临时目录）
+        self.memory_budget = 256 << 20           # memmap引擎的常驻内存预算（字节）
+        
+    def get_params(self) -> Dict:
+        """获取模拟参数"""
+        return {name: getattr(self, name) for name in self.PARAMETERS}
+    
+    def get_options(self) -> Dict:
+        """获取执行选项"""
+        return {name: getattr(self, name) for name in self.OPTIONS}
+    
+    @classmethod
+    def from_params(cls, params: Dict, seed=None, options: Dict = None) -> 'SimulationConfig':
+        """由模拟参数（与执行选项）创建配置，未给出的参数使用默认值"""
+        config = cls(seed=seed)
+        for name, value in params.items():
+            if name not in cls.PARAMETERS:
+                raise ValueError(f"未知的模拟参数: {name}")
+            setattr(config, name, value)
+        for name, value in (options or {}).items():
+            if name not in cls.OPTIONS:
+                raise ValueError(f"未知的执行选项: {name}")
+            setattr(config, name, value)
+        return config
+    
+    def get_starting_age(self) -> int:
+        """获取开始修炼年龄（6-10岁正态分布）"""
+        age = self.rng.generator.normal(8, 1)  # 均值8岁，标准差1
+        return max(6, min(10, int(round(age))))  # 限制在6-10岁之间
+    
+    def draw_cohort(self, count: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        """一次性抽取一批修士的开始修炼年龄与勇气值
+        
+        年龄与勇气值在同一次向量化正态分布调用中生成，分布与单个抽取相同：
+        年龄均值8岁、标准差1，限制在6-10岁；勇气均值0.5、标准差0.15，限制在0-1之间。
+        """
+        draws = rng.normal((8, 0.5), (1, 0.15), size=(count, 2))
+        ages = np.clip(np.rint(draws[:, 0]), 6, 10).astype(np.int64)
+        courages = np.clip(draws[:, 1], 0, 1)
+        return ages, courages
+
+class Cultivator:
+    """修士类
+    
+    使用__slots__且以整数下标（level_index）保存等级，level属性按需换算为CultivationLevel；
+    晋升所需修为与寿元加成预先计算为按等级下标索引的元组，逐年修炼不再构造枚举或查询字典。
+    修士只保存自身状态，不引用配置或所属世界：吸取比率与世界的增量统计（aggregates）由世界作为参数传入。
+    """
+    
+    __slots__ = ('id', 'age', 'cultivation_points', 'level_index', 'courage', 'max_lifespan',
+                 'is_alive', 'defeats_count', 'battles_count', 'birth_year')
+    
+    # 等级配置
+    LEVEL_CONFIGS = {
+        CultivationLevel.LIANQI: LevelConfig("炼气", 10, 0, 100),
+        CultivationLevel.ZHUJI: LevelConfig("筑基", 100, 0, 100),
+        CultivationLevel.JIEDAN: LevelConfig("结丹", 1000, 800, 100),
+        CultivationLevel.YUANYING: LevelConfig("元婴", 10000, 8000, 100),
+        CultivationLevel.HUASHEN: LevelConfig("化神", 100000, 80000, 100),
+        CultivationLevel.LIANXU: LevelConfig("炼虚", 1000000, 800000, 100),
+        CultivationLevel.HETI: LevelConfig("合体", 10000000, 8000000, 100),
+        CultivationLevel.DACHENG: LevelConfig("大乘", 100000000, 80000000, 100),
+    }
+    # 按等级下标索引的等级枚举
+    LEVELS = tuple(CultivationLevel)
+    # 各等级晋升到下一等级所需修为（最高等级不可晋升）
+    ADVANCE_THRESHOLDS = tuple(level_config.required_cultivation
+                               for level_config in list(LEVEL_CONFIGS.values())[1:]) + (sys.maxsize,)
+    # 晋升到各等级时增加的寿元
+    LIFESPAN_BONUSES = tuple(level_config.lifespan_bonus for level_config in LEVEL_CONFIGS.values())
+    
+    def __init__(self, cultivator_id: int, config: SimulationConfig,
+                 age: int = None, courage: float = None):
+        self.id = cultivator_id
+        # 配置只用于抽取未指定的开始年龄与勇气值，不保存在修士中；未指定时按正态分布随机生成开始年龄与勇气值
+        self.age = config.get_starting_age() if age is None else age  # 使用正态分布的开始年龄
+        self.cultivation_points = 0  # 修为点数
+        self.level_index = CultivationLevel.LIANQI.value
+        if courage is None:
+            courage = config.rng.generator.normal(0.5, 0.15)  # 勇气值，正态分布
+            courage = max(0, min(1, courage))  # 限制在0-1之间
+        self.courage = courage
+        self.max_lifespan = 100  # 最大寿元
+        self.is_alive = True
+        self.defeats_count = 0  # 击败敌人的数量
+        self.battles_count = 0  # 参与战斗的次数
+        self.birth_year = 0  # 出生年份，将在世界中设置
+    
+    @property
+    def level(self) -> CultivationLevel:
+        """修炼等级"""
+        return self.LEVELS[self.level_index]
+    
+    @level.setter
+    def level(self, level: CultivationLevel):
+        self.level_index = level.value if isinstance(level, CultivationLevel) else int(level)
+        
+    def get_remaining_lifespan(self) -> int:
+        """获取剩余寿元"""
+        return max(0, self.max_lifespan - self.age)
+    
+    def can_advance(self) -> bool:
+        """检查是否可以晋升"""
+        # 最高等级的晋升门槛为sys.maxsize，永远无法达到
+        return self.cultivation_points >= self.ADVANCE_THRESHOLDS[self.level_index]
+    
+    def advance_level(self, aggregates=None):
+        """晋升等级（传入aggregates时同时更新世界的增量统计）"""
+        old_level = self.level_index
+        if self.cultivation_points < self.ADVANCE_THRESHOLDS[old_level]:
+            return False
+        
+        self.level_index = old_level + 1
+        
+        # 增加寿元
+        lifespan_bonus = self.LIFESPAN_BONUSES[old_level + 1]
+        self.max_lifespan += lifespan_bonus
+        
+        if aggregates is not None and self.is_alive:
+            aggregates.on_advance(self, old_level, lifespan_bonus)
+        
+        return True
+    
+    def die(self, aggregates=None):
+        """陨落（传入aggregates时同时移出世界的增量统计）"""
+        if self.is_alive:
+            self.is_alive = False
+            if aggregates is not None:
+                aggregates.remove(self)
+    
+    def cultivate_yearly(self, aggregates=None):
+        """每年修炼，增加1点修为（aggregates含义同die与advance_level）"""
+        if self.is_alive:
+            self.cultivation_points += 1
+            self.age += 1
+            
+            # 检查是否寿元耗尽
+            if self.age >= self.max_lifespan:
+                self.die(aggregates)
+            
+            # 自动晋升（如果可以）
+            if self.cultivation_points >= self.ADVANCE_THRESHOLDS[self.level_index]:
+                self.advance_level(aggregates)
+    
+    def calculate_win_rate(self, opponent: 'Cultivator') -> float:
+        """计算对战胜率"""
+        total_cultivation = self.cultivation_points + opponent.cultivation_points
+        if total_cultivation == 0:
+            return 0.5
+        return self.cultivation_points / total_cultivation
+    
+    def will_fight(self, opponent: 'Cultivator') -> bool:
+        """判断是否会选择战斗"""
+        win_rate = self.calculate_win_rate(opponent)
+        defeat_rate = 1 - win_rate
+        return self.courage > defeat_rate
+    
+    def absorb_cultivation(self, defeated_opponent: 'Cultivator', absorption_rate: float,
+                           aggregates=None) -> int:
+        """按世界配置的吸取比率吸收被击败对手的修为，返回吸收的修为"""
+        absorbed = int(defeated_opponent.cultivation_points * absorption_rate)
+        self.cultivation_points += absorbed
+        self.defeats_count += 1  # 增加击败计数
+        self.battles_count += 1  # 增加战斗计数
+        
+        if aggregates is not None:
+            aggregates.on_absorb(self, absorbed)
+        return absorbed
+    
+    def lose_battle(self, aggregates=None):
+        """战败陨落"""
+        # 先移出存活统计，再记录败者的战斗次数
+        self.die(aggregates)
+        self.battles_count += 1  # 败者也增加战斗计数
+    
+    def __str__(self):
+        return f"修士{self.id}: {self.LEVEL_CONFIGS[self.LEVELS[self.level_index]].name}期 修为:{self.cultivation_points} 年龄:{self.age} 寿元:{self.get_remaining_lifespan()} 击败:{self.defeats_count}人 战斗:{self.battles_count}次"
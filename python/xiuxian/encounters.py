@@ -0,0 +1,113 @@
+"""相遇结算：同级存活成员索引与整批结算"""
+import bisect
+import numpy as np
+from typing import List, Tuple
+
+class LiveMemberIndex:
+    """同级存活修士索引
+    
+    以交换删除数组保存成员，并用位置映射记录每个成员在数组中的下标，
+    从而支持O(1)随机抽取对手与O(1)移除战死者。成员可以是修士对象或数组下标。
+    """
+    
+    def __init__(self, members):
+        self.members = list(members)
+        self.positions = {member: i for i, member in enumerate(self.members)}
+    
+    def __len__(self) -> int:
+        return len(self.members)
+    
+    def remove(self, member):
+        """移除成员：用末尾成员填补空位"""
+        pos = self.positions.pop(member)
+        last = self.members.pop()
+        if pos < len(self.members):
+            self.members[pos] = last
+            self.positions[last] = pos
+    
+    def sample_other(self, member, u: float):
+        """根据[0,1)均匀随机数u，从除member以外的存活成员中等概率抽取一个"""
+        j = int(u * (len(self.members) - 1))
+        if j >= self.positions[member]:
+            j += 1
+        return self.members[j]
+
+class SortedLiveMemberIndex(LiveMemberIndex):
+    """按升序给出成员的同级存活修士索引
+    
+    位置映射只记录被交换移动过的成员，未移动成员的位置由在初始成员中二分查找得到，
+    建立索引无需逐个登记成员。抽取与移除的结果与LiveMemberIndex完全相同。
+    """
+    
+    def __init__(self, members: List[int]):
+        self.initial = members
+        self.members = list(members)
+        self.positions = {}
+    
+    def _position(self, member) -> int:
+        pos = self.positions.get(member)
+        return bisect.bisect_left(self.initial, member) if pos is None else pos
+    
+    def remove(self, member):
+        """移除成员：用末尾成员填补空位"""
+        pos = self._position(member)
+        self.positions.pop(member, None)
+        last = self.members.pop()
+        if pos < len(self.members):
+            self.members[pos] = last
+            self.positions[last] = pos
+    
+    def sample_other(self, member, u: float):
+        """根据[0,1)均匀随机数u，从除member以外的存活成员中等概率抽取一个"""
+        j = int(u * (len(self.members) - 1))
+        if j >= self._position(member):
+            j += 1
+        return self.members[j]
+
+def resolve_encounters_batched(points: np.ndarray, courages: np.ndarray, encounter_probability: float,
+                               draws: np.ndarray, absorption_rate: float
+                               ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """以整列运算批量结算同一等级内一年的相遇与战斗
+    
+    points、courages为该等级存活修士（按编号排序）的修为与勇气值，draws为每人三个随机数
+    （相遇、选择对手、战斗结果），与逐个结算消耗的随机数完全相同。返回(胜者, 败者, 吸收修为, 战斗事件)，
+    胜者与败者为成员下标，战斗事件的格式见BattleLog.EVENT_COLUMNS（双方为成员下标）。与逐个结算的区别：
+    
+    - 全部相遇、对手与战斗意愿都按年初状态同时决定，年内战死者仍可能被选为对手；
+    - 每名修士每年至多参加一场战斗：按发起者编号顺序，一场战斗只有在它同时是双方各自
+      卷入的最早一场时才发生，否则取消（被取消的战斗不会顺延给双方的后续相遇）；
+    - 胜者吸收的是败者年初的修为，同一年内不会连续吸收。
+    """
+    n = len(points)
+    initiators = np.flatnonzero(draws[:, 0] < encounter_probability)
+    # 从除自己以外的同级修士中等概率选择对手（与LiveMemberIndex.sample_other的映射相同）
+    opponents = (draws[initiators, 1] * (n - 1)).astype(np.int64)
+    opponents += opponents >= initiators
+    
+    # 判断是否发生战斗：任一方勇气值 > 自己的战败率
+    initiator_points = points[initiators]
+    total = initiator_points + points[opponents]
+    win_rates = np.divide(initiator_points, total, out=np.full(len(total), 0.5), where=total > 0)
+    opponent_rates = np.divide(points[opponents], total, out=np.full(len(total), 0.5), where=total > 0)
+    initiator_fights = courages[initiators] > 1 - win_rates
+    opponent_fights = courages[opponents] > 1 - opponent_rates
+    fights = initiator_fights | opponent_fights
+    initiators, opponents = initiators[fights], opponents[fights]
+    win_rates, battle_rolls = win_rates[fights], draws[initiators, 2]
+    initiator_fights, opponent_fights = initiator_fights[fights], opponent_fights[fights]
+    
+    # 每名修士只保留其卷入的最早一场战斗
+    order = np.arange(len(initiators))
+    first_fight = np.full(n, len(initiators))
+    np.minimum.at(first_fight, initiators, order)
+    np.minimum.at(first_fight, opponents, order)
+    kept = (first_fight[initiators] == order) & (first_fight[opponents] == order)
+    initiators, opponents = initiators[kept], opponents[kept]
+    initiator_wins = battle_rolls[kept] < win_rates[kept]
+    
+    winners = np.where(initiator_wins, initiators, opponents)
+    losers = np.where(initiator_wins, opponents, initiators)
+    absorbed = (points[losers] * absorption_rate).astype(np.int64)
+    events = np.column_stack([initiators, opponents, points[initiators], points[opponents],
+                              initiator_fights[kept], opponent_fights[kept], initiator_wins, absorbed]).astype(np.int64)
+    return winners, losers, absorbed, events
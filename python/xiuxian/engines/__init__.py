@@ -0,0 +1,28 @@
+"""模拟引擎"""
+from ..core import RandomStreams, SimulationConfig
+from ..sinks import StatisticsSink
+from .base import CultivationWorld
+from .vectorized import VectorizedCultivationWorld
+from .event import EventDrivenCultivationWorld
+from .memmap import MemmapCultivationWorld
+from .meanfield import MeanFieldCultivationWorld
+
+# 可选的模拟引擎
+ENGINES = {
+    'object': CultivationWorld,
+    'vectorized': VectorizedCultivationWorld,
+    'event': EventDrivenCultivationWorld,
+    'memmap': MemmapCultivationWorld,
+    'meanfield': MeanFieldCultivationWorld,
+}
+# 结果与逐个修士模拟不同的近似引擎
+APPROXIMATE_ENGINES = ('meanfield',)
+# 相同种子下结果与对象引擎逐位相同的引擎（memmap以float32保存勇气值，极少数情况下会不同）
+EXACT_ENGINES = ('object', 'vectorized', 'event')
+
+def create_world(config: SimulationConfig, engine: str = 'object', rng: RandomStreams = None,
+                 sink: StatisticsSink = None) -> CultivationWorld:
+    """按名称创建模拟引擎"""
+    if engine not in ENGINES:
+        raise ValueError(f"未知的模拟引擎: {engine}")
+    return ENGINES[engine](config, rng, sink)
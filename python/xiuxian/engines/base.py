@@ -0,0 +1,636 @@
+"""对象引擎：CultivationWorld，也是各引擎的基类"""
+import numpy as np
+from typing import List, Dict, Tuple, Optional
+import json
+import os
+import time
+
+from ..core import CultivationLevel, Cultivator, RandomStreams, SimulationConfig, load_matplotlib
+from ..encounters import LiveMemberIndex, resolve_encounters_batched
+from ..records import BattleLog, Graveyard, LevelAggregates
+from ..sinks import MemorySink, StatisticsSink, decimate_minmax, statistics_rows
+from ..monitors import ConvergenceMonitor, PhaseProfiler
+
+class CultivationWorld:
+    """修仙世界模拟器"""
+    
+    engine_name = 'object'
+    # 检查点中保存的修士字段（按列）
+    POPULATION_FIELDS = ('id', 'age', 'cultivation_points', 'level', 'courage',
+                         'max_lifespan', 'defeats', 'battles', 'birth_year')
+    CHECKPOINT_VERSION = 1
+    
+    def __init__(self, config: SimulationConfig, rng: RandomStreams = None, sink: StatisticsSink = None):
+        self.config = config
+        # 默认使用配置中的随机流；多副本运行时应为每个世界传入spawn得到的独立随机流
+        self.random_streams = rng if rng is not None else config.rng
+        self.rng = self.random_streams.generator
+        self.cultivators: List[Cultivator] = []
+        self.graveyard = Graveyard(config.graveyard_mode, config.graveyard_capacity)
+        self.aggregates = LevelAggregates()
+        self.year = 0
+        self.next_id = 1
+        self.id_stride = 1  # 新修士编号的步长（分区世界中各区域编号互不重叠）
+        # 逐年统计写入统计接收器，默认保存在内存中
+        self.sink = sink if sink is not None else MemorySink()
+        # 分阶段计时器，默认关闭
+        self.profiler: Optional[PhaseProfiler] = None
+        # 统计均衡检测器，未开启时为None
+        self.monitor = ConvergenceMonitor.from_config(config)
+        # 战斗事件日志，默认关闭
+        self.battle_log: Optional[BattleLog] = None
+    
+    def enable_battle_log(self, path: str = None, capacity: int = 65536) -> BattleLog:
+        """开启战斗事件日志（指定path时写入该文件，否则写入匿名临时文件），返回日志"""
+        if self.battle_log is None:
+            self.battle_log = BattleLog(path, capacity)
+        return self.battle_log
+    
+    def enable_profiling(self) -> PhaseProfiler:
+        """开启分阶段计时，返回计时器"""
+        if self.profiler is None:
+            self.profiler = PhaseProfiler()
+        return self.profiler
+    
+    def disable_profiling(self):
+        """关闭分阶段计时"""
+        self.profiler = None
+    
+    def get_phase_timings(self) -> Dict[str, List[int]]:
+        """逐年各阶段耗时（纳秒），未开启计时时为空"""
+        if self.profiler is None:
+            return {phase: [] for phase in PhaseProfiler.PHASES}
+        return {phase: list(values) for phase, values in self.profiler.phase_ns.items()}
+    
+    @property
+    def statistics(self) -> Dict:
+        """全部逐年统计（total_cultivators、level_distribution、battles、deaths、top_killers）"""
+        return self.sink.get_statistics()
+        
+    def allocate_ids(self, count: int) -> np.ndarray:
+        """为count名新修士分配递增的编号"""
+        ids = np.arange(self.next_id, self.next_id + count * self.id_stride, self.id_stride, dtype=np.int64)
+        self.next_id += count * self.id_stride
+        return ids
+    
+    def close(self):
+        """模拟结束时释放资源（关闭统计接收器，写出战斗日志）"""
+        self.sink.close()
+        if self.battle_log is not None:
+            self.battle_log.close()
+    
+    @property
+    def equilibrium_year(self) -> Optional[int]:
+        """检测到的均衡开始年份，未开启检测或尚未均衡时为None"""
+        return self.monitor.equilibrium_year if self.monitor is not None else None
+    
+    def is_finished(self) -> bool:
+        """是否达到模拟时长，或已达到均衡且设置为均衡后结束"""
+        return (self.year >= self.config.simulation_years
+                or (self.monitor is not None and self.monitor.should_stop()))
+    
+    def record_row(self, row: Dict):
+        """写入一行统计并交给均衡检测器"""
+        self.sink.record(row)
+        if self.monitor is not None:
+            self.monitor.observe(row)
+    
+    def set_cultivator_birth_year(self, cultivator: Cultivator):
+        """设置修士的出生年份"""
+        cultivator.birth_year = max(1, self.year - cultivator.age + 1)  # 确保出生年份至少为第1年
+    
+    def add_new_cultivators(self, count: int = None):
+        """每年新增筑基成功的修士"""
+        if count is None:
+            count = self.config.new_cultivators_per_year
+        
+        # 整批抽取开始修炼年龄与勇气值；筑基成功年龄 = 开始修炼年龄 + 10年
+        ages, courages = self.config.draw_cohort(count, self.rng)
+        ages += 10
+        birth_years = np.maximum(1, self.year - ages + 1)  # 确保出生年份至少为第1年
+        
+        cohort = [Cultivator(cultivator_id, self.config, age, courage)
+                  for cultivator_id, age, courage in zip(self.allocate_ids(count).tolist(),
+                                                          ages.tolist(), courages.tolist())]
+        for cultivator, birth_year in zip(cohort, birth_years.tolist()):
+            cultivator.cultivation_points = 10  # 筑基期起始修为
+            cultivator.level_index = CultivationLevel.ZHUJI.value
+            cultivator.birth_year = birth_year
+            self.aggregates.add(cultivator)
+        self.cultivators.extend(cohort)
+    
+    def get_cultivators_by_level(self, level: CultivationLevel) -> List[Cultivator]:
+        """获取指定等级的修士"""
+        return [c for c in self.cultivators if c.is_alive and c.level == level]
+    
+    def simulate_encounters(self):
+        """模拟修士相遇和战斗"""
+        if self.config.encounter_mode == 'batched':
+            return self._simulate_encounters_batched()
+        
+        battles_this_year = 0
+        deaths_this_year = 0
+        
+        # 按等级分组，只考虑筑基及以上的修士
+        level_groups = [[] for _ in CultivationLevel]
+        for c in self.cultivators:
+            if c.is_alive and c.level_index >= 1:
+                level_groups[c.level_index].append(c)
+        del level_groups[0]
+        total_count = sum(len(group) for group in level_groups)
+        
+        if total_count == 0:
+            return battles_this_year, deaths_this_year
+        
+        absorption_rate, aggregates = self.config.absorption_rate, self.aggregates
+        # 模拟每个等级内的相遇
+        for cultivators_in_level in level_groups:
+            if len(cultivators_in_level) < 2:
+                continue
+            
+            encounter_probability = len(cultivators_in_level) / total_count
+            live_index = LiveMemberIndex(cultivators_in_level)
+            # 每个修士每年固定使用三个随机数（相遇、选择对手、战斗结果），随机数流与结算过程无关
+            draws = self.rng.random((len(cultivators_in_level), 3)).tolist()
+            events = [] if self.battle_log is not None else None
+            
+            # 每个修士都有概率遇到同级修士
+            for cultivator, (encounter_roll, opponent_roll, battle_roll) in zip(cultivators_in_level, draws):
+                if not cultivator.is_alive:
+                    continue
+                
+                if encounter_roll < encounter_probability:
+                    # 随机选择一个同级对手
+                    if len(live_index) > 1:
+                        opponent = live_index.sample_other(cultivator, opponent_roll)
+                        
+                        # 判断是否发生战斗
+                        cultivator_fights = cultivator.will_fight(opponent)
+                        opponent_fights = opponent.will_fight(cultivator)
+                        
+                        if cultivator_fights or opponent_fights:
+                            battles_this_year += 1
+                            
+                            # 计算战斗结果
+                            win_rate = cultivator.calculate_win_rate(opponent)
+                            if events is not None:
+                                initiator_wins = battle_roll < win_rate
+                                loser = opponent if initiator_wins else cultivator
+                                events.append((cultivator.id, opponent.id, cultivator.cultivation_points,
+                                               opponent.cultivation_points, cultivator_fights, opponent_fights,
+                                               initiator_wins,
+                                               int(loser.cultivation_points * absorption_rate)))
+                            if battle_roll < win_rate:
+                                # cultivator胜利
+                                cultivator.absorb_cultivation(opponent, absorption_rate, aggregates)
+                                opponent.lose_battle(aggregates)
+                                live_index.remove(opponent)
+                                deaths_this_year += 1
+                            else:
+                                # opponent胜利
+                                opponent.absorb_cultivation(cultivator, absorption_rate, aggregates)
+                                cultivator.lose_battle(aggregates)
+                                live_index.remove(cultivator)
+                                deaths_this_year += 1
+            if events:
+                self.battle_log.record(self.year, cultivators_in_level[0].level_index, events)
+        
+        return battles_this_year, deaths_this_year
+    
+    def _simulate_encounters_batched(self):
+        """按等级整批结算相遇和战斗（规则见resolve_encounters_batched）"""
+        battles_this_year = 0
+        
+        # 按等级分组，只考虑筑基及以上的修士
+        level_groups = [[] for _ in CultivationLevel]
+        for c in self.cultivators:
+            if c.is_alive and c.level_index >= 1:
+                level_groups[c.level_index].append(c)
+        del level_groups[0]
+        total_count = sum(len(group) for group in level_groups)
+        
+        for members in level_groups:
+            if len(members) < 2:
+                continue
+            draws = self.rng.random((len(members), 3))
+            points = np.array([c.cultivation_points for c in members], dtype=np.int64)
+            courages = np.array([c.courage for c in members], dtype=np.float64)
+            winners, losers, _, events = resolve_encounters_batched(points, courages, len(members) / total_count,
+                                                                    draws, self.config.absorption_rate)
+            if self.battle_log is not None:
+                self.battle_log.record(self.year, members[0].level_index, events,
+                                       np.array([c.id for c in members], dtype=np.int64))
+            for winner, loser in zip(winners.tolist(), losers.tolist()):
+                members[winner].absorb_cultivation(members[loser], self.config.absorption_rate, self.aggregates)
+                members[loser].lose_battle(self.aggregates)
+            battles_this_year += len(winners)
+        
+        return battles_this_year, battles_this_year
+    
+    def cultivate_all(self):
+        """所有修士修炼一年"""
+        aggregates = self.aggregates
+        aggregates.advance_tick()
+        for cultivator in self.cultivators:
+            cultivator.cultivate_yearly(aggregates)
+    
+    def simulate_year(self):
+        """模拟一年"""
+        if self.profiler is not None:
+            self._simulate_year_profiled()
+            return
+        
+        self.year += 1
+        
+        # 所有修士修炼
+        self.cultivate_all()
+        
+        # 新增筑基修士
+        self.add_new_cultivators()
+        
+        # 模拟相遇和战斗
+        battles, deaths = self.simulate_encounters()
+        
+        # 将陨落修士移入墓园
+        self.bury_dead()
+        
+        # 记录统计信息
+        self.record_statistics(battles, deaths)
+    
+    def _simulate_year_profiled(self):
+        """模拟一年，并记录各阶段耗时"""
+        clock = time.perf_counter_ns
+        self.year += 1
+        
+        t0 = clock()
+        self.cultivate_all()
+        t1 = clock()
+        self.add_new_cultivators()
+        t2 = clock()
+        battles, deaths = self.simulate_encounters()
+        t3 = clock()
+        self.bury_dead()
+        t4 = clock()
+        row = self.record_statistics(battles, deaths)
+        t5 = clock()
+        
+        # 人口取自本年刚记录的统计行，不从统计接收器读回历史；稀疏采样跳过的年份在计时之外另行统计
+        population = row['total_cultivators']
+        if population is None:
+            population = sum(self.get_level_counts())
+        self.profiler.record_year(self.year, population,
+                                  (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4))
+    
+    def bury_dead(self):
+        """将本年陨落的修士移出活跃集合"""
+        dead = [c for c in self.cultivators if not c.is_alive]
+        if not dead:
+            return
+        self.cultivators = [c for c in self.cultivators if c.is_alive]
+        self.graveyard.bury(self.year,
+                            [c.id for c in dead],
+                            [c.level_index for c in dead],
+                            [c.defeats_count for c in dead],
+                            [c.cultivation_points for c in dead],
+                            cultivators=dead)
+    
+    def record_statistics(self, battles: int, deaths: int) -> Dict:
+        """记录本年统计信息，返回记录的统计行"""
+        if self.monitor is not None and not self.monitor.is_sample_year(self.year):
+            # 均衡后稀疏采样：本年不统计人口、等级分布与杀戮之王，记为缺失
+            row = {'year': self.year, 'total_cultivators': None, 'battles': battles, 'deaths': deaths,
+                   'level_distribution': None, 'top_killer': None}
+            self.record_row(row)
+            return row
+        
+        level_counts = self.get_level_counts()
+        
+        # 记录等级分布
+        level_dist = {}
+        for level in CultivationLevel:
+            level_dist[level.name] = level_counts[level.value]
+        
+        # 记录击败数最多的修士
+        top_killer = self.get_top_killer()
+        if top_killer is not None:
+            top_killer = {
+                'year': self.year,
+                'cultivator_id': top_killer.id,
+                'defeats': top_killer.defeats_count,
+                'level': top_killer.level.name,
+                'cultivation': top_killer.cultivation_points
+            }
+        
+        row = {
+            'year': self.year,
+            'total_cultivators': sum(level_counts),
+            'battles': battles,
+            'deaths': deaths,
+            'level_distribution': level_dist,
+            'top_killer': top_killer,
+        }
+        self.record_row(row)
+        return row
+    
+    @staticmethod
+    def _population_columns(cultivators: List[Cultivator]) -> Dict[str, np.ndarray]:
+        """将一批修士的状态按列导出"""
+        return {
+            'id': np.array([c.id for c in cultivators], dtype=np.int64),
+            'age': np.array([c.age for c in cultivators], dtype=np.int64),
+            'cultivation_points': np.array([c.cultivation_points for c in cultivators], dtype=np.int64),
+            'level': np.array([c.level_index for c in cultivators], dtype=np.int8),
+            'courage': np.array([c.courage for c in cultivators], dtype=np.float64),
+            'max_lifespan': np.array([c.max_lifespan for c in cultivators], dtype=np.int64),
+            'defeats': np.array([c.defeats_count for c in cultivators], dtype=np.int64),
+            'battles': np.array([c.battles_count for c in cultivators], dtype=np.int64),
+            'birth_year': np.array([c.birth_year for c in cultivators], dtype=np.int64),
+        }
+    
+    def export_population(self) -> Dict[str, np.ndarray]:
+        """按列导出存活修士状态"""
+        return self._population_columns([c for c in self.cultivators if c.is_alive])
+    
+    def remove_population(self, selected: np.ndarray) -> Dict[str, np.ndarray]:
+        """移出存活修士中selected为True者（selected与export_population的行一一对应），按列返回其状态
+        
+        其余修士保持原有顺序。分区世界以此送出迁徙修士，无需导出并重新导入全部修士。
+        """
+        alive = [c for c in self.cultivators if c.is_alive]
+        flags = selected.tolist()
+        leaving = [c for c, flag in zip(alive, flags) if flag]
+        for cultivator in leaving:
+            self.aggregates.remove(cultivator)
+        self.cultivators = [c for c, flag in zip(alive, flags) if not flag]
+        return self._population_columns(leaving)
+    
+    def merge_population(self, columns: Dict[str, np.ndarray]):
+        """并入一批修士（按列传入，如迁入的修士），全部修士按编号升序排列"""
+        self._add_population(columns)
+        self.cultivators.sort(key=lambda c: c.id)
+    
+    def import_population(self, columns: Dict[str, np.ndarray]):
+        """按列导入修士，替换当前全部修士"""
+        self.aggregates = LevelAggregates()
+        self.cultivators = []
+        self._add_population(columns)
+    
+    def _add_population(self, columns: Dict[str, np.ndarray]):
+        """按列创建修士并加入世界"""
+        rows = zip(*(columns[field].tolist() for field in self.POPULATION_FIELDS))
+        for cultivator_id, age, points, level, courage, max_lifespan, defeats, battles, birth_year in rows:
+            cultivator = Cultivator(cultivator_id, self.config, age, courage)
+            cultivator.cultivation_points = points
+            cultivator.level_index = level
+            cultivator.max_lifespan = max_lifespan
+            cultivator.defeats_count = defeats
+            cultivator.battles_count = battles
+            cultivator.birth_year = birth_year
+            self.aggregates.add(cultivator)
+            self.cultivators.append(cultivator)
+    
+    def save_checkpoint(self, path: str):
+        """保存检查点
+        
+        检查点为按列保存的NumPy数组文件，包含全部存活修士、年份、下一个修士编号、
+        累计统计、墓园、随机数生成器状态以及（开启时的）战斗日志。先写入临时文件再替换，写入中断不会损坏旧检查点。
+        """
+        meta = {
+            'version': self.CHECKPOINT_VERSION,
+            'engine': self.engine_name,
+            'year': self.year,
+            'next_id': self.next_id,
+            'params': self.config.get_params(),
+            'seed': self.random_streams.entropy,
+            'rng_state': self.rng.bit_generator.state,
+        }
+        arrays = {}
+        for field, column in self.export_population().items():
+            arrays['population_' + field] = column
+        meta['sink'] = self.sink.kind
+        for key, column in self.sink.export_state().items():
+            arrays['statistics_' + key] = column
+        for key, column in self.graveyard.export_state().items():
+            arrays['graveyard_' + key] = column
+        meta['battle_log'] = self.battle_log is not None
+        if self.battle_log is not None:
+            for key, column in self.battle_log.export_state().items():
+                arrays['battle_log_' + key] = column
+        
+        arrays['meta'] = np.array(json.dumps(meta))
+        
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    
+    @staticmethod
+    def load_checkpoint(path: str, engine: str = None, options: Dict = None) -> 'CultivationWorld':
+        """从检查点恢复世界，继续模拟的结果与不中断运行完全一致
+        
+        engine为空时使用保存检查点的引擎；各引擎的修士状态可以互相导入。
+        统计接收器与保存时类型相同，流式接收器会截断到检查点位置后继续追加原文件；战斗日志文件同样截断后继续追加。
+        """
+        with np.load(path) as data:
+            arrays = {key: data[key] for key in data.files}
+        meta = json.loads(str(arrays['meta']))
+        if meta['version'] != CultivationWorld.CHECKPOINT_VERSION:
+            raise ValueError(f"不支持的检查点版本: {meta['version']}")
+        
+        def section(prefix):
+            return {key[len(prefix):]: value for key, value in arrays.items() if key.startswith(prefix)}
+        
+        config = SimulationConfig.from_params(meta['params'], seed=meta['seed'], options=options)
+        sink = StatisticsSink.from_state(meta['sink'], section('statistics_'))
+        from . import create_world  # 引擎注册表在各引擎模块之后定义
+        world = create_world(config, engine or meta['engine'], sink=sink)
+        world.year = meta['year']
+        world.next_id = meta['next_id']
+        world.rng.bit_generator.state = meta['rng_state']
+        world.import_population(section('population_'))
+        world.graveyard.restore_state(section('graveyard_'))
+        if meta.get('battle_log'):
+            world.battle_log = BattleLog.from_state(section('battle_log_'))
+        # 由已保存的逐年统计重建均衡检测状态
+        if world.monitor is not None:
+            for row in statistics_rows(world.statistics):
+                world.monitor.observe(row)
+        return world
+    
+    def get_level_counts(self) -> List[int]:
+        """获取各等级存活修士数量（按等级值索引）"""
+        return list(self.aggregates.counts)
+    
+    def get_level_summaries(self) -> Dict[CultivationLevel, Tuple[int, float, float, float]]:
+        """获取各等级存活修士的(人数, 平均勇气, 平均战斗次数, 平均剩余寿元)"""
+        return self.aggregates.get_level_summaries()
+    
+    def get_strongest(self) -> Optional[Cultivator]:
+        """获取修为最高的存活修士"""
+        return self.aggregates.get_strongest()
+    
+    def get_top_killer(self) -> Optional[Cultivator]:
+        """获取击败人数最多的存活修士"""
+        return self.aggregates.get_top_killer()
+    
+    def get_cultivation_flow(self) -> np.ndarray:
+        """战斗日志中修为在等级间的流动（见BattleLog.cultivation_flow），胜者最终等级参考陨落记录与存活修士"""
+        if self.battle_log is None:
+            raise ValueError("未开启战斗日志")
+        records = self.graveyard.get_records()
+        population = self.export_population()
+        return self.battle_log.cultivation_flow(np.concatenate([records['id'], population['id']]),
+                                                np.concatenate([records['level'], population['level']]))
+    
+    def get_battle_log_report(self, max_kills: int = 5, max_depth: int = 10) -> str:
+        """战斗日志报告：战斗意愿统计、杀戮之王的击败记录与击杀链、等级间修为流动"""
+        log = self.battle_log
+        summary = log.summary()
+        report = "\n=== 战斗日志 ===\n"
+        report += f"共记录{summary['records']}场战斗" + (f"（{log.path}）" if log.path else "") + "\n"
+        report += (f"发起者求战{summary['initiator_only']}场，对手求战{summary['opponent_only']}场，"
+                   f"双方皆愿战{summary['both_willing']}场；发起者获胜{summary['initiator_wins']}场\n")
+        
+        top_killer = self.get_top_killer()
+        if top_killer is not None and top_killer.defeats_count > 0:
+            kills = log.kill_history(top_killer.id)
+            report += f"\n杀戮之王修士{top_killer.id}的击败记录（共{len(kills)}场）:\n"
+            for event in kills[-max_kills:]:
+                report += "  " + log.describe(event) + "\n"
+            chain = log.kill_chain(top_killer.id, max_depth)
+            report += "击杀链各层败者人数: " + " → ".join(str(len(layer)) for layer in chain) + "\n"
+        
+        flow = self.get_cultivation_flow()
+        rows = [(source, destination) for source, destination in zip(*np.nonzero(flow))]
+        if rows:
+            report += "\n修为流动（被吸收时的等级 → 胜者最终到达的等级）:\n"
+            for source, destination in rows:
+                source_name = Cultivator.LEVEL_CONFIGS[Cultivator.LEVELS[source]].name
+                destination_name = Cultivator.LEVEL_CONFIGS[Cultivator.LEVELS[destination]].name
+                report += f"  {source_name}期 → {destination_name}期: {flow[source, destination]}点\n"
+        return report
+    
+    def get_status_report(self) -> str:
+        """获取当前状态报告"""
+        summaries = self.get_level_summaries()
+        
+        report = f"\n=== 第{self.year}年修仙界状况 ===\n"
+        report += f"总修士数量: {sum(s[0] for s in summaries.values())}\n"
+        
+        # 等级分布
+        for level, (count, _, _, _) in summaries.items():
+            level_name = Cultivator.LEVEL_CONFIGS[level].name
+            report += f"{level_name}期修士: {count}人\n"
+        
+        # 各等级统计信息
+        report += "\n=== 各等级统计 ===\n"
+        for level, (count, avg_courage, avg_battles, avg_lifespan) in summaries.items():
+            level_name = Cultivator.LEVEL_CONFIGS[level].name
+            report += f"{level_name}期({count}人): 平均勇气{avg_courage:.3f} 平均战斗{avg_battles:.1f}次 平均寿元{avg_lifespan:.1f}年\n"
+        
+        # 最强修士详细信息
+        strongest = self.get_strongest()
+        if strongest is not None:
+            report += f"\n=== 最强修士详情 ===\n"
+            report += f"修士{strongest.id}: {Cultivator.LEVEL_CONFIGS[strongest.level].name}期\n"
+            report += f"修为: {strongest.cultivation_points}点\n"
+            birth_year_display = f"第{strongest.birth_year}年" if strongest.birth_year > 0 else "模拟开始前"
+            report += f"出生年份: {birth_year_display}\n"
+            report += f"击败敌人: {strongest.defeats_count}人\n"
+            report += f"勇气值: {strongest.courage:.3f}\n"
+            report += f"年龄: {strongest.age}岁, 剩余寿元: {strongest.get_remaining_lifespan()}年\n"
+            
+            # 击败人数最多的修士
+            top_killer = self.get_top_killer()
+            if top_killer.defeats_count > 0 and top_killer.id != strongest.id:
+                report += f"\n=== 杀戮之王 ===\n"
+                report += f"修士{top_killer.id}: {Cultivator.LEVEL_CONFIGS[top_killer.level].name}期\n"
+                report += f"击败敌人: {top_killer.defeats_count}人\n"
+                report += f"勇气值: {top_killer.courage:.3f}\n"
+        
+        return report
+    
+    def plot_statistics(self, output: str = None, max_points: int = 1000):
+        """生成统计图表
+        
+        未指定output时弹出交互窗口；指定output时使用非交互方式直接渲染到文件，
+        不依赖图形界面，适合无显示器的服务器。时间序列超过max_points个点时保形降采样。
+        """
+        if len(self.sink) == 0:
+            print("没有统计数据可供绘制")
+            return
+        
+        load_matplotlib()
+        if output is None:
+            import matplotlib.pyplot as plt
+            fig, ((ax1, ax2), (ax5, ax6), (ax3, ax4)) = plt.subplots(3, 2, figsize=(15, 16))
+        else:
+            from matplotlib.figure import Figure
+            fig = Figure(figsize=(15, 16))
+            ((ax1, ax2), (ax5, ax6), (ax3, ax4)) = fig.subplots(3, 2)
+        fig.suptitle('修仙世界统计报告', fontsize=16, fontweight='bold')
+        
+        # 时间序列直接使用按列数组，点数过多时保形降采样（每桶保留最小值与最大值）
+        arrays = self.sink.get_arrays()
+        n_years = len(arrays['total_cultivators'])
+        
+        sampled_years = np.flatnonzero(arrays['sampled'])  # 稀疏采样时未统计的年份不绘制
+        
+        def plot_series(ax, values, style, marker, title, ylabel, years=None):
+            if years is not None and len(years) < n_years:
+                values = values[years]
+            else:
+                years = np.arange(n_years)
+            indices, points = decimate_minmax(values, max_points)
+            ax.plot(years[indices] + 1, points, style, linewidth=2 if len(indices) <= 100 else 1,
+                    marker=marker if len(indices) <= 100 else None, markersize=4)
+            ax.set_title(f'{title} (显示{len(indices)}/{len(values)}个数据点)')
+            ax.set_xlabel('年份')
+            ax.set_ylabel(ylabel)
+            ax.grid(True, alpha=0.3)
+        
+        # 1. 不同年份的修士总数
+        plot_series(ax1, arrays['total_cultivators'], 'b-', 'o', '历年修士总数变化', '修士数量', sampled_years)
+        
+        # 2. 每年发生战斗的次数
+        plot_series(ax2, arrays['battles'], 'r-', 's', '每年战斗次数', '战斗次数')
+        
+        # 3. 每年陨落的修士数量
+        plot_series(ax5, arrays['deaths'], 'k-', 'x', '每年陨落人数', '陨落人数')
+        
+        # 4. 每年杀戮之王的击败人数
+        plot_series(ax6, arrays['top_killer_defeats'], 'm-', '^', '每年杀戮之王击败人数', '击败人数', sampled_years)
+        
+        # 5. 结束时期不同阶段的修士人数对比
+        summaries = self.get_level_summaries()
+        level_order = [Cultivator.LEVEL_CONFIGS[level].name + "期" for level in summaries]
+        if level_order:  # 确保有数据才绘制
+            counts = [s[0] for s in summaries.values()]
+            ax3.bar(level_order, counts, color=['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7'][:len(level_order)])
+            ax3.set_title('结束时期各阶段修士人数对比')
+            ax3.set_xlabel('修炼阶段')
+            ax3.set_ylabel('修士人数')
+            ax3.tick_params(axis='x', rotation=45)
+            
+            # 在柱状图上显示数值
+            for i, count in enumerate(counts):
+                ax3.text(i, count + max(counts) * 0.01, str(count), ha='center', va='bottom')
+        
+        # 6. 结束时期不同阶段的修士勇气平均值对比
+        if level_order:  # 确保有数据才绘制
+            avg_courages = [s[1] for s in summaries.values()]
+            ax4.bar(level_order, avg_courages, color=['#FF9FF3', '#54A0FF', '#5F27CD', '#00D2D3', '#FF9F43'][:len(level_order)])
+            ax4.set_title('结束时期各阶段修士平均勇气值对比')
+            ax4.set_xlabel('修炼阶段')
+            ax4.set_ylabel('平均勇气值')
+            ax4.tick_params(axis='x', rotation=45)
+            
+            # 在柱状图上显示数值
+            for i, courage in enumerate(avg_courages):
+                ax4.text(i, courage + max(avg_courages) * 0.01, f'{courage:.3f}', ha='center', va='bottom')
+        
+        fig.tight_layout()
+        if output is None:
+            plt.show()
+        else:
+            fig.savefig(output)
@@ -0,0 +1,477 @@
+"""事件驱动引擎"""
+import heapq
+import numpy as np
+from typing import List, Dict, Tuple, Optional
+
+from ..core import CultivationLevel, Cultivator, RandomStreams, SimulationConfig
+from ..encounters import SortedLiveMemberIndex, resolve_encounters_batched
+from ..sinks import StatisticsSink
+from .base import CultivationWorld
+from .vectorized import VectorizedCultivationWorld
+
+class EventDrivenCultivationWorld(CultivationWorld):
+    """修仙世界模拟器（事件驱动引擎）
+    
+    所有存活修士每年修为与年龄各加1，因此只保存相对锚点（已经历的修炼年数tick）的
+    "年龄-tick"与"修为-tick"，修炼本身无需逐个更新，只有战斗才改写修为。
+    每个修士的寿元耗尽年份与下一次晋升年份登记在按年分桶的日历中，每年只处理当年到期
+    的事件与实际相遇的修士；修为或寿元变化后重新登记，旧条目与修士当前登记的年份不符即被忽略。
+    陨落修士的数组空间在其数量超过存活修士时统一回收。战斗规则与对象引擎完全一致。
+    
+    相遇结算每年对alive[:size]做一次整列扫描取各等级成员，而不维护逐等级的存活索引：
+    每年的随机数按成员的编号顺序分配，整列扫描直接给出这一顺序，使随机数流与其余引擎逐位相同；
+    回收保证size不超过存活修士数的两倍加1024，扫描是与存活修士数成正比的一次向量化运算。
+    """
+    
+    # 结构数组的各列及类型，按修士编号升序排列
+    COLUMNS = {
+        'ids': np.int64,
+        'age_offsets': np.int64,      # 年龄-tick
+        'point_offsets': np.int64,    # 修为-tick
+        'levels': np.int8,
+        'courages': np.float64,
+        'max_lifespans': np.int64,
+        'alive': bool,
+        'defeats': np.int64,
+        'battles': np.int64,
+        'birth_years': np.int64,
+        'death_ticks': np.int64,      # 登记的寿元耗尽年份（tick），-1表示未登记
+        'advance_ticks': np.int64,    # 登记的下一次晋升年份（tick），-1表示不会晋升
+    }
+    MAX_LEVEL = len(CultivationLevel) - 1
+    
+    engine_name = 'event'
+    
+    def __init__(self, config: SimulationConfig, rng: RandomStreams = None, sink: StatisticsSink = None):
+        super().__init__(config, rng, sink)
+        self.tick = 0  # 已经历的修炼年数（年龄与修为的锚点）
+        self.size = 0  # 结构数组中已使用的行数（含尚未回收的陨落修士）
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.empty(0, dtype=dtype))
+        self.level_counts = np.zeros(len(CultivationLevel), dtype=np.int64)
+        self._death_calendar: Dict[int, List[int]] = {}    # tick -> 修士编号
+        self._advance_calendar: Dict[int, List[int]] = {}  # tick -> 修士编号
+        self._aged_out: List[np.ndarray] = []              # 本年寿元耗尽修士的行号
+        self._slain: List[int] = []                        # 本年战死修士的行号
+        self._killer_heap: List[Tuple[int, int]] = []      # (-击败数, 编号)，只含击败数大于0者
+        self._first_alive = 0  # 编号最小的存活修士所在行（只会后移）
+    
+    def _reserve(self, count: int):
+        """确保结构数组至少还能容纳count行（容量倍增）"""
+        needed = self.size + count
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        capacity = max(needed, 2 * capacity, 1024)
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+        self.alive[self.size:] = False
+    
+    def _compact(self):
+        """回收陨落修士占用的行（保持编号顺序）"""
+        keep = np.flatnonzero(self.alive[:self.size])
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            column[:len(keep)] = column[keep]
+        self.alive[len(keep):self.size] = False
+        self.size = len(keep)
+        self._first_alive = 0
+    
+    def _slots_of(self, ids: np.ndarray) -> np.ndarray:
+        """由修士编号查找所在行，已回收的编号被丢弃"""
+        slots = np.searchsorted(self.ids[:self.size], ids)
+        found = slots < self.size
+        slots, ids = slots[found], ids[found]
+        return slots[self.ids[slots] == ids]
+    
+    def _next_advance_ticks(self, slots: np.ndarray) -> np.ndarray:
+        """计算下一次晋升年份：修为首次达到门槛的修炼年，至少为下一年；最高等级不再晋升"""
+        levels = self.levels[slots]
+        ticks = np.maximum(VectorizedCultivationWorld.ADVANCE_THRESHOLDS[levels] - self.point_offsets[slots],
+                           self.tick + 1)
+        ticks[levels == self.MAX_LEVEL] = -1
+        return ticks
+    
+    def _schedule(self, calendar: Dict[int, List[int]], column: np.ndarray, slots: np.ndarray, ticks: np.ndarray):
+        """将一批修士登记到日历（按年份分桶）"""
+        column[slots] = ticks
+        due = ticks >= 0
+        slots, ticks = slots[due], ticks[due]
+        if len(slots) == 0:
+            return
+        order = np.argsort(ticks, kind='stable')
+        ticks = ticks[order]
+        ids = self.ids[slots[order]]
+        bucket_ticks, starts = np.unique(ticks, return_index=True)
+        for tick, bucket in zip(bucket_ticks.tolist(), np.split(ids, starts[1:])):
+            calendar.setdefault(tick, []).extend(bucket.tolist())
+    
+    def _schedule_all(self, slots: np.ndarray):
+        """重新登记一批修士的寿元耗尽与晋升年份"""
+        death_ticks = np.maximum(self.max_lifespans[slots] - self.age_offsets[slots], self.tick + 1)
+        self._schedule(self._death_calendar, self.death_ticks, slots, death_ticks)
+        self._schedule(self._advance_calendar, self.advance_ticks, slots, self._next_advance_ticks(slots))
+    
+    def _pop_due(self, calendar: Dict[int, List[int]], column: np.ndarray) -> np.ndarray:
+        """取出本年到期且仍然有效的事件，返回按编号排序的行号"""
+        bucket = calendar.pop(self.tick, None)
+        if not bucket:
+            return np.empty(0, dtype=np.int64)
+        slots = self._slots_of(np.array(bucket, dtype=np.int64))
+        return np.unique(slots[column[slots] == self.tick])
+    
+    def add_new_cultivators(self, count: int = None):
+        """每年新增筑基成功的修士"""
+        if count is None:
+            count = self.config.new_cultivators_per_year
+        if count <= 0:
+            return
+        
+        # 整批抽取开始修炼年龄与勇气值；筑基成功年龄 = 开始修炼年龄 + 10年
+        ages, courages = self.config.draw_cohort(count, self.rng)
+        ages += 10
+        
+        self._reserve(count)
+        new = slice(self.size, self.size + count)
+        self.ids[new] = self.allocate_ids(count)
+        self.age_offsets[new] = ages - self.tick
+        self.point_offsets[new] = 10 - self.tick
+        self.levels[new] = CultivationLevel.ZHUJI.value
+        self.courages[new] = courages
+        self.max_lifespans[new] = 100
+        self.alive[new] = True
+        self.defeats[new] = 0
+        self.battles[new] = 0
+        self.birth_years[new] = np.maximum(1, self.year - ages + 1)
+        self.size += count
+        
+        self.level_counts[CultivationLevel.ZHUJI.value] += count
+        self._schedule_all(np.arange(new.start, new.stop))
+    
+    def cultivate_all(self):
+        """所有修士修炼一年：只处理本年寿元耗尽与晋升的修士"""
+        self.tick += 1
+        
+        # 寿元耗尽
+        dying = self._pop_due(self._death_calendar, self.death_ticks)
+        if len(dying):
+            self.alive[dying] = False
+            self.level_counts -= np.bincount(self.levels[dying], minlength=len(CultivationLevel))
+            self._aged_out.append(dying)
+        
+        # 自动晋升（与对象引擎一致：本年寿元耗尽者同样做晋升检查）
+        advancing = self._pop_due(self._advance_calendar, self.advance_ticks)
+        if len(advancing):
+            old_levels = self.levels[advancing]
+            self.levels[advancing] = old_levels + 1
+            self.max_lifespans[advancing] += VectorizedCultivationWorld.LIFESPAN_BONUSES[old_levels + 1]
+            
+            living = self.alive[advancing]
+            moved = np.bincount(old_levels[living], minlength=len(CultivationLevel))
+            self.level_counts -= moved
+            self.level_counts[1:] += moved[:-1]
+            self._schedule_all(advancing[living])
+        
+        if len(dying):
+            self.death_ticks[dying] = -1
+            self.advance_ticks[dying] = -1
+    
+    def simulate_encounters(self):
+        """模拟修士相遇和战斗（只逐个处理相遇的修士，规则同对象引擎）"""
+        if self.config.encounter_mode == 'batched':
+            return self._simulate_encounters_batched()
+        
+        battles_this_year = 0
+        deaths_this_year = 0
+        
+        # 只考虑筑基及以上的修士
+        total_count = int(self.level_counts[1:].sum())
+        if total_count == 0:
+            return battles_this_year, deaths_this_year
+        
+        alive_slots = np.flatnonzero(self.alive[:self.size])
+        alive_levels = self.levels[alive_slots]
+        tick = self.tick
+        absorption_rate = self.config.absorption_rate
+        thresholds = Cultivator.ADVANCE_THRESHOLDS
+        alive, point_offsets, courages = self.alive, self.point_offsets, self.courages
+        ids, defeats, battles = self.ids, self.defeats, self.battles
+        death_ticks, advance_ticks = self.death_ticks, self.advance_ticks
+        slain = self._slain
+        for level in range(1, len(CultivationLevel)):
+            count = int(self.level_counts[level])
+            if count < 2:
+                continue
+            members = alive_slots[alive_levels == level]
+            slain_before = len(slain)
+            
+            encounter_probability = count / total_count
+            live_index = SortedLiveMemberIndex(members.tolist())
+            # 每个修士每年固定使用三个随机数（相遇、选择对手、战斗结果），与对象引擎一致
+            draws = self.rng.random((count, 3))
+            events = [] if self.battle_log is not None else None
+            opponent_rolls = draws[:, 1].tolist()
+            battle_rolls = draws[:, 2].tolist()
+            for k in np.flatnonzero(draws[:, 0] < encounter_probability).tolist():
+                i = live_index.initial[k]
+                if not alive[i] or len(live_index) < 2:
+                    continue
+                
+                # 随机选择一个同级对手
+                j = live_index.sample_other(i, opponent_rolls[k])
+                
+                # 判断是否发生战斗：勇气值 > 战败率（对手的败率同样按其自身修为计算）
+                points_i = int(point_offsets[i]) + tick
+                points_j = int(point_offsets[j]) + tick
+                total = points_i + points_j
+                win_rate = points_i / total if total > 0 else 0.5
+                i_fights = courages[i] > 1 - win_rate
+                j_fights = courages[j] > 1 - (points_j / total if total > 0 else 0.5)
+                if i_fights or j_fights:
+                    battles_this_year += 1
+                    deaths_this_year += 1
+                    
+                    # 计算战斗结果
+                    if battle_rolls[k] < win_rate:
+                        winner, loser, loser_points = i, j, points_j
+                    else:
+                        winner, loser, loser_points = j, i, points_i
+                    absorbed = int(loser_points * absorption_rate)
+                    if events is not None:
+                        events.append((i, j, points_i, points_j, i_fights, j_fights, winner == i, absorbed))
+                    point_offsets[winner] += absorbed
+                    defeats[winner] += 1
+                    battles[winner] += 1
+                    battles[loser] += 1
+                    winner_id = int(ids[winner])
+                    heapq.heappush(self._killer_heap, (-int(defeats[winner]), winner_id))
+                    
+                    # 修为增加可能使晋升提前
+                    if level < self.MAX_LEVEL:
+                        advance_tick = max(thresholds[level] - int(point_offsets[winner]), tick + 1)
+                        if advance_tick != advance_ticks[winner]:
+                            advance_ticks[winner] = advance_tick
+                            self._advance_calendar.setdefault(advance_tick, []).append(winner_id)
+                    
+                    alive[loser] = False
+                    death_ticks[loser] = -1
+                    advance_ticks[loser] = -1
+                    slain.append(loser)
+                    live_index.remove(loser)
+            self.level_counts[level] -= len(slain) - slain_before
+            if events:
+                self.battle_log.record(self.year, level, events, ids)
+        
+        return battles_this_year, deaths_this_year
+    
+    def _simulate_encounters_batched(self):
+        """按等级整批结算相遇和战斗（规则见resolve_encounters_batched）"""
+        battles_this_year = 0
+        
+        # 只考虑筑基及以上的修士
+        total_count = int(self.level_counts[1:].sum())
+        if total_count == 0:
+            return battles_this_year, battles_this_year
+        
+        alive_slots = np.flatnonzero(self.alive[:self.size])
+        alive_levels = self.levels[alive_slots]
+        for level in range(1, len(CultivationLevel)):
+            count = int(self.level_counts[level])
+            if count < 2:
+                continue
+            members = alive_slots[alive_levels == level]
+            draws = self.rng.random((count, 3))
+            winners, losers, absorbed, events = resolve_encounters_batched(
+                self.point_offsets[members] + self.tick, self.courages[members], count / total_count,
+                draws, self.config.absorption_rate)
+            if self.battle_log is not None:
+                self.battle_log.record(self.year, level, events, self.ids[members])
+            winners, losers = members[winners], members[losers]
+            self.point_offsets[winners] += absorbed
+            self.defeats[winners] += 1
+            self.battles[winners] += 1
+            self.battles[losers] += 1
+            for defeats, cultivator_id in zip(self.defeats[winners].tolist(), self.ids[winners].tolist()):
+                heapq.heappush(self._killer_heap, (-defeats, cultivator_id))
+            # 修为增加可能使晋升提前
+            self._schedule(self._advance_calendar, self.advance_ticks, winners, self._next_advance_ticks(winners))
+            
+            self.alive[losers] = False
+            self.death_ticks[losers] = -1
+            self.advance_ticks[losers] = -1
+            self.level_counts[level] -= len(losers)
+            self._slain.extend(losers.tolist())
+            battles_this_year += len(winners)
+        
+        return battles_this_year, battles_this_year
+    
+    def bury_dead(self):
+        """将本年陨落的修士移入墓园，陨落修士过多时回收数组空间"""
+        if self._aged_out or self._slain:
+            dead_idx = np.unique(np.concatenate(self._aged_out + [np.array(self._slain, dtype=np.int64)]))
+            self._aged_out = []
+            self._slain = []
+            cultivators = [self.get_cultivator(i) for i in dead_idx] if self.graveyard.mode == 'full' else None
+            self.graveyard.bury(self.year, self.ids[dead_idx], self.levels[dead_idx],
+                                self.defeats[dead_idx], self.point_offsets[dead_idx] + self.tick,
+                                cultivators=cultivators)
+        
+        alive_count = int(self.level_counts.sum())
+        if self.size - alive_count > alive_count + 1024:
+            self._compact()
+    
+    def export_population(self) -> Dict[str, np.ndarray]:
+        """按列导出存活修士状态"""
+        alive = np.flatnonzero(self.alive[:self.size])
+        return {
+            'id': self.ids[alive],
+            'age': self.age_offsets[alive] + self.tick,
+            'cultivation_points': self.point_offsets[alive] + self.tick,
+            'level': self.levels[alive],
+            'courage': self.courages[alive],
+            'max_lifespan': self.max_lifespans[alive],
+            'defeats': self.defeats[alive],
+            'battles': self.battles[alive],
+            'birth_year': self.birth_years[alive],
+        }
+    
+    def remove_population(self, selected: np.ndarray) -> Dict[str, np.ndarray]:
+        """移出存活修士中selected为True者（selected与export_population的行一一对应），按列返回其状态
+        
+        移出者的日历条目因行被回收而失效，无需重建日历。
+        """
+        rows = np.flatnonzero(self.alive[:self.size])[selected]
+        emigrants = {
+            'id': self.ids[rows],
+            'age': self.age_offsets[rows] + self.tick,
+            'cultivation_points': self.point_offsets[rows] + self.tick,
+            'level': self.levels[rows],
+            'courage': self.courages[rows],
+            'max_lifespan': self.max_lifespans[rows],
+            'defeats': self.defeats[rows],
+            'battles': self.battles[rows],
+            'birth_year': self.birth_years[rows],
+        }
+        if len(rows):
+            self.alive[rows] = False
+            self.level_counts -= np.bincount(self.levels[rows], minlength=len(CultivationLevel))
+            self._compact()
+        return emigrants
+    
+    def merge_population(self, columns: Dict[str, np.ndarray]):
+        """并入一批修士（按列传入，如迁入的修士），保持结构数组按编号升序，只为新修士登记日历"""
+        count = len(columns['id'])
+        self._reserve(count)
+        new = slice(self.size, self.size + count)
+        self.ids[new] = columns['id']
+        self.age_offsets[new] = columns['age'] - self.tick
+        self.point_offsets[new] = columns['cultivation_points'] - self.tick
+        self.levels[new] = columns['level']
+        self.courages[new] = columns['courage']
+        self.max_lifespans[new] = columns['max_lifespan']
+        self.alive[new] = True
+        self.defeats[new] = columns['defeats']
+        self.battles[new] = columns['battles']
+        self.birth_years[new] = columns['birth_year']
+        self.size += count
+        
+        ids = self.ids[:self.size]
+        if np.any(ids[1:] < ids[:-1]):
+            order = np.argsort(ids, kind='stable')
+            for name in self.COLUMNS:
+                column = getattr(self, name)
+                column[:self.size] = column[:self.size][order]
+            self._first_alive = 0
+        if count:
+            self.level_counts += np.bincount(columns['level'], minlength=len(CultivationLevel))
+            self._schedule_all(self._slots_of(np.asarray(columns['id'], dtype=np.int64)))
+            killers = np.flatnonzero(columns['defeats'] > 0)
+            for defeats, cultivator_id in zip((-columns['defeats'][killers]).tolist(), columns['id'][killers].tolist()):
+                heapq.heappush(self._killer_heap, (defeats, cultivator_id))
+    
+    def import_population(self, columns: Dict[str, np.ndarray]):
+        """按列导入修士，替换当前全部修士并重建日历"""
+        count = len(columns['id'])
+        self.size = 0
+        self._reserve(count)
+        self.size = count
+        self.ids[:count] = columns['id']
+        self.age_offsets[:count] = columns['age'] - self.tick
+        self.point_offsets[:count] = columns['cultivation_points'] - self.tick
+        self.levels[:count] = columns['level']
+        self.courages[:count] = columns['courage']
+        self.max_lifespans[:count] = columns['max_lifespan']
+        self.alive[:count] = True
+        self.alive[count:] = False
+        self.defeats[:count] = columns['defeats']
+        self.battles[:count] = columns['battles']
+        self.birth_years[:count] = columns['birth_year']
+        
+        self.level_counts = np.bincount(self.levels[:count], minlength=len(CultivationLevel)).astype(np.int64)
+        self._death_calendar = {}
+        self._advance_calendar = {}
+        self._aged_out = []
+        self._slain = []
+        self._first_alive = 0
+        self._schedule_all(np.arange(count))
+        killers = np.flatnonzero(self.defeats[:count] > 0)
+        self._killer_heap = list(zip((-self.defeats[killers]).tolist(), self.ids[killers].tolist()))
+        heapq.heapify(self._killer_heap)
+    
+    def get_level_counts(self) -> List[int]:
+        """获取各等级存活修士数量（按等级值索引）"""
+        return self.level_counts.tolist()
+    
+    def get_level_summaries(self) -> Dict[CultivationLevel, Tuple[int, float, float, float]]:
+        """获取各等级存活修士的(人数, 平均勇气, 平均战斗次数, 平均剩余寿元)"""
+        alive = np.flatnonzero(self.alive[:self.size])
+        remaining = np.maximum(0, self.max_lifespans[alive] - self.age_offsets[alive] - self.tick)
+        return VectorizedCultivationWorld.summarize_levels(self.levels[alive], self.courages[alive],
+                                                           self.battles[alive], remaining)
+    
+    def get_cultivator(self, index: int) -> Cultivator:
+        """将数组中第index行修士物化为Cultivator对象（仅用于报告）"""
+        cultivator = Cultivator(int(self.ids[index]), self.config,
+                                age=int(self.age_offsets[index]) + self.tick, courage=float(self.courages[index]))
+        cultivator.cultivation_points = int(self.point_offsets[index]) + self.tick
+        cultivator.level_index = int(self.levels[index])
+        cultivator.max_lifespan = int(self.max_lifespans[index])
+        cultivator.is_alive = bool(self.alive[index])
+        cultivator.defeats_count = int(self.defeats[index])
+        cultivator.battles_count = int(self.battles[index])
+        cultivator.birth_year = int(self.birth_years[index])
+        return cultivator
+    
+    def get_strongest(self) -> Optional[Cultivator]:
+        """获取修为最高的存活修士（并列时取编号最小者）"""
+        alive = np.flatnonzero(self.alive[:self.size])
+        if len(alive) == 0:
+            return None
+        return self.get_cultivator(alive[np.argmax(self.point_offsets[alive])])
+    
+    def get_top_killer(self) -> Optional[Cultivator]:
+        """获取击败人数最多的存活修士（并列时取编号最小者）"""
+        heap = self._killer_heap
+        alive_count = int(self.level_counts.sum())
+        # 过期条目过多时按当前状态重建
+        if len(heap) > 2 * alive_count + 64:
+            killers = np.flatnonzero(self.alive[:self.size] & (self.defeats[:self.size] > 0))
+            heap[:] = list(zip((-self.defeats[killers]).tolist(), self.ids[killers].tolist()))
+            heapq.heapify(heap)
+        
+        while heap:
+            neg_defeats, cultivator_id = heap[0]
+            slots = self._slots_of(np.array([cultivator_id]))
+            if len(slots) and self.alive[slots[0]] and self.defeats[slots[0]] == -neg_defeats:
+                return self.get_cultivator(slots[0])
+            heapq.heappop(heap)
+        
+        # 没有修士击败过敌人时，取编号最小的存活修士
+        if alive_count == 0:
+            return None
+        while not self.alive[self._first_alive]:
+            self._first_alive += 1
+        return self.get_cultivator(self._first_alive)
@@ -0,0 +1,254 @@
+"""均场引擎"""
+import numpy as np
+from typing import List, Dict, Tuple, Optional
+from statistics import NormalDist
+
+from ..core import CultivationLevel, Cultivator, RandomStreams, SimulationConfig
+from ..records import BattleLog
+from ..sinks import StatisticsSink
+from .base import CultivationWorld
+
+class MeanFieldCultivationWorld(CultivationWorld):
+    """修仙世界模拟器（均场近似引擎）
+    
+    不保存个体修士，而是逐年演化人数在(等级, 修为, 勇气, 剩余寿元)网格上的分布（浮点期望人数）：
+    修为按对数分桶（整十倍处为桶边界，与晋升门槛对齐），剩余寿元在128年内逐年分桶、之后按几何
+    间隔分桶，勇气在0-1之间均匀分桶。修为或寿元变化后落在两个桶代表值之间时按线性插值分到两桶，
+    人数与均值守恒。
+    
+    规则取自逐个结算的规则：修炼时修为加1、剩余寿元减1，寿元耗尽者陨落，达到门槛者晋升一级并
+    增加寿元；新增修士的年龄与勇气分布与draw_cohort相同；同级相遇概率为本级人数/总人数，对手按
+    人数比例选择，任一方勇气大于自己的战败率即发生战斗，胜率为修为之比，胜者吸收败者修为的
+    absorption_rate倍。逐个结算时年内战死者不再参与后续相遇，这里将一年的相遇分为substeps步，
+    每步结算后更新分布。
+    
+    每年的计算量只取决于有人的网格单元数，与人口规模无关；结果是确定性的期望值，不使用随机数。
+    没有个体修士，因此没有最强修士与杀戮之王，也不支持检查点、分区世界与批量相遇结算。
+    """
+    
+    engine_name = 'meanfield'
+    # 修为每十倍的分桶数、勇气分桶数与每年相遇的结算步数
+    POINT_BINS_PER_DECADE = 16
+    COURAGE_BINS = 16
+    substeps = 4
+    # 人数低于此值的网格单元视为无人
+    MIN_MASS = 1e-9
+    
+    def __init__(self, config: SimulationConfig, rng: RandomStreams = None, sink: StatisticsSink = None):
+        super().__init__(config, rng, sink)
+        if config.encounter_mode != 'sequential':
+            raise ValueError("均场引擎只支持逐个结算相遇")
+        n_levels = len(CultivationLevel)
+        # 修为桶代表值：10 × 10^(k/每十倍分桶数)，覆盖到大乘期门槛以上
+        decades = len(str(Cultivator.LEVEL_CONFIGS[CultivationLevel.DACHENG].required_cultivation)) - 1
+        self.point_values = 10.0 ** (1 + np.arange(decades * self.POINT_BINS_PER_DECADE + 1)
+                                     / self.POINT_BINS_PER_DECADE)
+        # 剩余寿元桶代表值：0-127逐年，之后每个桶为前一个的2^(1/4)倍，覆盖到全部寿元加成之和
+        max_lifespan = 100 + sum(Cultivator.LIFESPAN_BONUSES)
+        octaves = int(np.ceil(np.log2(max_lifespan / 128)))
+        self.lifespan_values = np.concatenate([np.arange(128.0), 128 * 2.0 ** (np.arange(1, 4 * octaves + 1) / 4)])
+        # 勇气桶边界与落入各桶的概率（均值0.5、标准差0.15的正态分布截断到0-1，截断部分并入两端的桶）
+        self.courage_edges = np.linspace(0, 1, self.COURAGE_BINS + 1)
+        self.courage_values = (self.courage_edges[:-1] + self.courage_edges[1:]) / 2
+        cdf = np.array([NormalDist(0.5, 0.15).cdf(edge) for edge in self.courage_edges])
+        cdf[0], cdf[-1] = 0.0, 1.0
+        self.courage_probabilities = np.diff(cdf)
+        # 开始修炼年龄（6-10岁，四舍五入后截断）的概率
+        age_cdf = [NormalDist(8, 1).cdf(age + 0.5) for age in range(6, 10)]
+        self.starting_age_probabilities = np.diff([0.0] + age_cdf + [1.0])
+        
+        # 各等级的人数分布与战斗次数之和（按修为与勇气，不区分剩余寿元）
+        shape = (len(self.point_values), self.COURAGE_BINS)
+        self.mass = np.zeros((n_levels,) + shape + (len(self.lifespan_values),))
+        self.battle_sums = np.zeros((n_levels,) + shape)
+        # 各等级晋升门槛在修为桶中的位置
+        self.advance_bins = [int(np.searchsorted(self.point_values, threshold - 1e-6))
+                             for threshold in Cultivator.ADVANCE_THRESHOLDS[:-1]]
+    
+    @staticmethod
+    def interpolate(values: np.ndarray, targets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """目标值在桶代表值间的插值位置：(下方桶下标, 分到上方桶的比例)，超出两端时全部归入端点桶"""
+        lower = np.clip(np.searchsorted(values, targets, side='right') - 1, 0, len(values) - 2)
+        upper_share = np.clip((targets - values[lower]) / (values[lower + 1] - values[lower]), 0.0, 1.0)
+        return lower, upper_share
+    
+    @staticmethod
+    def deposit(array: np.ndarray, lower: np.ndarray, upper_share: np.ndarray, amounts: np.ndarray, axis: int = 0):
+        """将amounts按插值位置分到array第axis维的相邻两桶（插值位置须单调不减）"""
+        amounts = np.moveaxis(amounts, axis, 0)
+        share = upper_share.reshape(upper_share.shape + (1,) * (amounts.ndim - 1))
+        target = np.moveaxis(array, axis, 0)
+        # 下标单调不减，落入同一桶的部分相邻，可用reduceat分段求和
+        for part, index in ((amounts * (1 - share), lower), (amounts * share, lower + 1)):
+            buckets, starts = np.unique(index, return_index=True)
+            target[buckets] += np.add.reduceat(part, starts, axis=0)
+    
+    def _occupied_levels(self) -> List[int]:
+        return [level for level in range(len(CultivationLevel)) if self.mass[level].any()]
+    
+    def add_new_cultivators(self, count: int = None):
+        """新增筑基修士：修为10点，年龄与勇气按分布摊入网格"""
+        if count is None:
+            count = self.config.new_cultivators_per_year
+        remaining = 100 - (np.arange(6, 11) + 10)  # 筑基成功年龄 = 开始修炼年龄 + 10年
+        cohort = count * np.outer(self.courage_probabilities, self.starting_age_probabilities)
+        self.mass[CultivationLevel.ZHUJI.value, 0, :, remaining] += cohort.T
+    
+    def cultivate_all(self):
+        """修为加1、剩余寿元减1，寿元耗尽者陨落，达到门槛者晋升一级"""
+        for level in reversed(self._occupied_levels()):
+            mass = self.mass[level]
+            # 只处理有人的修为与剩余寿元范围（向下多留一个寿元桶、向上多留一个修为桶）
+            point_rows = np.flatnonzero(mass.any(axis=(1, 2)))
+            lifespan_columns = np.flatnonzero(mass.any(axis=(0, 1)))
+            p0, p1 = point_rows[0], min(point_rows[-1] + 2, len(self.point_values))
+            r0, r1 = max(lifespan_columns[0] - 1, 0), lifespan_columns[-1] + 1
+            block = mass[p0:p1, :, r0:r1]
+            
+            aged = np.zeros_like(block)
+            lower, upper_share = self.interpolate(self.lifespan_values[r0:r1], self.lifespan_values[r0:r1] - 1)
+            self.deposit(aged, lower, upper_share, block, axis=2)
+            # 剩余寿元为0的修士陨落，战斗次数之和按陨落比例扣除
+            total = block.sum(axis=2)
+            if r0 == 0:
+                aged[:, :, 0] = 0
+            survived = aged.sum(axis=2)
+            ratio = np.divide(survived, total, out=np.zeros_like(total), where=total > 0)
+            battle_sums = self.battle_sums[level, p0:p1] * ratio
+            
+            lower, upper_share = self.interpolate(self.point_values[p0:p1], self.point_values[p0:p1] + 1)
+            block[:] = 0
+            self.deposit(block, lower, upper_share, aged, axis=0)
+            self.battle_sums[level, p0:p1] = 0
+            self.deposit(self.battle_sums[level, p0:p1], lower, upper_share, battle_sums, axis=0)
+            
+            if level + 1 < len(CultivationLevel):
+                self._advance(level)
+    
+    def _advance(self, level: int):
+        """修为达到门槛的修士晋升一级，剩余寿元增加该等级的寿元加成"""
+        start = self.advance_bins[level]
+        advancing = self.mass[level, start:]
+        if not advancing.any():
+            return
+        bonus = Cultivator.LIFESPAN_BONUSES[level + 1]
+        lower, upper_share = self.interpolate(self.lifespan_values, self.lifespan_values + bonus)
+        self.deposit(self.mass[level + 1, start:], lower, upper_share, advancing, axis=2)
+        self.battle_sums[level + 1, start:] += self.battle_sums[level, start:]
+        self.mass[level, start:] = 0
+        self.battle_sums[level, start:] = 0
+    
+    def _fight_probabilities(self, win_rates: np.ndarray, courage_bins: np.ndarray) -> np.ndarray:
+        """勇气在桶内均匀分布时，勇气值大于战败率（1 - 胜率）的概率"""
+        low, high = self.courage_edges[courage_bins], self.courage_edges[courage_bins + 1]
+        return np.clip((high - (1 - win_rates)) / (high - low), 0.0, 1.0)
+    
+    def simulate_encounters(self):
+        """按期望人数结算相遇和战斗，返回(战斗次数, 陨落人数)（取整）"""
+        levels = [level for level in self._occupied_levels() if level > 0]
+        counts = {level: self.mass[level].sum() for level in levels}
+        total_count = sum(counts.values())
+        battles = 0.0
+        for level in levels:
+            if counts[level] < 2:
+                continue
+            encounter_probability = counts[level] / total_count
+            for _ in range(self.substeps):
+                battles += self._encounter_step(level, encounter_probability / self.substeps)
+        # 清除人数极小的网格单元（避免期望值的长尾拖慢相遇计算）
+        for level in self._occupied_levels():
+            mass = self.mass[level]
+            mass[mass < self.MIN_MASS] = 0
+        # 每场战斗恰有一人陨落
+        return int(round(battles)), int(round(battles))
+    
+    def _encounter_step(self, level: int, initiation_rate: float) -> float:
+        """结算一个等级的一步相遇，返回战斗次数（期望值）
+        
+        i、j为修为桶，c、d为勇气桶。(i, c)单元的修士对修为j的对手愿意战斗的概率为willing[i, c, j]，
+        双方任一愿意即战斗，因此对修为j的全部对手的期望战斗人数为
+        M[j] - (1 - willing[i, c, j]) × Σd m[j, d] × (1 - willing[j, d, i])，计算量只与网格大小有关。
+        战斗意愿与胜率只取决于双方，作为发起者与作为对手的期望战斗次数相同。
+        """
+        mass = self.mass[level]
+        cells = mass.sum(axis=2)
+        point_rows = np.flatnonzero(cells.any(axis=1))
+        p0, p1 = point_rows[0], point_rows[-1] + 1
+        occupied = cells[p0:p1]
+        n = occupied.sum()
+        if n < 2:
+            return 0.0
+        points = self.point_values[p0:p1]
+        win_rates = points[:, None] / (points[:, None] + points[None, :])
+        willing = self._fight_probabilities(win_rates[:, None, :], np.arange(self.COURAGE_BINS)[None, :, None])
+        reluctant = np.einsum('jd,jdi->ij', occupied, 1 - willing)
+        opponents = occupied.sum(axis=1)[None, None, :] - (1 - willing) * reluctant[:, None, :]
+        encounters = (occupied * initiation_rate / n)[:, :, None] * opponents
+        wins = 2 * encounters * win_rates[:, None, :]
+        # 每场战斗两人参与、一人陨落；胜者离开原单元移到新修为桶，败者陨落
+        involved = 2 * encounters.sum(axis=2)
+        leaving = np.minimum(1.0, np.divide(involved, occupied, out=np.zeros_like(occupied), where=occupied > 0))
+        
+        # 胜者按新修为（自身修为加吸收的修为）插值分到相邻两个修为桶，汇总为各单元移到各修为桶的比例
+        lower, upper_share = self.interpolate(
+            self.point_values, points[:, None] + np.floor(points[None, :] * self.config.absorption_rate))
+        n_points = len(self.point_values)
+        cell_index = np.arange(occupied.size).reshape(occupied.shape)
+        flat = (cell_index[:, :, None] * n_points + lower[:, None, :]).ravel()
+        shares = (np.bincount(flat, (wins * (1 - upper_share[:, None, :])).ravel(), occupied.size * n_points)
+                  + np.bincount(flat + 1, (wins * upper_share[:, None, :]).ravel(), occupied.size * n_points))
+        shares = shares.reshape(occupied.shape + (n_points,))
+        shares /= np.where(occupied > 0, occupied, 1)[:, :, None]
+        
+        block = mass[p0:p1]
+        battle_sums = self.battle_sums[level]
+        profiles = block.copy()
+        # 胜者带走的战斗次数之和（每人另加本场1次）
+        carried = shares * (battle_sums[p0:p1] + occupied)[:, :, None]
+        block *= (1 - leaving)[:, :, None]
+        battle_sums[p0:p1] *= 1 - leaving
+        for courage in range(self.COURAGE_BINS):
+            mass[:, courage] += shares[:, courage].T @ profiles[:, courage]
+        battle_sums += carried.sum(axis=0).T
+        return float(encounters.sum())
+    
+    def bury_dead(self):
+        """均场引擎没有个体修士，陨落人数已从分布中扣除"""
+    
+    def get_level_counts(self) -> List[int]:
+        return [int(round(count)) for count in self.mass.sum(axis=(1, 2, 3))]
+    
+    def get_level_summaries(self) -> Dict[CultivationLevel, Tuple[int, float, float, float]]:
+        summaries = {}
+        for level in CultivationLevel:
+            mass = self.mass[level.value]
+            count = mass.sum()
+            if int(round(count)) > 0:
+                summaries[level] = (int(round(count)),
+                                    float((mass.sum(axis=(0, 2)) * self.courage_values).sum() / count),
+                                    float(self.battle_sums[level.value].sum() / count),
+                                    float((mass.sum(axis=(0, 1)) * self.lifespan_values).sum() / count))
+        return summaries
+    
+    def get_strongest(self) -> Optional[Cultivator]:
+        """均场引擎没有个体修士"""
+        return None
+    
+    def get_top_killer(self) -> Optional[Cultivator]:
+        """均场引擎没有个体修士"""
+        return None
+    
+    def export_population(self) -> Dict[str, np.ndarray]:
+        raise ValueError("均场引擎没有个体修士，不支持检查点与分区世界")
+    
+    def import_population(self, columns: Dict[str, np.ndarray]):
+        raise ValueError("均场引擎没有个体修士，不支持检查点与分区世界")
+    
+    def remove_population(self, selected: np.ndarray) -> Dict[str, np.ndarray]:
+        raise ValueError("均场引擎没有个体修士，不支持检查点与分区世界")
+    
+    def merge_population(self, columns: Dict[str, np.ndarray]):
+        raise ValueError("均场引擎没有个体修士，不支持检查点与分区世界")
+    
+    def enable_battle_log(self, path: str = None, capacity: int = 65536) -> BattleLog:
+        raise ValueError("均场引擎没有个体修士，不支持战斗日志")
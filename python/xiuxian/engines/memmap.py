@@ -0,0 +1,446 @@
+"""外存引擎"""
+import numpy as np
+from typing import List, Dict, Tuple, Optional
+import mmap
+import os
+import tempfile
+
+from ..core import CultivationLevel, Cultivator, RandomStreams, SimulationConfig, jit_available
+from ..records import BattleLog
+from ..sinks import StatisticsSink
+from .base import CultivationWorld
+from .vectorized import VectorizedCultivationWorld
+
+class MemmapPopulation:
+    """磁盘上的修士列存储
+    
+    每列一个numpy.memmap文件，使用能容纳取值范围的最小类型；容量不足时按倍数扩大文件。
+    读写都通过按行区间打开的窗口映射进行，用完即解除映射，进程常驻内存只包含正在处理的窗口。
+    文件保存在临时目录中（可指定其所在目录），对象被回收或进程退出时删除。
+    """
+    
+    DTYPES = {
+        'id': np.int64,
+        'age': np.int32,
+        'cultivation_points': np.int64,
+        'level': np.uint8,
+        'courage': np.float32,
+        'max_lifespan': np.int32,  # 各等级寿元加成之和约8900万，int32足够
+        'defeats': np.uint32,
+        'battles': np.uint32,
+        'birth_year': np.int32,
+        'alive': np.bool_,
+    }
+    # 每名修士占用的字节数
+    ROW_BYTES = sum(np.dtype(dtype).itemsize for dtype in DTYPES.values())
+    
+    def __init__(self, directory: str = None, capacity: int = 1 << 16):
+        self._directory = tempfile.TemporaryDirectory(prefix='cultivators-', dir=directory)
+        self.directory = self._directory.name
+        self.size = 0
+        self.capacity = 0
+        self.reserve(capacity)
+    
+    def path(self, name: str) -> str:
+        """列（或临时列）对应的文件路径"""
+        return os.path.join(self.directory, name + '.bin')
+    
+    def reserve(self, capacity: int):
+        """确保各列文件至少可容纳capacity行（按倍数扩大，已有数据不变）"""
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, 2 * self.capacity)
+        for name, dtype in self.DTYPES.items():
+            with open(self.path(name), 'ab') as f:
+                f.truncate(capacity * np.dtype(dtype).itemsize)
+        self.capacity = capacity
+    
+    def view(self, name: str, start: int, stop: int, dtype=None) -> np.ndarray:
+        """映射某列第start至stop行（对视图的写入直接写回文件）"""
+        dtype = np.dtype(self.DTYPES[name] if dtype is None else dtype)
+        if stop <= start:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.path(name), dtype=dtype, mode='r+', offset=start * dtype.itemsize,
+                         shape=(stop - start,))
+    
+    def window(self, start: int, stop: int, names=None) -> Dict[str, np.ndarray]:
+        """映射多列的同一行区间"""
+        return {name: self.view(name, start, stop) for name in (names or self.DTYPES)}
+    
+    def chunks(self, rows: int):
+        """按每块rows行划分全部修士，依次给出(start, stop)"""
+        for start in range(0, self.size, rows):
+            yield start, min(self.size, start + rows)
+    
+    def write(self, start: int, columns: Dict[str, np.ndarray]):
+        """从第start行起写入各列（按列类型转换）"""
+        n = len(columns['id'])
+        self.reserve(start + n)
+        for name, column in self.window(start, start + n, columns).items():
+            column[:] = columns[name]
+    
+    def append(self, columns: Dict[str, np.ndarray]):
+        """在末尾追加修士"""
+        self.write(self.size, columns)
+        self.size += len(columns['id'])
+
+class MemmapCultivationWorld(VectorizedCultivationWorld):
+    """修仙世界模拟器（外存引擎）
+    
+    修士状态保存在MemmapPopulation的磁盘列文件中，规则与向量化引擎相同，但各阶段按行分块处理：
+    修炼、新增修士、统计与移出陨落修士每次只映射一个分块；相遇时各等级成员的战斗相关列与存活成员索引
+    以紧凑记录写入磁盘逐批结算（use_jit时用编译内核，否则以纯Python逐个结算），每批结算后解除映射。
+    常驻内存由memory_budget限定，与人口规模无关（full与summary墓园的陨落记录仍保存在内存中，
+    超大规模运行应使用discard）。
+    
+    勇气值以float32保存，只有勇气值与战败率相差不到float32精度时结果才会与其他引擎不同。
+    只支持逐个结算相遇。
+    """
+    
+    engine_name = 'memmap'
+    # 相遇时同级成员的战斗相关列合并为一条记录，随机访问对手只触及一个内存页
+    ENCOUNTER_RECORD = np.dtype([('cultivation_points', np.int64), ('courage', np.float32), ('defeats', np.uint32),
+                                 ('battles', np.uint32), ('alive', np.bool_), ('position', np.int64)], align=True)
+    # 估计每名修士结算时随机访问映射的次数（对手记录、交换删除数组与败者的位置记录）
+    # 与每次访问调入的字节数（Linux读缺页时一并映射相邻的16页）
+    ACCESSES_PER_ENCOUNTER = 3
+    FAULT_AROUND_BYTES = 16 * mmap.PAGESIZE
+    
+    def __init__(self, config: SimulationConfig, rng: RandomStreams = None, sink: StatisticsSink = None):
+        # 不调用向量化引擎的初始化：修士状态不保存为内存中的数组
+        CultivationWorld.__init__(self, config, rng, sink)
+        self.use_jit = config.use_jit and jit_available()
+        if config.encounter_mode != 'sequential':
+            raise ValueError("外存引擎只支持逐个结算相遇（sequential）")
+        # 磁盘列文件所在目录与常驻内存预算（字节）取自配置的执行选项
+        self.storage_dir = config.storage_dir
+        self.memory_budget = config.memory_budget
+        self.population = MemmapPopulation(self.storage_dir)
+        # 顺序处理的分块行数（为映射窗口之外的临时数组预留数倍于一行的空间）与每批结算相遇的修士数
+        self.chunk_rows = max(1024, self.memory_budget // (8 * MemmapPopulation.ROW_BYTES))
+        self.encounter_batch = max(16, self.memory_budget // (self.ACCESSES_PER_ENCOUNTER * self.FAULT_AROUND_BYTES))
+    
+    def add_new_cultivators(self, count: int = None):
+        """每年新增筑基成功的修士（分块抽取与写入，随机数序列与整批抽取相同）"""
+        if count is None:
+            count = self.config.new_cultivators_per_year
+        for start in range(0, max(0, count), self.chunk_rows):
+            n = min(self.chunk_rows, count - start)
+            # 筑基成功年龄 = 开始修炼年龄 + 10年
+            ages, courages = self.config.draw_cohort(n, self.rng)
+            ages += 10
+            self.population.append({
+                'id': self.allocate_ids(n),
+                'age': ages,
+                'cultivation_points': np.full(n, 10, dtype=np.int64),
+                'level': np.full(n, CultivationLevel.ZHUJI.value, dtype=np.uint8),
+                'courage': courages,
+                'max_lifespan': np.full(n, 100, dtype=np.int32),
+                'defeats': np.zeros(n, dtype=np.uint32),
+                'battles': np.zeros(n, dtype=np.uint32),
+                'birth_year': np.maximum(1, self.year - ages + 1),
+                'alive': np.ones(n, dtype=bool),
+            })
+    
+    def cultivate_all(self):
+        """所有修士修炼一年（逐块原地更新）"""
+        for start, stop in self.population.chunks(self.chunk_rows):
+            c = self.population.window(start, stop, ('cultivation_points', 'age', 'level', 'max_lifespan', 'alive'))
+            self.cultivate_columns(c['cultivation_points'], c['age'], c['level'], c['max_lifespan'], c['alive'])
+    
+    def _level_members(self, c: Dict[str, np.ndarray]) -> List[np.ndarray]:
+        """分块中各等级存活修士的块内行号（炼气期与陨落者不参与相遇）"""
+        levels = np.where(c['alive'], c['level'], 0)
+        return [np.flatnonzero(levels == level) for level in range(len(CultivationLevel))]
+    
+    def simulate_encounters(self):
+        """模拟修士相遇和战斗（逐个结算，规则同对象引擎）
+        
+        先逐块把各等级存活修士的战斗相关列顺序写入各自的临时记录文件，相遇只在记录文件上随机访问，
+        最后再逐块顺序写回。记录文件超过内存预算时分批结算，每批结算后解除映射以限制常驻内存。
+        开启战斗日志时另把各等级成员的编号写入编号文件，用于把内核上报的成员下标换算为修士编号。
+        """
+        population = self.population
+        logging = self.battle_log is not None
+        names = ('cultivation_points', 'courage', 'defeats', 'battles', 'level', 'alive') + (('id',) if logging else ())
+        counts = [0] * len(CultivationLevel)
+        files = [open(population.path(f'level{level}'), 'wb') for level in range(len(CultivationLevel))]
+        id_files = [open(population.path(f'ids{level}'), 'wb') if logging else None
+                    for level in range(len(CultivationLevel))]
+        try:
+            for start, stop in population.chunks(self.chunk_rows):
+                c = population.window(start, stop, names)
+                for level, rows in enumerate(self._level_members(c)):
+                    if level == 0:
+                        continue
+                    records = np.empty(len(rows), dtype=self.ENCOUNTER_RECORD)
+                    for name in ('cultivation_points', 'courage', 'defeats', 'battles', 'alive'):
+                        records[name] = c[name][rows]
+                    records['position'] = np.arange(counts[level], counts[level] + len(rows))
+                    records.tofile(files[level])
+                    if logging:
+                        np.asarray(c['id'][rows]).tofile(id_files[level])
+                    counts[level] += len(rows)
+        finally:
+            for f in files + id_files:
+                if f is not None:
+                    f.close()
+        
+        battles_this_year = 0
+        # 只考虑筑基及以上的修士
+        total_count = sum(counts)
+        if total_count == 0:
+            return battles_this_year, battles_this_year
+        
+        for level in range(1, len(CultivationLevel)):
+            n = counts[level]
+            if n < 2:
+                continue
+            encounter_probability = n / total_count
+            
+            # 同级存活成员的交换删除数组，初始为0..n-1
+            with open(population.path('live'), 'wb') as f:
+                for start in range(0, n, self.chunk_rows):
+                    np.arange(start, min(n, start + self.chunk_rows), dtype=np.int64).tofile(f)
+            live_count = n
+            
+            # 记录与随机数不超过预算时一次结算，否则分批
+            record_bytes = self.ENCOUNTER_RECORD.itemsize + 32 + (BattleLog.DTYPE.itemsize if logging else 0)
+            batch = n if n * record_bytes <= self.memory_budget else self.encounter_batch
+            for start in range(0, n, batch):
+                stop = min(n, start + batch)
+                # 分批抽取，随机数序列与整个等级一次抽取相同
+                draws = self.rng.random((stop - start, 3))
+                records = population.view(f'level{level}', 0, n, self.ENCOUNTER_RECORD)
+                live = population.view('live', 0, n, np.int64)
+                if self.use_jit:
+                    from ..kernels import encounter_range_kernel
+                    events = self.battle_log.reserve(stop - start) if logging else BattleLog.empty_events()
+                    fights, live_count = encounter_range_kernel(
+                        live, records['position'], live_count, start, records['cultivation_points'],
+                        records['courage'], records['defeats'], records['battles'], records['alive'], draws,
+                        encounter_probability, self.config.absorption_rate, events)
+                else:
+                    events = [] if logging else None
+                    fights, live_count = self._encounter_range(live, records, live_count, start, draws,
+                                                               encounter_probability, events)
+                battles_this_year += fights
+                del records, live
+                if logging:
+                    ids = population.view(f'ids{level}', 0, n, np.int64)
+                    if self.use_jit:
+                        self.battle_log.commit(self.year, level, fights, ids)
+                    else:
+                        self.battle_log.record(self.year, level, events, ids)
+                    del ids
+        
+        # 写回战斗结果
+        offsets = [0] * len(CultivationLevel)
+        for start, stop in population.chunks(self.chunk_rows):
+            c = population.window(start, stop, names)
+            for level, rows in enumerate(self._level_members(c)):
+                if level == 0 or counts[level] < 2 or len(rows) == 0:
+                    continue
+                records = population.view(f'level{level}', offsets[level], offsets[level] + len(rows),
+                                          self.ENCOUNTER_RECORD)
+                for name in ('cultivation_points', 'defeats', 'battles', 'alive'):
+                    c[name][rows] = records[name]
+                offsets[level] += len(rows)
+        
+        return battles_this_year, battles_this_year
+    
+    def _encounter_range(self, live: np.ndarray, records: np.ndarray, live_count: int, start: int, draws: np.ndarray,
+                         encounter_probability: float, events: Optional[list]) -> Tuple[int, int]:
+        """encounter_range_kernel的纯Python实现（不使用编译内核时），返回(战斗次数, 剩余存活成员数)
+        
+        records为某一等级的相遇记录文件，live为同级存活成员的交换删除数组，均原地修改；
+        events不为None时按BattleLog.EVENT_COLUMNS的格式追加本批的战斗（双方为成员下标）。
+        """
+        points, courages = records['cultivation_points'], records['courage']
+        defeats, battles, alive = records['defeats'], records['battles'], records['alive']
+        positions = records['position']
+        absorption_rate = self.config.absorption_rate
+        fights = 0
+        for i, (encounter_roll, opponent_roll, battle_roll) in enumerate(draws.tolist(), start):
+            if not alive[i] or encounter_roll >= encounter_probability or live_count <= 1:
+                continue
+            # 随机选择一个同级对手
+            pos = int(opponent_roll * (live_count - 1))
+            if pos >= positions[i]:
+                pos += 1
+            j = int(live[pos])
+            
+            # 判断是否发生战斗：勇气值 > 战败率（与encounter_range_kernel相同）
+            total = int(points[i]) + int(points[j])
+            win_rate = int(points[i]) / total if total > 0 else 0.5
+            i_fights = float(courages[i]) > 1 - win_rate
+            j_fights = float(courages[j]) > 1 - (int(points[j]) / total if total > 0 else 0.5)
+            if not (i_fights or j_fights):
+                continue
+            winner, loser = (i, j) if battle_roll < win_rate else (j, i)
+            absorbed = int(int(points[loser]) * absorption_rate)
+            if events is not None:
+                events.append((i, j, int(points[i]), int(points[j]), i_fights, j_fights, winner == i, absorbed))
+            fights += 1
+            points[winner] += absorbed
+            defeats[winner] += 1
+            battles[winner] += 1
+            battles[loser] += 1
+            alive[loser] = False
+            
+            # 移除败者：用末尾成员填补空位
+            pos = int(positions[loser])
+            live_count -= 1
+            last = int(live[live_count])
+            if pos < live_count:
+                live[pos] = last
+                positions[last] = pos
+        return fights, live_count
+    
+    def _simulate_encounters_batched(self):
+        raise ValueError("外存引擎只支持逐个结算相遇（sequential）")
+    
+    def bury_dead(self):
+        """将本年陨落的修士移出列文件（逐块前移存活修士，保持原有顺序）"""
+        population = self.population
+        size = 0
+        for start, stop in population.chunks(self.chunk_rows):
+            c = population.window(start, stop)
+            alive = np.array(c['alive'])
+            if alive.all():
+                if size < start:
+                    population.write(size, {name: np.array(column) for name, column in c.items()})
+                size += stop - start
+                continue
+            
+            dead = np.flatnonzero(~alive)
+            cultivators = None
+            if self.graveyard.mode == 'full':
+                rows = {name: column[dead].tolist() for name, column in c.items()}
+                cultivators = [self._make_cultivator(dict(zip(rows, values))) for values in zip(*rows.values())]
+            self.graveyard.bury(self.year, c['id'][dead], c['level'][dead], c['defeats'][dead],
+                                c['cultivation_points'][dead], cultivators=cultivators)
+            kept = {name: column[alive] for name, column in c.items()}
+            del c
+            population.write(size, kept)
+            size += len(kept['id'])
+        population.size = size
+    
+    def export_population(self) -> Dict[str, np.ndarray]:
+        """按列导出存活修士状态（读入内存，用于检查点与迁徙）"""
+        chunks = {field: [] for field in self.POPULATION_FIELDS}
+        for start, stop in self.population.chunks(self.chunk_rows):
+            c = self.population.window(start, stop)
+            alive = np.array(c['alive'])
+            for field in self.POPULATION_FIELDS:
+                chunks[field].append(c[field][alive])
+        return {field: np.concatenate(parts) if parts else np.empty(0, dtype=MemmapPopulation.DTYPES[field])
+                for field, parts in chunks.items()}
+    
+    def remove_population(self, selected: np.ndarray) -> Dict[str, np.ndarray]:
+        """移出存活修士中selected为True者（selected与export_population的行一一对应），按列返回其状态（逐块筛选并写回）"""
+        population = self.population
+        parts = {field: [] for field in self.POPULATION_FIELDS}
+        size = 0
+        offset = 0  # 已处理的存活修士数
+        for start, stop in population.chunks(self.chunk_rows):
+            c = {name: np.array(column) for name, column in population.window(start, stop).items()}
+            alive = np.flatnonzero(c['alive'])
+            leaving = np.zeros(len(c['id']), dtype=bool)
+            leaving[alive] = selected[offset:offset + len(alive)]
+            offset += len(alive)
+            for field in self.POPULATION_FIELDS:
+                parts[field].append(c[field][leaving])
+            kept = {name: column[~leaving] for name, column in c.items()}
+            del c
+            population.write(size, kept)
+            size += len(kept['id'])
+        population.size = size
+        return {field: np.concatenate(chunks) if chunks else np.empty(0, dtype=MemmapPopulation.DTYPES[field])
+                for field, chunks in parts.items()}
+    
+    def merge_population(self, columns: Dict[str, np.ndarray]):
+        """并入一批修士（按列传入，如迁入的修士），全部修士按编号升序排列
+        
+        迁入者编号都大于现有修士时直接追加到列文件末尾；否则需要按编号重写列文件。
+        """
+        ids = self.population.view('id', 0, self.population.size)
+        in_order = len(columns['id']) == 0 or (bool(np.all(ids[1:] >= ids[:-1]))
+                                                and (len(ids) == 0 or columns['id'].min() > ids[-1]))
+        del ids
+        if in_order:
+            order = np.argsort(columns['id'], kind='stable')
+            chunk = {field: columns[field][order] for field in self.POPULATION_FIELDS}
+            chunk['alive'] = np.ones(len(order), dtype=bool)
+            self.population.append(chunk)
+            return
+        current = self.export_population()
+        merged = {field: np.concatenate([current[field], columns[field].astype(current[field].dtype)])
+                  for field in self.POPULATION_FIELDS}
+        order = np.argsort(merged['id'], kind='stable')
+        self.import_population({field: column[order] for field, column in merged.items()})
+    
+    def import_population(self, columns: Dict[str, np.ndarray]):
+        """按列导入修士，替换当前全部修士（逐块写入）"""
+        self.population.size = 0
+        n = len(columns['id'])
+        for start in range(0, n, self.chunk_rows):
+            chunk = {field: columns[field][start:start + self.chunk_rows] for field in self.POPULATION_FIELDS}
+            chunk['alive'] = np.ones(len(chunk['id']), dtype=bool)
+            self.population.append(chunk)
+    
+    def get_level_counts(self) -> List[int]:
+        """获取各等级存活修士数量（按等级值索引）"""
+        counts = np.zeros(len(CultivationLevel), dtype=np.int64)
+        for start, stop in self.population.chunks(self.chunk_rows):
+            c = self.population.window(start, stop, ('level', 'alive'))
+            counts += np.bincount(c['level'][c['alive']], minlength=len(CultivationLevel))
+        return counts.tolist()
+    
+    def get_level_summaries(self) -> Dict[CultivationLevel, Tuple[int, float, float, float]]:
+        """获取各等级存活修士的(人数, 平均勇气, 平均战斗次数, 平均剩余寿元)（逐块求和）"""
+        sums = np.zeros((4, len(CultivationLevel)))
+        for start, stop in self.population.chunks(self.chunk_rows):
+            c = self.population.window(start, stop, ('level', 'courage', 'battles', 'max_lifespan', 'age', 'alive'))
+            alive = np.array(c['alive'])
+            remaining = np.maximum(0, c['max_lifespan'][alive].astype(np.int64) - c['age'][alive])
+            sums += self.level_sums(c['level'][alive], c['courage'][alive], c['battles'][alive], remaining)
+        return self.summaries_from_sums(sums)
+    
+    def get_cultivator(self, index: int) -> Cultivator:
+        """将第index行修士物化为Cultivator对象（仅用于报告）"""
+        return self._make_cultivator({name: column[0].item()
+                                      for name, column in self.population.window(index, index + 1).items()})
+    
+    def _make_cultivator(self, row: Dict) -> Cultivator:
+        """由一行各列的取值构造Cultivator对象"""
+        cultivator = Cultivator(row['id'], self.config, age=row['age'], courage=row['courage'])
+        cultivator.cultivation_points = row['cultivation_points']
+        cultivator.level_index = row['level']
+        cultivator.max_lifespan = row['max_lifespan']
+        cultivator.is_alive = row['alive']
+        cultivator.defeats_count = row['defeats']
+        cultivator.battles_count = row['battles']
+        cultivator.birth_year = row['birth_year']
+        return cultivator
+    
+    def _alive_argmax(self, name: str) -> Optional[Cultivator]:
+        """返回存活修士中指定列数值最大者（并列时取最早加入者）"""
+        best, best_value = None, None
+        for start, stop in self.population.chunks(self.chunk_rows):
+            c = self.population.window(start, stop, (name, 'alive'))
+            alive_idx = np.flatnonzero(c['alive'])
+            if len(alive_idx) == 0:
+                continue
+            k = np.argmax(c[name][alive_idx])
+            if best is None or c[name][alive_idx[k]] > best_value:
+                best, best_value = start + alive_idx[k], c[name][alive_idx[k]]
+        return None if best is None else self.get_cultivator(best)
+    
+    def get_strongest(self) -> Optional[Cultivator]:
+        """获取修为最高的存活修士"""
+        return self._alive_argmax('cultivation_points')
+    
+    def get_top_killer(self) -> Optional[Cultivator]:
+        """获取击败人数最多的存活修士"""
+        return self._alive_argmax('defeats')
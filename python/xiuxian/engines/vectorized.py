@@ -0,0 +1,332 @@
+"""向量化引擎"""
+import numpy as np
+from typing import List, Dict, Tuple, Optional
+
+from ..core import CultivationLevel, Cultivator, RandomStreams, SimulationConfig, jit_available
+from ..encounters import LiveMemberIndex, resolve_encounters_batched
+from ..records import BattleLog
+from ..sinks import StatisticsSink
+from .base import CultivationWorld
+
+class VectorizedCultivationWorld(CultivationWorld):
+    """修仙世界模拟器（向量化引擎）
+    
+    以结构数组（struct-of-arrays）保存修士状态，修炼、晋升、寿元耗尽与统计
+    均以整列数组运算完成；战斗规则与对象引擎完全一致，统计结构也保持相同。
+    """
+    
+    # 各等级晋升到下一等级所需修为（最高等级不可晋升）
+    ADVANCE_THRESHOLDS = np.array(Cultivator.ADVANCE_THRESHOLDS[:-1] + (np.iinfo(np.int64).max,), dtype=np.int64)
+    # 晋升到各等级时增加的寿元
+    LIFESPAN_BONUSES = np.array(Cultivator.LIFESPAN_BONUSES, dtype=np.int64)
+    
+    engine_name = 'vectorized'
+    
+    def __init__(self, config: SimulationConfig, rng: RandomStreams = None, sink: StatisticsSink = None):
+        super().__init__(config, rng, sink)
+        # 逐个结算的修炼与相遇是否使用编译内核（默认在安装了numba时启用，结果与纯Python实现完全一致）
+        self.use_jit = config.use_jit and jit_available()
+        self.ids = np.empty(0, dtype=np.int64)
+        self.ages = np.empty(0, dtype=np.int64)
+        self.cultivation_points = np.empty(0, dtype=np.int64)
+        self.levels = np.empty(0, dtype=np.int8)
+        self.courages = np.empty(0, dtype=np.float64)
+        self.max_lifespans = np.empty(0, dtype=np.int64)
+        self.alive = np.empty(0, dtype=bool)
+        self.defeats = np.empty(0, dtype=np.int64)
+        self.battles = np.empty(0, dtype=np.int64)
+        self.birth_years = np.empty(0, dtype=np.int64)
+    
+    def add_new_cultivators(self, count: int = None):
+        """每年新增筑基成功的修士"""
+        if count is None:
+            count = self.config.new_cultivators_per_year
+        if count <= 0:
+            return
+        
+        # 整批抽取开始修炼年龄与勇气值；筑基成功年龄 = 开始修炼年龄 + 10年
+        ages, courages = self.config.draw_cohort(count, self.rng)
+        ages += 10
+        
+        self.ids = np.concatenate([self.ids, self.allocate_ids(count)])
+        self.ages = np.concatenate([self.ages, ages])
+        self.cultivation_points = np.concatenate([self.cultivation_points, np.full(count, 10, dtype=np.int64)])
+        self.levels = np.concatenate([self.levels, np.full(count, CultivationLevel.ZHUJI.value, dtype=np.int8)])
+        self.courages = np.concatenate([self.courages, courages])
+        self.max_lifespans = np.concatenate([self.max_lifespans, np.full(count, 100, dtype=np.int64)])
+        self.alive = np.concatenate([self.alive, np.ones(count, dtype=bool)])
+        self.defeats = np.concatenate([self.defeats, np.zeros(count, dtype=np.int64)])
+        self.battles = np.concatenate([self.battles, np.zeros(count, dtype=np.int64)])
+        self.birth_years = np.concatenate([self.birth_years, np.maximum(1, self.year - ages + 1)])
+    
+    def cultivate_all(self):
+        """所有修士修炼一年（整列运算）"""
+        self.cultivate_columns(self.cultivation_points, self.ages, self.levels, self.max_lifespans, self.alive)
+    
+    def cultivate_columns(self, points: np.ndarray, ages: np.ndarray, levels: np.ndarray,
+                          max_lifespans: np.ndarray, alive: np.ndarray):
+        """对给定的各列（可以是整列或其中一段）原地完成一年修炼"""
+        if self.use_jit:
+            from ..kernels import cultivate_kernel
+            cultivate_kernel(points, ages, levels, max_lifespans, alive, self.ADVANCE_THRESHOLDS, self.LIFESPAN_BONUSES)
+            return
+        
+        active = alive.copy()
+        points[active] += 1
+        ages[active] += 1
+        
+        # 检查是否寿元耗尽
+        alive[active & (ages >= max_lifespans)] = False
+        
+        # 自动晋升（与对象引擎一致：本年修炼前存活者均做晋升检查）
+        advancing = active & (points >= self.ADVANCE_THRESHOLDS[levels])
+        levels[advancing] += 1
+        max_lifespans[advancing] += self.LIFESPAN_BONUSES[levels[advancing]]
+    
+    def simulate_encounters(self):
+        """模拟修士相遇和战斗（逐个结算，规则同对象引擎）"""
+        if self.config.encounter_mode == 'batched':
+            return self._simulate_encounters_batched()
+        
+        battles_this_year = 0
+        deaths_this_year = 0
+        
+        # 只考虑筑基及以上的修士
+        total_count = int(np.count_nonzero(self.alive & (self.levels >= 1)))
+        if total_count == 0:
+            return battles_this_year, deaths_this_year
+        
+        points = self.cultivation_points
+        absorption_rate = self.config.absorption_rate
+        for level in CultivationLevel:
+            if level.value < 1:
+                continue
+            members = np.flatnonzero(self.alive & (self.levels == level.value))
+            if len(members) < 2:
+                continue
+            
+            encounter_probability = len(members) / total_count
+            # 每个修士每年固定使用三个随机数（相遇、选择对手、战斗结果），与对象引擎一致
+            draws = self.rng.random((len(members), 3))
+            if self.use_jit:
+                from ..kernels import encounter_kernel
+                events = (self.battle_log.reserve(len(members)) if self.battle_log is not None
+                          else BattleLog.empty_events())
+                fights = encounter_kernel(members, points, self.courages, self.defeats, self.battles, self.alive,
+                                          draws, encounter_probability, absorption_rate, events)
+                if self.battle_log is not None:
+                    self.battle_log.commit(self.year, level.value, fights, self.ids[members])
+                battles_this_year += fights
+                deaths_this_year += fights
+                continue
+            
+            events = [] if self.battle_log is not None else None
+            members = members.tolist()
+            live_index = LiveMemberIndex(members)
+            for i, (encounter_roll, opponent_roll, battle_roll) in zip(members, draws.tolist()):
+                if not self.alive[i]:
+                    continue
+                
+                if encounter_roll < encounter_probability:
+                    # 随机选择一个同级对手
+                    if len(live_index) > 1:
+                        j = live_index.sample_other(i, opponent_roll)
+                        
+                        # 判断是否发生战斗：勇气值 > 战败率
+                        # 对手的败率与Cultivator.will_fight一样为1 - 对手修为/总修为，不化简为win_rate（浮点舍入不同）
+                        total = points[i] + points[j]
+                        win_rate = points[i] / total if total > 0 else 0.5
+                        i_fights = self.courages[i] > 1 - win_rate
+                        j_fights = self.courages[j] > 1 - (points[j] / total if total > 0 else 0.5)
+                        if i_fights or j_fights:
+                            battles_this_year += 1
+                            deaths_this_year += 1
+                            
+                            # 计算战斗结果
+                            winner, loser = (i, j) if battle_roll < win_rate else (j, i)
+                            absorbed = int(points[loser] * absorption_rate)
+                            if events is not None:
+                                events.append((i, j, points[i], points[j], i_fights, j_fights, winner == i, absorbed))
+                            points[winner] += absorbed
+                            self.defeats[winner] += 1
+                            self.battles[winner] += 1
+                            self.battles[loser] += 1
+                            self.alive[loser] = False
+                            live_index.remove(loser)
+            if events:
+                self.battle_log.record(self.year, level.value, events, self.ids)
+        
+        return battles_this_year, deaths_this_year
+    
+    def _simulate_encounters_batched(self):
+        """按等级整批结算相遇和战斗（规则见resolve_encounters_batched）"""
+        battles_this_year = 0
+        
+        # 只考虑筑基及以上的修士
+        total_count = int(np.count_nonzero(self.alive & (self.levels >= 1)))
+        if total_count == 0:
+            return battles_this_year, battles_this_year
+        
+        for level in range(1, len(CultivationLevel)):
+            members = np.flatnonzero(self.alive & (self.levels == level))
+            if len(members) < 2:
+                continue
+            draws = self.rng.random((len(members), 3))
+            winners, losers, absorbed, events = resolve_encounters_batched(
+                self.cultivation_points[members], self.courages[members], len(members) / total_count,
+                draws, self.config.absorption_rate)
+            if self.battle_log is not None:
+                self.battle_log.record(self.year, level, events, self.ids[members])
+            winners, losers = members[winners], members[losers]
+            self.cultivation_points[winners] += absorbed
+            self.defeats[winners] += 1
+            self.battles[winners] += 1
+            self.battles[losers] += 1
+            self.alive[losers] = False
+            battles_this_year += len(winners)
+        
+        return battles_this_year, battles_this_year
+    
+    def bury_dead(self):
+        """将本年陨落的修士移出结构数组（保持原有顺序）"""
+        dead = ~self.alive
+        if not dead.any():
+            return
+        dead_idx = np.flatnonzero(dead)
+        cultivators = [self.get_cultivator(i) for i in dead_idx] if self.graveyard.mode == 'full' else None
+        self.graveyard.bury(self.year, self.ids[dead_idx], self.levels[dead_idx],
+                            self.defeats[dead_idx], self.cultivation_points[dead_idx],
+                            cultivators=cultivators)
+        
+        keep = self.alive
+        self.ids = self.ids[keep]
+        self.ages = self.ages[keep]
+        self.cultivation_points = self.cultivation_points[keep]
+        self.levels = self.levels[keep]
+        self.courages = self.courages[keep]
+        self.max_lifespans = self.max_lifespans[keep]
+        self.defeats = self.defeats[keep]
+        self.battles = self.battles[keep]
+        self.birth_years = self.birth_years[keep]
+        self.alive = self.alive[keep]
+    
+    def export_population(self) -> Dict[str, np.ndarray]:
+        """按列导出存活修士状态"""
+        alive = self.alive
+        return {
+            'id': self.ids[alive],
+            'age': self.ages[alive],
+            'cultivation_points': self.cultivation_points[alive],
+            'level': self.levels[alive],
+            'courage': self.courages[alive],
+            'max_lifespan': self.max_lifespans[alive],
+            'defeats': self.defeats[alive],
+            'battles': self.battles[alive],
+            'birth_year': self.birth_years[alive],
+        }
+    
+    # 修士状态各列对应的属性名
+    COLUMN_ATTRIBUTES = {'id': 'ids', 'age': 'ages', 'cultivation_points': 'cultivation_points', 'level': 'levels',
+                         'courage': 'courages', 'max_lifespan': 'max_lifespans', 'defeats': 'defeats',
+                         'battles': 'battles', 'birth_year': 'birth_years', 'alive': 'alive'}
+    
+    def remove_population(self, selected: np.ndarray) -> Dict[str, np.ndarray]:
+        """移出存活修士中selected为True者（selected与export_population的行一一对应），按列返回其状态"""
+        leaving = np.flatnonzero(self.alive)[selected]
+        emigrants = {field: getattr(self, self.COLUMN_ATTRIBUTES[field])[leaving] for field in self.POPULATION_FIELDS}
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[leaving] = False
+        for attribute in self.COLUMN_ATTRIBUTES.values():
+            setattr(self, attribute, getattr(self, attribute)[keep])
+        return emigrants
+    
+    def merge_population(self, columns: Dict[str, np.ndarray]):
+        """并入一批修士（按列传入，如迁入的修士），全部修士按编号升序排列"""
+        columns = dict(columns, alive=np.ones(len(columns['id']), dtype=bool))
+        for field, attribute in self.COLUMN_ATTRIBUTES.items():
+            current = getattr(self, attribute)
+            setattr(self, attribute, np.concatenate([current, columns[field].astype(current.dtype)]))
+        if np.any(self.ids[1:] < self.ids[:-1]):
+            order = np.argsort(self.ids, kind='stable')
+            for attribute in self.COLUMN_ATTRIBUTES.values():
+                setattr(self, attribute, getattr(self, attribute)[order])
+    
+    def import_population(self, columns: Dict[str, np.ndarray]):
+        """按列导入修士，替换当前全部修士"""
+        self.ids = columns['id'].astype(np.int64)
+        self.ages = columns['age'].astype(np.int64)
+        self.cultivation_points = columns['cultivation_points'].astype(np.int64)
+        self.levels = columns['level'].astype(np.int8)
+        self.courages = columns['courage'].astype(np.float64)
+        self.max_lifespans = columns['max_lifespan'].astype(np.int64)
+        self.defeats = columns['defeats'].astype(np.int64)
+        self.battles = columns['battles'].astype(np.int64)
+        self.birth_years = columns['birth_year'].astype(np.int64)
+        self.alive = np.ones(len(self.ids), dtype=bool)
+    
+    def get_level_counts(self) -> List[int]:
+        """获取各等级存活修士数量（按等级值索引）"""
+        return np.bincount(self.levels[self.alive], minlength=len(CultivationLevel)).tolist()
+    
+    def get_level_summaries(self) -> Dict[CultivationLevel, Tuple[int, float, float, float]]:
+        """获取各等级存活修士的(人数, 平均勇气, 平均战斗次数, 平均剩余寿元)"""
+        remaining = np.maximum(0, self.max_lifespans[self.alive] - self.ages[self.alive])
+        return self.summarize_levels(self.levels[self.alive], self.courages[self.alive],
+                                     self.battles[self.alive], remaining)
+    
+    @classmethod
+    def summarize_levels(cls, levels: np.ndarray, courages: np.ndarray, battles: np.ndarray,
+                         remaining: np.ndarray) -> Dict[CultivationLevel, Tuple[int, float, float, float]]:
+        """按等级汇总存活修士的列，得到(人数, 平均勇气, 平均战斗次数, 平均剩余寿元)"""
+        return cls.summaries_from_sums(cls.level_sums(levels, courages, battles, remaining))
+    
+    @staticmethod
+    def level_sums(levels: np.ndarray, courages: np.ndarray, battles: np.ndarray, remaining: np.ndarray) -> np.ndarray:
+        """按等级求和，返回4行数组：人数、勇气之和、战斗次数之和、剩余寿元之和（分块结果可直接相加）"""
+        n_levels = len(CultivationLevel)
+        return np.array([np.bincount(levels, minlength=n_levels),
+                         np.bincount(levels, weights=courages, minlength=n_levels),
+                         np.bincount(levels, weights=battles, minlength=n_levels),
+                         np.bincount(levels, weights=remaining, minlength=n_levels)])
+    
+    @staticmethod
+    def summaries_from_sums(sums: np.ndarray) -> Dict[CultivationLevel, Tuple[int, float, float, float]]:
+        """由level_sums的结果得到各等级(人数, 平均勇气, 平均战斗次数, 平均剩余寿元)"""
+        counts, courage_sums, battle_sums, lifespan_sums = sums
+        summaries = {}
+        for level in CultivationLevel:
+            count = int(counts[level.value])
+            if count > 0:
+                summaries[level] = (count,
+                                    courage_sums[level.value] / count,
+                                    battle_sums[level.value] / count,
+                                    lifespan_sums[level.value] / count)
+        return summaries
+    
+    def get_cultivator(self, index: int) -> Cultivator:
+        """将数组中第index位修士物化为Cultivator对象（仅用于报告）"""
+        cultivator = Cultivator(int(self.ids[index]), self.config,
+                                age=int(self.ages[index]), courage=float(self.courages[index]))
+        cultivator.cultivation_points = int(self.cultivation_points[index])
+        cultivator.level_index = int(self.levels[index])
+        cultivator.max_lifespan = int(self.max_lifespans[index])
+        cultivator.is_alive = bool(self.alive[index])
+        cultivator.defeats_count = int(self.defeats[index])
+        cultivator.battles_count = int(self.battles[index])
+        cultivator.birth_year = int(self.birth_years[index])
+        return cultivator
+    
+    def _alive_argmax(self, values: np.ndarray) -> Optional[Cultivator]:
+        """返回存活修士中指定数值最大者（并列时取最早加入者）"""
+        alive_idx = np.flatnonzero(self.alive)
+        if len(alive_idx) == 0:
+            return None
+        return self.get_cultivator(alive_idx[np.argmax(values[alive_idx])])
+    
+    def get_strongest(self) -> Optional[Cultivator]:
+        """获取修为最高的存活修士"""
+        return self._alive_argmax(self.cultivation_points)
+    
+    def get_top_killer(self) -> Optional[Cultivator]:
+        """获取击败人数最多的存活修士"""
+        return self._alive_argmax(self.defeats)
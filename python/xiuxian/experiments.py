@@ -0,0 +1,530 @@
+"""运行缓存、参数扫描、集合模拟与均场引擎校验"""
+import hashlib
+import numpy as np
+from typing import List, Dict, Tuple, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import csv
+import itertools
+import json
+import os
+from statistics import NormalDist
+import tempfile
+import time
+import warnings
+
+from .core import SIMULATOR_VERSION, CultivationLevel, RandomStreams, SimulationConfig
+from .sinks import flatten_row, statistics_from_arrays, statistics_rows, statistics_to_arrays
+from .engines.base import CultivationWorld
+from .engines import APPROXIMATE_ENGINES, ENGINES, EXACT_ENGINES
+from .runner import run_headless
+
+class RunCache:
+    """已完成模拟的磁盘缓存（按内容寻址）
+    
+    键为模拟参数、随机种子（含spawn路径）与模拟器版本的哈希，值为逐年统计与结束时的
+    人口概况。EXACT_ENGINES中的引擎在相同种子下结果逐位相同，共用同一个键；其余引擎
+    （memmap与近似引擎）的键包含引擎名，结果另行缓存。写入先落到同目录的
+    临时文件再原子替换，读取时更新文件修改时间；总大小超过上限时按最近使用时间淘汰，
+    多个工作进程可以安全地共享同一缓存目录。
+    """
+    
+    SUFFIX = '.npz'
+    
+    def __init__(self, directory: str, max_bytes: int = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+    
+    @staticmethod
+    def key(config: SimulationConfig, engine: str = 'object') -> str:
+        """计算配置对应的缓存键"""
+        seed_sequence = config.rng.seed_sequence
+        content = {
+            'params': config.get_params(),
+            'entropy': seed_sequence.entropy,
+            'spawn_key': list(seed_sequence.spawn_key),
+            'version': SIMULATOR_VERSION,
+        }
+        if engine not in EXACT_ENGINES:
+            content['engine'] = engine
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+    
+    def get(self, config: SimulationConfig, engine: str = 'object') -> Optional[Dict]:
+        """读取缓存结果{'statistics', 'summary'}，未命中时返回None"""
+        path = self._path(self.key(config, engine))
+        try:
+            with np.load(path) as data:
+                arrays = {key: data[key] for key in data.files}
+            os.utime(path)  # 记录最近使用时间
+        except (OSError, ValueError, KeyError):  # 未命中，或条目正被其他进程淘汰
+            return None
+        statistics = statistics_from_arrays({key[len('statistics_'):]: value for key, value in arrays.items()
+                                             if key.startswith('statistics_')})
+        return {'statistics': statistics, 'summary': json.loads(str(arrays['summary']))}
+    
+    def put(self, config: SimulationConfig, world: CultivationWorld):
+        """写入一次已完成模拟的结果"""
+        arrays = {'statistics_' + key: column for key, column in statistics_to_arrays(world.statistics).items()}
+        arrays['summary'] = np.array(json.dumps(self.population_summary(world), ensure_ascii=False))
+        
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self._path(self.key(config, world.engine_name)))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+    
+    def evict(self):
+        """总大小超过上限时，按最近使用时间从旧到新删除条目"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:  # 已被其他进程删除
+                pass
+            total -= size
+    
+    @staticmethod
+    def population_summary(world: CultivationWorld) -> Dict:
+        """结束时的人口概况：各等级(人数, 平均勇气, 平均战斗次数, 平均剩余寿元)、最强修士、杀戮之王与均衡年份"""
+        def describe(cultivator):
+            if cultivator is None:
+                return None
+            return {'id': cultivator.id, 'level': cultivator.level.name, 'cultivation': cultivator.cultivation_points,
+                    'age': cultivator.age, 'defeats': cultivator.defeats_count, 'courage': cultivator.courage,
+                    'remaining_lifespan': cultivator.get_remaining_lifespan()}
+        
+        return {
+            'year': world.year,
+            'levels': {level.name: list(summary) for level, summary in world.get_level_summaries().items()},
+            'strongest': describe(world.get_strongest()),
+            'top_killer': describe(world.get_top_killer()),
+            'equilibrium_year': world.equilibrium_year,
+        }
+
+def cached_run(config: SimulationConfig, engine: str = 'object', cache: RunCache = None) -> Dict:
+    """无界面运行完整模拟，返回{'statistics', 'summary', 'cached'}；命中缓存时不再模拟"""
+    if cache is not None:
+        result = cache.get(config, engine)
+        if result is not None:
+            return dict(result, cached=True)
+    
+    world = run_headless(config, engine)
+    try:
+        if cache is not None:
+            cache.put(config, world)
+        return {'statistics': world.statistics, 'summary': RunCache.population_summary(world), 'cached': False}
+    finally:
+        world.close()
+
+def flatten_statistics(statistics: Dict) -> List[Dict]:
+    """将统计数据展开为逐年的扁平记录（每年一行）"""
+    return [flatten_row(row) for row in statistics_rows(statistics)]
+
+def _run_sweep_task(task: Dict) -> Dict:
+    """参数扫描的单次运行（在工作进程中执行）"""
+    try:
+        config = SimulationConfig.from_params(task['params'], seed=task['seed_sequence'], options=task['options'])
+        result = cached_run(config, task['engine'], task['cache'])
+        return {'rows': flatten_statistics(result['statistics']), 'error': None, 'cached': result['cached'],
+                'equilibrium_year': result['summary'].get('equilibrium_year')}
+    except Exception as e:  # 单次运行失败不影响整个扫描
+        return {'rows': [], 'error': f"{type(e).__name__}: {e}", 'cached': False}
+
+class ParameterSweep:
+    """参数扫描
+    
+    对参数网格中的每个取值组合运行若干独立副本，各次运行以无界面方式分发到进程池，
+    每次运行使用由根种子spawn出的独立随机流。结果合并为一张逐年明细表。
+    工作进程异常退出时重建进程池并重试未完成的运行，超过重试次数后记为失败。
+    指定运行缓存时，已完成过的运行直接读取缓存结果。
+    """
+    
+    def __init__(self, base_config: SimulationConfig, grid: Dict[str, List], replicas: int = 1,
+                 engine: str = 'object', workers: int = None, retries: int = 2, cache: RunCache = None):
+        for name in grid:
+            if name not in SimulationConfig.PARAMETERS:
+                raise ValueError(f"未知的模拟参数: {name}")
+        self.base_config = base_config
+        self.grid = grid
+        self.replicas = replicas
+        self.engine = engine
+        self.workers = workers or os.cpu_count()
+        self.retries = retries
+        self.cache = cache
+        self.results: List[Dict] = []
+        self.failures: List[Dict] = []
+        self.cache_hits = 0
+    
+    @staticmethod
+    def parse_grid(specs: List[str], base_config: SimulationConfig) -> Dict[str, List]:
+        """解析形如 absorption_rate=0.05,0.1 的网格参数，取值类型与基础配置一致"""
+        grid = {}
+        for spec in specs:
+            name, _, values = spec.partition('=')
+            name = name.strip().replace('-', '_')
+            if name not in SimulationConfig.PARAMETERS or not values:
+                raise ValueError(f"无效的网格参数: {spec}")
+            value_type = type(getattr(base_config, name))
+            grid[name] = [value_type(v) for v in values.split(',')]
+        return grid
+    
+    def tasks(self) -> List[Dict]:
+        """生成全部运行任务"""
+        names = list(self.grid)
+        points = list(itertools.product(*(self.grid[name] for name in names)))
+        streams = self.base_config.rng.fresh_seed_sequence().spawn(len(points) * self.replicas)
+        tasks = []
+        for point_index, values in enumerate(points):
+            params = self.base_config.get_params()
+            params.update(zip(names, values))
+            for replica in range(self.replicas):
+                stream = point_index * self.replicas + replica
+                tasks.append({
+                    'params': params,
+                    'options': self.base_config.get_options(),
+                    'replica': replica,
+                    'stream': stream,
+                    'seed_sequence': streams[stream],
+                    'engine': self.engine,
+                    'cache': self.cache,
+                })
+        return tasks
+    
+    def run(self, progress: bool = False) -> List[Dict]:
+        """运行扫描，返回合并后的逐年明细"""
+        queue = deque(self.tasks())
+        total = len(queue)
+        attempts = {task['stream']: 0 for task in queue}
+        done = 0
+        
+        # 每个通道是只有一个工作进程的进程池：进程崩溃只影响该通道上正在运行的任务
+        lanes: List[Optional[ProcessPoolExecutor]] = [None] * max(1, min(self.workers, total))
+        running = {}  # future -> (通道, 任务)
+        try:
+            while queue or running:
+                busy = {lane for lane, _ in running.values()}
+                for lane in range(len(lanes)):
+                    if queue and lane not in busy:
+                        if lanes[lane] is None:
+                            lanes[lane] = ProcessPoolExecutor(max_workers=1)
+                        task = queue.popleft()
+                        running[lanes[lane].submit(_run_sweep_task, task)] = (lane, task)
+                
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    lane, task = running.pop(future)
+                    try:
+                        outcome = future.result()
+                    except BrokenProcessPool:
+                        # 工作进程崩溃：重建该通道并重试，超过重试次数后记为失败
+                        lanes[lane].shutdown(wait=False)
+                        lanes[lane] = None
+                        attempts[task['stream']] += 1
+                        if attempts[task['stream']] <= self.retries:
+                            queue.append(task)
+                            continue
+                        outcome = {'rows': [], 'error': '工作进程异常退出'}
+                    
+                    done += 1
+                    self._collect(task, outcome)
+                    if progress:
+                        print(f"扫描进度: {done}/{total}")
+        finally:
+            for executor in lanes:
+                if executor is not None:
+                    executor.shutdown()
+        
+        self.results.sort(key=lambda row: (row['stream'], row['year']))
+        return self.results
+    
+    def _collect(self, task: Dict, outcome: Dict):
+        """合并单次运行结果"""
+        run_info = dict(task['params'])
+        run_info.update(replica=task['replica'], stream=task['stream'], seed=self.base_config.rng.entropy)
+        if outcome['error'] is not None:
+            self.failures.append(dict(run_info, error=outcome['error']))
+            return
+        self.cache_hits += outcome['cached']
+        run_info['equilibrium_year'] = outcome['equilibrium_year']
+        for row in outcome['rows']:
+            self.results.append(dict(run_info, **row))
+    
+    def write_csv(self, path: str):
+        """将合并结果写入CSV文件"""
+        if not self.results:
+            return
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.results[0]))
+            writer.writeheader()
+            writer.writerows(self.results)
+
+class WelfordAccumulator:
+    """逐元素的在线均值与方差（Welford算法）
+    
+    每次add一个形状相同的样本数组（如某个副本的逐年统计矩阵），无需保存全部样本。
+    样本中的NaN为缺失值（如稀疏采样未统计的年份），不参与该元素的统计；counts为各元素的有效样本数。
+    """
+    
+    def __init__(self, shape: Tuple[int, ...]):
+        self.count = 0
+        self.counts = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)  # 与均值之差的平方和
+    
+    def add(self, sample: np.ndarray):
+        """加入一个样本"""
+        self.count += 1
+        observed = ~np.isnan(sample)
+        self.counts += observed
+        delta = np.where(observed, sample - self.mean, 0.0)
+        self.mean += delta / np.maximum(self.counts, 1)
+        self.m2 += delta * np.where(observed, sample - self.mean, 0.0)
+    
+    def variance(self) -> np.ndarray:
+        """样本方差（无偏），有效样本数不足2时为无穷大"""
+        return np.where(self.counts >= 2, self.m2 / np.maximum(self.counts - 1, 1), np.inf)
+    
+    def half_width(self, confidence: float = 0.95) -> np.ndarray:
+        """均值置信区间的半宽（正态近似）"""
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        return z * np.sqrt(self.variance() / np.maximum(self.counts, 1))
+
+def _run_ensemble_replica(task: Dict) -> Dict:
+    """集合模拟的单个副本（在工作进程中执行），返回{'matrix': 逐年统计矩阵, 'error': 错误信息}"""
+    try:
+        config = SimulationConfig.from_params(task['params'], seed=task['seed_sequence'], options=task['options'])
+        result = cached_run(config, task['engine'], task['cache'])
+        return {'matrix': MonteCarloEnsemble.statistics_matrix(result['statistics']), 'error': None}
+    except Exception as e:  # 单个副本失败不影响整个集合模拟
+        return {'matrix': None, 'error': f"{type(e).__name__}: {e}"}
+
+class MonteCarloEnsemble:
+    """自适应蒙特卡洛集合模拟
+    
+    以相同参数并行运行多个独立副本（随机流由根种子依次spawn），逐年统计（总人数、战斗、
+    陨落与各等级人数）流式并入Welford累加器。每个副本并入后检查置信区间：全部指标在全部
+    年份的半宽都不超过max(rel_width × |均值|, abs_width)时停止增加副本；均衡后稀疏采样的副本
+    未统计的年份记为缺失，有效样本少于min_replicas的元素不参与判断。副本按编号顺序
+    并入，停止时的副本数与并行进程数无关，结果可复现；收敛时尚未开始的副本被取消，
+    已在运行的副本无法中断，会运行完毕后丢弃。
+    工作进程异常退出时重建进程池并重试未完成的副本，超过重试次数或副本本身出错时记为失败并跳过。
+    """
+    
+    METRICS = ('total_cultivators', 'battles', 'deaths') + tuple(level.name for level in CultivationLevel)
+    
+    def __init__(self, config: SimulationConfig, engine: str = 'object', rel_width: float = 0.05,
+                 abs_width: float = 1.0, confidence: float = 0.95, min_replicas: int = 5,
+                 max_replicas: int = 100, workers: int = None, cache: RunCache = None, retries: int = 2):
+        if min_replicas < 2 or max_replicas < min_replicas:
+            raise ValueError("副本数范围无效：至少需要2个副本，且上限不小于下限")
+        if config.convergence_window > 0 and config.convergence_action == 'stop':
+            raise ValueError("集合模拟要求各副本模拟相同年数，均衡检测只能使用稀疏采样（sparse）")
+        self.config = config
+        self.engine = engine
+        self.rel_width = rel_width
+        self.abs_width = abs_width
+        self.confidence = confidence
+        self.min_replicas = min_replicas
+        self.max_replicas = max_replicas
+        self.workers = workers or os.cpu_count()
+        self.cache = cache
+        self.retries = retries
+        self.accumulator = WelfordAccumulator((config.simulation_years, len(self.METRICS)))
+        self.converged = False
+        self.failures: List[Dict] = []
+    
+    @classmethod
+    def statistics_matrix(cls, statistics: Dict) -> np.ndarray:
+        """将逐年统计转换为(年数, 指标数)矩阵，列顺序同METRICS，缺失值（稀疏采样未统计的年份）为NaN"""
+        columns = [[total if total is not None else np.nan for total in statistics['total_cultivators']],
+                   statistics['battles'], statistics['deaths']]
+        columns += [[dist[level.name] if dist is not None else np.nan for dist in statistics['level_distribution']]
+                    for level in CultivationLevel]
+        return np.array(columns, dtype=np.float64).T
+    
+    def is_converged(self) -> bool:
+        """全部指标与年份的置信区间是否都已达到要求的宽度"""
+        acc = self.accumulator
+        if acc.count < self.min_replicas:
+            return False
+        judged = acc.counts >= self.min_replicas
+        tolerance = np.maximum(self.rel_width * np.abs(acc.mean), self.abs_width)
+        return bool(np.all((acc.half_width(self.confidence) <= tolerance)[judged]))
+    
+    def max_relative_width(self) -> float:
+        """当前最大的"半宽/容许宽度"比值（不大于1即已收敛；有效样本少于min_replicas的元素除外）"""
+        acc = self.accumulator
+        judged = acc.counts >= min(self.min_replicas, acc.count)
+        if not np.any(judged):
+            return np.inf
+        tolerance = np.maximum(self.rel_width * np.abs(acc.mean), self.abs_width)
+        return float(np.max(acc.half_width(self.confidence)[judged] / tolerance[judged]))
+    
+    def run(self, progress: bool = False) -> 'MonteCarloEnsemble':
+        """运行副本直到置信区间收敛或达到副本上限"""
+        params = self.config.get_params()
+        seed_sequence = self.config.rng.fresh_seed_sequence()
+        submitted = 0
+        merged = 0      # 已按顺序处理（并入或记为失败）的副本数
+        retry = deque() # 因工作进程异常退出而等待重试的任务
+        attempts = {}   # 副本编号 -> 工作进程异常退出的次数
+        completed = {}  # 副本编号 -> 统计矩阵，失败为None（等待按顺序并入）
+        running = {}    # future -> (进程池代数, 任务)
+        generation = 0  # 进程池每重建一次加一
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            while not self.converged and merged < self.max_replicas:
+                while len(running) < self.workers and (retry or submitted < self.max_replicas):
+                    if retry:
+                        task = retry.popleft()
+                    else:
+                        task = {'replica': submitted, 'params': params, 'options': self.config.get_options(),
+                                'seed_sequence': seed_sequence.spawn(1)[0], 'engine': self.engine, 'cache': self.cache}
+                        submitted += 1
+                    running[executor.submit(_run_ensemble_replica, task)] = (generation, task)
+                
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task_generation, task = running.pop(future)
+                    replica = task['replica']
+                    try:
+                        outcome = future.result()
+                    except BrokenProcessPool:
+                        # 工作进程崩溃：重建进程池（同一进程池中的其余副本随后也会以此异常返回）并重试，
+                        # 超过重试次数后记为失败
+                        if task_generation == generation:
+                            executor.shutdown(wait=False)
+                            executor = ProcessPoolExecutor(max_workers=self.workers)
+                            generation += 1
+                        attempts[replica] = attempts.get(replica, 0) + 1
+                        if attempts[replica] <= self.retries:
+                            retry.append(task)
+                            continue
+                        outcome = {'matrix': None, 'error': '工作进程异常退出'}
+                    if outcome['error'] is not None:
+                        self.failures.append({'replica': replica, 'error': outcome['error']})
+                    completed[replica] = outcome['matrix']
+                
+                # 按副本编号顺序并入，每并入一个检查一次是否收敛
+                while merged in completed and not self.converged:
+                    matrix = completed.pop(merged)
+                    merged += 1
+                    if matrix is None:
+                        continue
+                    self.accumulator.add(matrix)
+                    self.converged = self.is_converged()
+                    if progress and self.accumulator.count >= 2:
+                        print(f"副本{self.accumulator.count}: 最大半宽为容许宽度的{self.max_relative_width():.2f}倍")
+        finally:
+            # 取消尚未开始的副本；已在运行的副本无法中断，等待其结束后退出
+            executor.shutdown(cancel_futures=True)
+        return self
+    
+    def summary(self) -> Dict[str, Dict[str, np.ndarray]]:
+        """各指标逐年的均值、标准差、置信区间半宽与有效样本数（没有有效样本的年份均值为NaN）"""
+        acc = self.accumulator
+        mean = np.where(acc.counts > 0, acc.mean, np.nan)
+        std = np.sqrt(acc.variance())
+        half_width = acc.half_width(self.confidence)
+        return {metric: {'mean': mean[:, i], 'std': std[:, i], 'half_width': half_width[:, i],
+                         'count': acc.counts[:, i]}
+                for i, metric in enumerate(self.METRICS)}
+    
+    def write_csv(self, path: str):
+        """将逐年均值与置信区间写入CSV文件（每年一行，没有有效样本的值留空）"""
+        summary = self.summary()
+        fieldnames = ['year', 'replicas']
+        for metric in self.METRICS:
+            fieldnames += [f'{metric}_mean', f'{metric}_std', f'{metric}_ci']
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            for year in range(self.config.simulation_years):
+                row = {'year': year + 1, 'replicas': self.accumulator.count}
+                for metric, values in summary.items():
+                    observed = values['count'][year] > 0
+                    row[f'{metric}_mean'] = values['mean'][year] if observed else ''
+                    row[f'{metric}_std'] = values['std'][year] if observed else ''
+                    row[f'{metric}_ci'] = values['half_width'][year] if observed else ''
+                writer.writerow(row)
+
+def validate_mean_field(config: SimulationConfig, reference: str = 'vectorized', replicas: int = 3) -> Dict:
+    """以逐个修士模拟为基准，评估均场引擎的误差
+    
+    用由根种子spawn出的replicas个独立随机流运行基准引擎，取逐年均值作为基准，与均场引擎的结果
+    比较。各指标给出逐年平均绝对误差、相对误差（平均绝对误差/基准均值）、末年取值，以及基准
+    副本间的逐年标准差均值（随机波动的量级，误差小于它时近似已足够），另给出两种引擎的耗时。
+    """
+    if reference not in ENGINES or reference in APPROXIMATE_ENGINES:
+        raise ValueError(f"基准引擎必须是逐个修士模拟的引擎: {reference}")
+    if replicas < 1:
+        raise ValueError("基准副本数必须大于0")
+    
+    def statistics_matrix(engine: str, rng: RandomStreams = None) -> np.ndarray:
+        world = run_headless(config, engine, rng)
+        try:
+            return MonteCarloEnsemble.statistics_matrix(world.statistics)
+        finally:
+            world.close()
+    
+    start = time.perf_counter()
+    samples = [statistics_matrix(reference, rng) for rng in config.rng.spawn(replicas)]
+    reference_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    approximate = statistics_matrix('meanfield')
+    approximate_seconds = time.perf_counter() - start
+    
+    # 开启均衡检测并在均衡后结束时，各次运行的年数可能不同，只比较共同的年份
+    years = min([len(approximate)] + [len(sample) for sample in samples])
+    samples = np.array([sample[:years] for sample in samples])
+    approximate = approximate[:years]
+    # 稀疏采样未统计的年份为NaN，不参与比较
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        expected = np.nanmean(samples, axis=0)
+        noise = (np.nanmean(np.nanstd(samples, axis=0, ddof=1), axis=0) if replicas > 1
+                 else np.full(expected.shape[1], np.nan))
+        errors = np.nanmean(np.abs(approximate - expected), axis=0)
+        scale = np.nanmean(np.abs(expected), axis=0)
+    
+    metrics = {}
+    for i, metric in enumerate(MonteCarloEnsemble.METRICS):
+        # 末年取两种引擎都有统计的最后一年
+        observed = np.flatnonzero(~np.isnan(expected[:, i]) & ~np.isnan(approximate[:, i]))
+        final = observed[-1] if len(observed) else None
+        metrics[metric] = {
+            'mean_absolute_error': float(errors[i]),
+            'relative_error': float(errors[i] / scale[i]) if scale[i] > 0 else None,
+            'reference_noise': float(noise[i]),
+            'final_reference': float(expected[final, i]) if final is not None else None,
+            'final_meanfield': float(approximate[final, i]) if final is not None else None,
+        }
+    return {
+        'reference': reference,
+        'replicas': replicas,
+        'years': years,
+        'metrics': metrics,
+        'seconds': {'reference': reference_seconds / replicas, 'meanfield': approximate_seconds},
+    }
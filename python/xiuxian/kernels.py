@@ -0,0 +1,114 @@
+"""numba编译内核（numba为可选依赖，由引擎在使用编译内核时按需导入本模块）"""
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # numba为可选依赖，未安装时使用原有的纯Python实现
+    numba = None
+
+# 是否可以使用numba编译的内核
+JIT_AVAILABLE = numba is not None
+
+def jit_kernel(func):
+    """有numba时以nopython模式编译内核，否则原样返回（可按纯Python执行，用于校验）"""
+    if numba is None:
+        return func
+    return numba.njit(cache=True, nogil=True)(func)
+
+@jit_kernel
+def cultivate_kernel(points, ages, levels, max_lifespans, alive, thresholds, bonuses):
+    """逐个修士修炼一年（语义同VectorizedCultivationWorld.cultivate_all，单次遍历）"""
+    for i in range(len(alive)):
+        if alive[i]:
+            points[i] += 1
+            ages[i] += 1
+            # 检查是否寿元耗尽
+            if ages[i] >= max_lifespans[i]:
+                alive[i] = False
+            # 自动晋升（本年寿元耗尽者同样做晋升检查）
+            if points[i] >= thresholds[levels[i]]:
+                levels[i] += 1
+                max_lifespans[i] += bonuses[levels[i]]
+
+@jit_kernel
+def encounter_kernel(members, points, courages, defeats, battles, alive, draws,
+                     encounter_probability, absorption_rate, events):
+    """逐个结算同一等级内一年的相遇与战斗，返回战斗次数
+    
+    语义与逐个结算完全相同：members为该等级存活修士（按编号排序）的行号，draws为每人三个
+    随机数；同级存活修士以交换删除数组维护，抽取对手的映射同LiveMemberIndex.sample_other。
+    events非空时按顺序写入各场战斗（BattleLog.DTYPE记录，双方为成员下标，不含年份与等级）。
+    """
+    n = len(members)
+    # 取出该等级成员的各列（同级战斗只改写同级成员），结算后写回
+    member_points = points[members]
+    member_defeats = defeats[members]
+    member_battles = battles[members]
+    member_alive = alive[members]
+    live = np.arange(n)       # 存活成员（成员下标），交换删除
+    positions = np.arange(n)  # 成员下标 -> 在live中的位置
+    fights, _ = encounter_range_kernel(live, positions, n, 0, member_points, courages[members], member_defeats,
+                                       member_battles, member_alive, draws, encounter_probability, absorption_rate,
+                                       events)
+    points[members] = member_points
+    defeats[members] = member_defeats
+    battles[members] = member_battles
+    alive[members] = member_alive
+    return fights
+
+@jit_kernel
+def encounter_range_kernel(live, positions, live_count, start, points, courages, defeats, battles, alive, draws,
+                           encounter_probability, absorption_rate, events):
+    """逐个结算第start名起的len(draws)名成员的相遇与战斗，返回(战斗次数, 剩余存活成员数)
+    
+    各列均按成员下标索引（只含同一等级的成员）。live、positions与live_count为同级存活成员的
+    交换删除数组及其长度，在分批结算之间保留，依次结算全部批次与一次结算整个等级的结果完全相同。
+    events非空（至少len(draws)条）时把第k场战斗写入第k条（BattleLog.DTYPE记录，双方为成员下标，不含年份与等级）。
+    """
+    fights = 0
+    for i in range(start, start + len(draws)):
+        if not alive[i]:
+            continue
+        d = i - start
+        if draws[d, 0] < encounter_probability and live_count > 1:
+            # 随机选择一个同级对手
+            pos = int(draws[d, 1] * (live_count - 1))
+            if pos >= positions[i]:
+                pos += 1
+            j = live[pos]
+            
+            # 判断是否发生战斗：勇气值 > 战败率（双方各按will_fight计算自己的败率）
+            total = points[i] + points[j]
+            win_rate = points[i] / total if total > 0 else 0.5
+            i_fights = courages[i] > 1 - win_rate
+            j_fights = courages[j] > 1 - (points[j] / total if total > 0 else 0.5)
+            if i_fights or j_fights:
+                if draws[d, 2] < win_rate:
+                    winner, loser = i, j
+                else:
+                    winner, loser = j, i
+                absorbed = int(points[loser] * absorption_rate)
+                if len(events) > 0:
+                    event = events[fights]
+                    event['initiator'] = i
+                    event['opponent'] = j
+                    event['initiator_points'] = points[i]
+                    event['opponent_points'] = points[j]
+                    # flags的各位同BattleLog：1发起者愿战，2对手愿战，4发起者获胜
+                    event['flags'] = (1 if i_fights else 0) + (2 if j_fights else 0) + (4 if winner == i else 0)
+                    event['absorbed'] = absorbed
+                fights += 1
+                points[winner] += absorbed
+                defeats[winner] += 1
+                battles[winner] += 1
+                battles[loser] += 1
+                alive[loser] = False
+                
+                # 移除败者：用末尾成员填补空位
+                pos = positions[loser]
+                live_count -= 1
+                last = live[live_count]
+                if pos < live_count:
+                    live[pos] = last
+                    positions[last] = pos
+    return fights, live_count
@@ -0,0 +1,167 @@
+"""分阶段计时与均衡检测"""
+import numpy as np
+from typing import List, Dict, Tuple, Optional
+from collections import deque
+from statistics import NormalDist
+
+from .core import CultivationLevel, SimulationConfig
+
+class PhaseProfiler:
+    """逐年分阶段计时器
+    
+    以perf_counter_ns记录simulate_year中各阶段（修炼、新增修士、相遇、埋葬、统计）的耗时，
+    按年累积，并据此估算每秒模拟年数、每秒处理修士数与剩余时间。
+    """
+    
+    PHASES = ('cultivate', 'intake', 'encounters', 'bury', 'statistics')
+    PHASE_NAMES = {
+        'cultivate': '修炼',
+        'intake': '新增修士',
+        'encounters': '相遇战斗',
+        'bury': '埋葬陨落',
+        'statistics': '记录统计',
+    }
+    
+    def __init__(self):
+        self.years: List[int] = []
+        self.populations: List[int] = []  # 每年统计时的修士数量
+        self.phase_ns: Dict[str, List[int]] = {phase: [] for phase in self.PHASES}
+    
+    def record_year(self, year: int, population: int, timings: Tuple[int, ...]):
+        """记录一年中各阶段的耗时（纳秒，顺序同PHASES）"""
+        self.years.append(year)
+        self.populations.append(population)
+        for phase, elapsed in zip(self.PHASES, timings):
+            self.phase_ns[phase].append(elapsed)
+    
+    def __len__(self):
+        return len(self.years)
+    
+    def get_totals(self) -> Dict[str, int]:
+        """各阶段累计耗时（纳秒）"""
+        return {phase: sum(values) for phase, values in self.phase_ns.items()}
+    
+    def get_throughput(self, last: int = None) -> Tuple[float, float]:
+        """最近last年（默认全部）的每秒模拟年数与每秒处理修士数（修士·年）"""
+        start = 0 if last is None else max(0, len(self.years) - last)
+        elapsed = sum(sum(values[start:]) for values in self.phase_ns.values()) / 1e9
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return (len(self.years) - start) / elapsed, sum(self.populations[start:]) / elapsed
+    
+    def get_report(self, remaining_years: int = 0, window: int = 10) -> str:
+        """分阶段耗时与吞吐量报告（吞吐量与剩余时间按最近window年估算）"""
+        totals = self.get_totals()
+        elapsed = sum(totals.values())
+        years_per_sec, cultivators_per_sec = self.get_throughput(window)
+        
+        year = self.years[-1] if self.years else 0
+        report = f"\n=== 第{year}年性能剖析 ===\n"
+        report += f"累计耗时: {elapsed / 1e9:.3f}秒, 模拟速度: {years_per_sec:.1f}年/秒, "
+        report += f"{cultivators_per_sec:.0f}修士/秒"
+        if remaining_years > 0 and years_per_sec > 0:
+            report += f", 预计剩余: {remaining_years / years_per_sec:.1f}秒"
+        report += "\n"
+        for phase in self.PHASES:
+            share = totals[phase] / elapsed if elapsed > 0 else 0.0
+            report += f"  {self.PHASE_NAMES[phase]}: {totals[phase] / 1e9:.3f}秒 ({share:.1%})\n"
+        return report
+
+class ConvergenceMonitor:
+    """统计均衡检测
+    
+    逐年接收统计行，比较最近两个长度为window的相邻窗口中各指标（总人数、战斗、陨落与各等级人数）：
+    means检验两窗口均值之差、welch检验均值之差的95%置信区间上界（Welch近似），trend检验两窗口
+    合并后线性趋势在2×window年内的变化量，全部指标都不超过tolerance × max(|均值|, 1)即为平稳。
+    连续patience年平稳时判定达到均衡，均衡年份为首次平稳时较早窗口的起始年。
+    
+    达到均衡后的处理方式：stop结束模拟；sparse继续模拟，但每sparse_interval年才完整统计一次，
+    其间各年的人口、等级分布与杀戮之王记为缺失（None，按列数组中sampled为False），战斗与陨落次数仍逐年记录。
+    """
+    
+    TESTS = ('means', 'welch', 'trend')
+    ACTIONS = ('stop', 'sparse')
+    
+    def __init__(self, window: int = 50, test: str = 'means', tolerance: float = 0.05, action: str = 'stop',
+                 sparse_interval: int = 10, patience: int = None):
+        if window < 2:
+            raise ValueError("均衡检测窗口至少为2年")
+        if test not in self.TESTS:
+            raise ValueError(f"未知的均衡检验: {test}")
+        if action not in self.ACTIONS:
+            raise ValueError(f"未知的均衡处理方式: {action}")
+        if tolerance <= 0:
+            raise ValueError("均衡容差必须大于0")
+        if sparse_interval < 1:
+            raise ValueError("稀疏采样间隔必须大于0")
+        self.window = window
+        self.test = test
+        self.tolerance = tolerance
+        self.action = action
+        self.sparse_interval = sparse_interval
+        self.patience = patience if patience is not None else max(1, window // 2)
+        self.history = deque(maxlen=2 * window)  # 最近2×window年的指标
+        self.passes = 0                          # 连续平稳的年数
+        self.candidate_year: Optional[int] = None
+        self.equilibrium_year: Optional[int] = None  # 均衡开始的年份
+        self.detected_year: Optional[int] = None     # 判定达到均衡的年份
+    
+    @classmethod
+    def from_config(cls, config: SimulationConfig) -> Optional['ConvergenceMonitor']:
+        """按配置创建检测器，未开启均衡检测（convergence_window为0）时返回None"""
+        if config.convergence_window <= 0:
+            return None
+        return cls(config.convergence_window, config.convergence_test, config.convergence_tolerance,
+                   config.convergence_action, config.sparse_interval)
+    
+    @staticmethod
+    def row_metrics(row: Dict) -> List[float]:
+        """一行统计中参与检验的指标"""
+        return ([row['total_cultivators'], row['battles'], row['deaths']]
+                + [row['level_distribution'][level.name] for level in CultivationLevel])
+    
+    @property
+    def converged(self) -> bool:
+        return self.equilibrium_year is not None
+    
+    def should_stop(self) -> bool:
+        """是否应结束模拟"""
+        return self.converged and self.action == 'stop'
+    
+    def is_sample_year(self, year: int) -> bool:
+        """本年是否完整统计（只有sparse方式在均衡后跳过）"""
+        if self.action != 'sparse' or not self.converged:
+            return True
+        return (year - self.detected_year) % self.sparse_interval == 0
+    
+    def observe(self, row: Dict):
+        """接收一年的统计"""
+        if self.converged:
+            return
+        self.history.append(self.row_metrics(row))
+        if len(self.history) < self.history.maxlen:
+            return
+        if self.is_stationary(np.array(self.history, dtype=np.float64)):
+            if self.passes == 0:
+                self.candidate_year = row['year'] - self.history.maxlen + 1
+            self.passes += 1
+            if self.passes >= self.patience:
+                self.equilibrium_year = self.candidate_year
+                self.detected_year = row['year']
+        else:
+            self.passes = 0
+    
+    def is_stationary(self, values: np.ndarray) -> bool:
+        """(2×window, 指标数)的窗口数据是否平稳"""
+        earlier, recent = values[:self.window], values[self.window:]
+        allowed = self.tolerance * np.maximum(np.abs(values.mean(axis=0)), 1.0)
+        if self.test == 'trend':
+            t = np.arange(len(values)) - (len(values) - 1) / 2
+            slope = t @ (values - values.mean(axis=0)) / (t @ t)
+            change = np.abs(slope) * len(values)
+        else:
+            change = np.abs(recent.mean(axis=0) - earlier.mean(axis=0))
+            if self.test == 'welch':
+                z = NormalDist().inv_cdf(0.975)
+                change += z * np.sqrt((earlier.var(axis=0, ddof=1) + recent.var(axis=0, ddof=1)) / self.window)
+        return bool(np.all(change <= allowed))
@@ -0,0 +1,480 @@
+"""逐等级增量统计、墓园与战斗日志"""
+import heapq
+import numpy as np
+from typing import List, Dict, Tuple, Optional
+import os
+import tempfile
+
+from .core import CultivationLevel, Cultivator
+
+class LevelAggregates:
+    """各等级存活修士的增量统计
+    
+    由修士的晋升、陨落、吸收修为以及世界新增修士时增量更新，使每年统计与状态报告
+    的开销只与等级数有关。所有存活修士每年修为与年龄各加1，因此以"修为-修炼年数"
+    和"年龄-修炼年数"保存，修炼本身无需逐个更新统计。最强修士与杀戮之王使用惰性
+    删除的堆维护，并列时取编号最小者（与按加入顺序取最大值一致）。
+    """
+    
+    def __init__(self):
+        n_levels = len(CultivationLevel)
+        self.tick = 0  # 已经历的修炼年数
+        self.counts = [0] * n_levels
+        self.courage_sums = [0.0] * n_levels
+        self.battle_sums = [0] * n_levels
+        self.max_lifespan_sums = [0] * n_levels
+        self.age_offset_sums = [0] * n_levels  # 年龄-修炼年数之和
+        self._alive_by_id: Dict[int, Cultivator] = {}
+        self._killer_heap: List[Tuple[int, int]] = []     # (-击败数, 编号)
+        self._strongest_heap: List[Tuple[int, int]] = []  # (-(修为-修炼年数), 编号)
+    
+    def advance_tick(self):
+        """所有存活修士修炼一年"""
+        self.tick += 1
+    
+    def _adjust(self, cultivator: Cultivator, v: int, sign: int):
+        """将修士计入（sign=1）或移出（sign=-1）等级下标为v的统计"""
+        self.counts[v] += sign
+        self.courage_sums[v] += sign * cultivator.courage
+        self.battle_sums[v] += sign * cultivator.battles_count
+        self.max_lifespan_sums[v] += sign * cultivator.max_lifespan
+        self.age_offset_sums[v] += sign * (cultivator.age - self.tick)
+    
+    def add(self, cultivator: Cultivator):
+        """新增存活修士"""
+        self._adjust(cultivator, cultivator.level_index, 1)
+        self._alive_by_id[cultivator.id] = cultivator
+        heapq.heappush(self._killer_heap, (-cultivator.defeats_count, cultivator.id))
+        heapq.heappush(self._strongest_heap, (self.tick - cultivator.cultivation_points, cultivator.id))
+    
+    def remove(self, cultivator: Cultivator):
+        """修士陨落（堆中条目惰性删除）"""
+        self._adjust(cultivator, cultivator.level_index, -1)
+        del self._alive_by_id[cultivator.id]
+    
+    def on_advance(self, cultivator: Cultivator, old: int, lifespan_bonus: int):
+        """修士晋升：将其统计从原等级（下标old）移到新等级"""
+        new = cultivator.level_index
+        self.counts[old] -= 1
+        self.counts[new] += 1
+        self.courage_sums[old] -= cultivator.courage
+        self.courage_sums[new] += cultivator.courage
+        self.battle_sums[old] -= cultivator.battles_count
+        self.battle_sums[new] += cultivator.battles_count
+        self.max_lifespan_sums[old] -= cultivator.max_lifespan - lifespan_bonus
+        self.max_lifespan_sums[new] += cultivator.max_lifespan
+        age_offset = cultivator.age - self.tick
+        self.age_offset_sums[old] -= age_offset
+        self.age_offset_sums[new] += age_offset
+    
+    def on_absorb(self, cultivator: Cultivator, absorbed: int):
+        """修士战胜并吸收修为"""
+        self.battle_sums[cultivator.level_index] += 1
+        heapq.heappush(self._killer_heap, (-cultivator.defeats_count, cultivator.id))
+        if absorbed:
+            heapq.heappush(self._strongest_heap, (self.tick - cultivator.cultivation_points, cultivator.id))
+    
+    def _peek(self, heap: List[Tuple[int, int]], key) -> Optional[Cultivator]:
+        """弹出过期条目后返回堆顶修士"""
+        # 过期条目过多时整体压缩，避免堆随累计出生人数无限增长
+        if len(heap) > 2 * len(self._alive_by_id) + 64:
+            latest = {}
+            for neg_key, cultivator_id in heap:
+                cultivator = self._alive_by_id.get(cultivator_id)
+                if cultivator is not None and neg_key == -key(cultivator):
+                    latest[cultivator_id] = neg_key
+            heap[:] = [(neg_key, cultivator_id) for cultivator_id, neg_key in latest.items()]
+            heapq.heapify(heap)
+        
+        while heap:
+            neg_key, cultivator_id = heap[0]
+            cultivator = self._alive_by_id.get(cultivator_id)
+            if cultivator is not None and neg_key == -key(cultivator):
+                return cultivator
+            heapq.heappop(heap)
+        return None
+    
+    def get_top_killer(self) -> Optional[Cultivator]:
+        """击败人数最多的存活修士"""
+        return self._peek(self._killer_heap, lambda c: c.defeats_count)
+    
+    def get_strongest(self) -> Optional[Cultivator]:
+        """修为最高的存活修士"""
+        return self._peek(self._strongest_heap, lambda c: c.cultivation_points - self.tick)
+    
+    def get_level_summaries(self) -> Dict[CultivationLevel, Tuple[int, float, float, float]]:
+        """各等级存活修士的(人数, 平均勇气, 平均战斗次数, 平均剩余寿元)"""
+        summaries = {}
+        for level in CultivationLevel:
+            v = level.value
+            count = self.counts[v]
+            if count > 0:
+                remaining = self.max_lifespan_sums[v] - self.age_offset_sums[v] - count * self.tick
+                summaries[level] = (count,
+                                    self.courage_sums[v] / count,
+                                    self.battle_sums[v] / count,
+                                    remaining / count)
+        return summaries
+
+class Graveyard:
+    """墓园：收纳每年从活跃集合中移出的陨落修士
+    
+    保存方式：
+    - full: 保留完整修士对象
+    - summary: 保留全部陨落修士的紧凑记录（编号、陨落年份、陨落时等级、击败数、修为）
+    - recent（默认）: 只保留最近capacity条紧凑记录，内存与检查点大小有上限
+    - discard: 不保留个体信息，只累计各等级陨落人数与击败总数
+    
+    各模式都累计各等级陨落人数与击败总数；full与summary的记录随模拟年数无限增长。
+    """
+    
+    MODES = ('full', 'summary', 'recent', 'discard')
+    RECORD_FIELDS = ('id', 'year', 'level', 'defeats', 'cultivation')
+    
+    def __init__(self, mode: str = 'recent', capacity: int = 100000):
+        if mode not in self.MODES:
+            raise ValueError(f"未知的墓园保存方式: {mode}")
+        if capacity < 0:
+            raise ValueError("墓园记录容量不能为负数")
+        self.mode = mode
+        self.capacity = capacity
+        self._record_count = 0  # 已保存（尚未裁剪）的记录条数
+        self.total_deaths = 0
+        self.deaths_by_level = [0] * len(CultivationLevel)
+        self.total_defeats = 0  # 陨落修士生前累计击败人数
+        self.cultivators: List[Cultivator] = []  # full模式下的完整修士对象
+        self._record_chunks = {field: [] for field in self.RECORD_FIELDS}
+    
+    def bury(self, year: int, ids, levels, defeats, cultivation, cultivators: List[Cultivator] = None):
+        """收纳一批陨落修士（按列传入，可为列表或NumPy数组）"""
+        levels = np.asarray(levels, dtype=np.int8)
+        defeats = np.asarray(defeats, dtype=np.int64)
+        if len(levels) == 0:
+            return
+        
+        self.total_deaths += len(levels)
+        for level, count in enumerate(np.bincount(levels, minlength=len(CultivationLevel))):
+            self.deaths_by_level[level] += int(count)
+        self.total_defeats += int(defeats.sum())
+        
+        if self.mode == 'full' and cultivators is not None:
+            self.cultivators.extend(cultivators)
+        if self.mode != 'discard':
+            columns = (np.asarray(ids, dtype=np.int64), np.full(len(levels), year, dtype=np.int64),
+                       levels, defeats, np.asarray(cultivation, dtype=np.int64))
+            for field, column in zip(self.RECORD_FIELDS, columns):
+                self._record_chunks[field].append(column)
+            self._record_count += len(levels)
+            # recent模式累积到容量的两倍时裁剪一次，均摊后每条记录只复制常数次
+            if self.mode == 'recent' and self._record_count > 2 * self.capacity:
+                self.get_records()
+    
+    def get_records(self) -> Dict[str, np.ndarray]:
+        """获取保存的陨落记录（按列，按陨落先后排列；recent模式为最近capacity条）"""
+        records = {}
+        for field, chunks in self._record_chunks.items():
+            records[field] = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+            if self.mode == 'recent':
+                records[field] = records[field][len(records[field]) - min(len(records[field]), self.capacity):].copy()
+            self._record_chunks[field] = [records[field]] if chunks else []
+        self._record_count = len(records['id'])
+        return records
+    
+    def export_state(self) -> Dict[str, np.ndarray]:
+        """导出墓园状态（full模式下只导出紧凑记录，不含完整修士对象）"""
+        state = {
+            'deaths_by_level': np.array(self.deaths_by_level, dtype=np.int64),
+            'total_defeats': np.array(self.total_defeats, dtype=np.int64),
+        }
+        for field, column in self.get_records().items():
+            state['record_' + field] = column
+        return state
+    
+    def restore_state(self, state: Dict[str, np.ndarray]):
+        """从导出的状态恢复墓园"""
+        self.deaths_by_level = state['deaths_by_level'].tolist()
+        self.total_deaths = sum(self.deaths_by_level)
+        self.total_defeats = int(state['total_defeats'])
+        self.cultivators = []
+        self._record_chunks = {field: [] for field in self.RECORD_FIELDS}
+        self._record_count = 0
+        if self.mode != 'discard' and len(state['record_id']) > 0:
+            for field in self.RECORD_FIELDS:
+                self._record_chunks[field].append(state['record_' + field])
+            self._record_count = len(state['record_id'])
+            if self.mode == 'recent':
+                self.get_records()
+
+class BattleLog:
+    """战斗事件日志（按需开启）
+    
+    每场战斗保存为一条定长记录（DTYPE，46字节）：年份、等级、发起者与对手编号、双方战前修为、
+    双方的战斗意愿与胜负（flags）以及胜者吸收的修为。记录写入预分配的环形缓冲区（编译内核直接
+    写入缓冲区），剩余空间不足时整块追加到磁盘文件，写入位置随即回到缓冲区开头，常驻内存只取决于
+    缓冲区大小；未指定文件时写入匿名临时文件（日志对象释放时自动删除，检查点中保存全部记录）。
+    查询按块扫描全部记录。
+    """
+    
+    DTYPE = np.dtype([('year', np.int32), ('level', np.int8), ('initiator', np.int64), ('opponent', np.int64),
+                      ('initiator_points', np.int64), ('opponent_points', np.int64), ('flags', np.uint8),
+                      ('absorbed', np.int64)])
+    # flags的各位（编译内核中以字面值写入）
+    INITIATOR_FIGHTS = 1  # 发起者愿意战斗
+    OPPONENT_FIGHTS = 2   # 对手愿意战斗
+    INITIATOR_WINS = 4    # 发起者获胜
+    # 以record上报的战斗为(k, 8)的数组（或元组列表），各列依次为：
+    # 发起者、对手、发起者修为、对手修为、发起者是否愿战、对手是否愿战、发起者是否获胜、吸收修为
+    EVENT_COLUMNS = 8
+    
+    def __init__(self, path: str = None, capacity: int = 65536):
+        if capacity <= 0:
+            raise ValueError("战斗日志缓冲区容量必须大于0")
+        self.path = path
+        self.capacity = capacity
+        self.buffer = np.empty(capacity, dtype=self.DTYPE)
+        self.size = 0     # 缓冲区中尚未写出的记录数
+        self.spilled = 0  # 已写出的记录数
+        self._file = None  # 写出记录的文件（未指定文件时为匿名临时文件，关闭日志时不关闭）
+        self._append = False  # 从检查点恢复或打开已有文件后以追加方式写入
+    
+    @classmethod
+    def open(cls, path: str, capacity: int = 65536) -> 'BattleLog':
+        """打开已写出的战斗日志文件，用于查询或继续追加"""
+        log = cls(path, capacity)
+        log.spilled = os.path.getsize(path) // cls.DTYPE.itemsize
+        log._append = True
+        return log
+    
+    def __len__(self) -> int:
+        return self.spilled + self.size
+    
+    @classmethod
+    def empty_events(cls) -> np.ndarray:
+        """不记录战斗时传给相遇内核的空记录数组"""
+        return np.empty(0, dtype=cls.DTYPE)
+    
+    def reserve(self, n: int) -> np.ndarray:
+        """返回缓冲区中可连续写入n条记录的空间（不足时先写出缓冲区，单批超过容量时扩大缓冲区），写入后以commit确认"""
+        if self.size + n > self.capacity:
+            self.flush()
+            if n > self.capacity:
+                self.capacity = n
+                self.buffer = np.empty(n, dtype=self.DTYPE)
+        return self.buffer[self.size:self.size + n]
+    
+    def commit(self, year: int, level: int, n: int, member_ids: np.ndarray = None):
+        """确认reserve得到的空间中已写入的前n条记录（某一等级本年的战斗，按发生顺序排列）
+        
+        member_ids非空时记录中的双方为下标，以member_ids换算为修士编号。
+        """
+        block = self.buffer[self.size:self.size + n]
+        block['year'] = year
+        block['level'] = level
+        if member_ids is not None:
+            block['initiator'] = member_ids[block['initiator']]
+            block['opponent'] = member_ids[block['opponent']]
+        self.size += n
+    
+    def record(self, year: int, level: int, events, member_ids: np.ndarray = None):
+        """追加某一等级本年的战斗（格式见EVENT_COLUMNS，按发生顺序排列），member_ids含义同commit"""
+        events = np.asarray(events, dtype=np.int64).reshape(-1, self.EVENT_COLUMNS)
+        block = self.reserve(len(events))
+        block['initiator'] = events[:, 0]
+        block['opponent'] = events[:, 1]
+        block['initiator_points'] = events[:, 2]
+        block['opponent_points'] = events[:, 3]
+        block['flags'] = (events[:, 4] * self.INITIATOR_FIGHTS + events[:, 5] * self.OPPONENT_FIGHTS
+                          + events[:, 6] * self.INITIATOR_WINS)
+        block['absorbed'] = events[:, 7]
+        self.commit(year, level, len(events), member_ids)
+    
+    def flush(self):
+        """把缓冲区中的记录整块写出，缓冲区随后从头复用"""
+        if self.size == 0:
+            return
+        if self._file is None:
+            if self.path is None:
+                self._file = tempfile.TemporaryFile(prefix='battle-log-')
+            else:
+                self._file = open(self.path, 'ab' if self._append else 'wb')
+        self.buffer[:self.size].tofile(self._file)
+        self._file.flush()
+        self.spilled += self.size
+        self.size = 0
+    
+    def close(self):
+        """写出剩余记录并关闭文件（之后仍可查询，再次写入时追加到文件末尾）"""
+        self.flush()
+        if self.path is not None and self._file is not None:
+            self._file.close()
+            self._file = None
+            self._append = True
+    
+    def chunks(self):
+        """按写入顺序逐块产出全部记录（磁盘上的记录按缓冲区大小分块读入）"""
+        if self.spilled > 0:
+            source = self.path if self.path is not None else self._file
+            records = np.memmap(source, dtype=self.DTYPE, mode='r', shape=(self.spilled,))
+            for start in range(0, self.spilled, self.capacity):
+                yield np.array(records[start:start + self.capacity])
+            del records
+        if self.size > 0:
+            yield self.buffer[:self.size].copy()
+    
+    def events(self) -> np.ndarray:
+        """全部记录（读入内存）"""
+        chunks = list(self.chunks())
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=self.DTYPE)
+    
+    def _select(self, predicate) -> np.ndarray:
+        """逐块筛选满足条件的记录"""
+        selected = [chunk[predicate(chunk)] for chunk in self.chunks()]
+        return np.concatenate(selected) if selected else np.empty(0, dtype=self.DTYPE)
+    
+    @classmethod
+    def winners(cls, events: np.ndarray) -> np.ndarray:
+        """各场战斗胜者的编号"""
+        return np.where(events['flags'] & cls.INITIATOR_WINS, events['initiator'], events['opponent'])
+    
+    @classmethod
+    def losers(cls, events: np.ndarray) -> np.ndarray:
+        """各场战斗败者（战死者）的编号"""
+        return np.where(events['flags'] & cls.INITIATOR_WINS, events['opponent'], events['initiator'])
+    
+    def kill_history(self, cultivator_id: int) -> np.ndarray:
+        """某修士击败对手的全部记录（按时间顺序）"""
+        return self._select(lambda chunk: self.winners(chunk) == cultivator_id)
+    
+    def death_record(self, cultivator_id: int) -> Optional[np.void]:
+        """某修士战死的记录，未战死（或不在日志中）时为None"""
+        records = self._select(lambda chunk: self.losers(chunk) == cultivator_id)
+        return records[0] if len(records) else None
+    
+    def kill_chain(self, cultivator_id: int, max_depth: int = None) -> List[np.ndarray]:
+        """击杀链：第0层为该修士击败对手的记录，第k层为第k-1层中的败者生前击败对手的记录
+        
+        败者的修为（含其生前吸收的修为）按吸收比率汇入胜者，各层记录即汇入该修士的修为来源。
+        """
+        layers = []
+        frontier = np.array([cultivator_id], dtype=np.int64)
+        while len(frontier) > 0 and (max_depth is None or len(layers) < max_depth):
+            layer = self._select(lambda chunk: np.isin(self.winners(chunk), frontier))
+            if len(layer) == 0:
+                break
+            layers.append(layer)
+            frontier = self.losers(layer)
+        return layers
+    
+    def replay(self, start_year: int = 1, end_year: int = None):
+        """按时间顺序重放，逐年产出(年份, 该年全部战斗记录)"""
+        pending = []
+        for chunk in self.chunks():
+            kept = chunk['year'] >= start_year
+            if end_year is not None:
+                kept &= chunk['year'] <= end_year
+            chunk = chunk[kept]
+            if len(chunk) == 0:
+                continue
+            for part in np.split(chunk, np.flatnonzero(np.diff(chunk['year'])) + 1):
+                if pending and pending[0]['year'][0] != part['year'][0]:
+                    yield int(pending[0]['year'][0]), np.concatenate(pending)
+                    pending = []
+                pending.append(part)
+        if pending:
+            yield int(pending[0]['year'][0]), np.concatenate(pending)
+    
+    def cultivation_flow(self, final_ids: np.ndarray = None, final_levels: np.ndarray = None) -> np.ndarray:
+        """修为在等级间的流动：flow[a, b]为在等级a的战斗中被吸收、随胜者最终到达等级b的修为总量
+        
+        胜者的最终等级取其在日志中出现过的最高等级，以及final_ids/final_levels（如陨落记录与
+        存活修士）中给出的等级中的较大者。
+        """
+        n_levels = len(CultivationLevel)
+        ids, levels = [], []
+        for chunk in self.chunks():
+            ids += [chunk['initiator'], chunk['opponent']]
+            levels += [chunk['level'], chunk['level']]
+        if final_ids is not None:
+            ids.append(np.asarray(final_ids, dtype=np.int64))
+            levels.append(np.asarray(final_levels))
+        flow = np.zeros((n_levels, n_levels), dtype=np.int64)
+        if not ids:
+            return flow
+        
+        # 每名修士的最终等级：按(编号, 等级)排序后取每个编号的最后一条
+        ids = np.concatenate(ids)
+        levels = np.concatenate(levels).astype(np.int64)
+        order = np.lexsort((levels, ids))
+        ids, levels = ids[order], levels[order]
+        last = np.append(ids[1:] != ids[:-1], True)
+        known_ids, known_levels = ids[last], levels[last]
+        for chunk in self.chunks():
+            destinations = known_levels[np.searchsorted(known_ids, self.winners(chunk))]
+            np.add.at(flow, (chunk['level'].astype(np.int64), destinations), chunk['absorbed'])
+        return flow
+    
+    def summary(self) -> Dict:
+        """日志概况：记录数、年份范围、各等级战斗数与吸收修为、战斗由哪一方促成"""
+        n_levels = len(CultivationLevel)
+        battles = np.zeros(n_levels, dtype=np.int64)
+        absorbed = np.zeros(n_levels, dtype=np.int64)
+        decisions = np.zeros(4, dtype=np.int64)  # 按(发起者意愿, 对手意愿)计数
+        initiator_wins = 0
+        first_year = last_year = None
+        for chunk in self.chunks():
+            levels = chunk['level'].astype(np.int64)
+            battles += np.bincount(levels, minlength=n_levels)
+            absorbed += np.bincount(levels, weights=chunk['absorbed'], minlength=n_levels).astype(np.int64)
+            decisions += np.bincount(chunk['flags'] & (self.INITIATOR_FIGHTS | self.OPPONENT_FIGHTS), minlength=4)
+            initiator_wins += int(np.count_nonzero(chunk['flags'] & self.INITIATOR_WINS))
+            first_year = int(chunk['year'][0]) if first_year is None else first_year
+            last_year = int(chunk['year'][-1])
+        return {
+            'records': len(self),
+            'first_year': first_year,
+            'last_year': last_year,
+            'battles_by_level': {level.name: int(battles[level.value]) for level in CultivationLevel},
+            'absorbed_by_level': {level.name: int(absorbed[level.value]) for level in CultivationLevel},
+            'initiator_only': int(decisions[self.INITIATOR_FIGHTS]),
+            'opponent_only': int(decisions[self.OPPONENT_FIGHTS]),
+            'both_willing': int(decisions[self.INITIATOR_FIGHTS | self.OPPONENT_FIGHTS]),
+            'initiator_wins': initiator_wins,
+        }
+    
+    @classmethod
+    def describe(cls, event: np.void) -> str:
+        """单场战斗的文字描述"""
+        initiator, opponent = int(event['initiator']), int(event['opponent'])
+        flags = int(event['flags'])
+        winner = initiator if flags & cls.INITIATOR_WINS else opponent
+        willing = {cls.INITIATOR_FIGHTS: '发起者求战', cls.OPPONENT_FIGHTS: '对手求战'}.get(
+            flags & (cls.INITIATOR_FIGHTS | cls.OPPONENT_FIGHTS), '双方皆愿战')
+        level_name = Cultivator.LEVEL_CONFIGS[Cultivator.LEVELS[int(event['level'])]].name
+        return (f"第{int(event['year'])}年 {level_name}期 修士{initiator}遇修士{opponent}"
+                f"（修为{int(event['initiator_points'])}对{int(event['opponent_points'])}，{willing}）："
+                f"修士{winner}胜，吸收{int(event['absorbed'])}点")
+    
+    def export_state(self) -> Dict[str, np.ndarray]:
+        """导出日志状态：写入指定文件的日志只记录路径与记录数，写入临时文件的日志导出全部记录"""
+        self.flush()
+        if self.path is not None:
+            return {'path': np.array(self.path), 'records': np.array(self.spilled), 'capacity': np.array(self.capacity)}
+        return {'events': self.events(), 'capacity': np.array(self.capacity)}
+    
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray]) -> 'BattleLog':
+        """由检查点中导出的状态重建日志，写入文件的日志截断到检查点位置后继续追加"""
+        if 'path' in state:
+            log = cls(str(state['path']), int(state['capacity']))
+            log.spilled = int(state['records'])
+            if os.path.exists(log.path):
+                os.truncate(log.path, log.spilled * cls.DTYPE.itemsize)
+            log._append = True
+        else:
+            log = cls(None, int(state['capacity']))
+            if len(state['events']) > 0:
+                log._file = tempfile.TemporaryFile(prefix='battle-log-')
+                state['events'].astype(cls.DTYPE).tofile(log._file)
+                log._file.flush()
+                log.spilled = len(state['events'])
+        return log
@@ -0,0 +1,241 @@
+"""分区世界：各区域由独立进程模拟，修士在区域间迁徙"""
+import numpy as np
+from typing import List, Dict, Tuple, Optional
+import multiprocessing
+
+from .core import CultivationLevel, Cultivator, SimulationConfig
+from .records import BattleLog
+from .sinks import StatisticsSink
+from .engines.base import CultivationWorld
+from .engines import ENGINES, create_world
+
+def _region_worker(conn, params: Dict, options: Dict, seed_sequence: np.random.SeedSequence, engine: str,
+                   region: int, regions: int):
+    """区域工作进程：持有一个区域世界，按父进程的指令逐年模拟并收发迁徙修士
+    
+    指令为(名称, 参数)：intake新增修士；step模拟一年并选出迁出修士；arrive并入迁入修士；
+    summary返回各等级概况、最强修士与杀戮之王；close退出。每条指令回复('ok', 结果)或('error', 信息)。
+    """
+    config = SimulationConfig.from_params(params, seed=seed_sequence, options=options)
+    world = create_world(config, engine)
+    # 各区域编号按区域数跨步分配，互不重叠
+    world.next_id = region + 1
+    world.id_stride = regions
+    
+    def record(cultivator):
+        if cultivator is None:
+            return None
+        return {'id': cultivator.id, 'age': cultivator.age, 'cultivation_points': cultivator.cultivation_points,
+                'level': cultivator.level_index, 'courage': cultivator.courage,
+                'max_lifespan': cultivator.max_lifespan, 'defeats': cultivator.defeats_count,
+                'battles': cultivator.battles_count, 'birth_year': cultivator.birth_year}
+    
+    while True:
+        command, payload = conn.recv()
+        if command == 'close':
+            break
+        try:
+            if command == 'intake':
+                world.add_new_cultivators()
+                result = None
+            elif command == 'step':
+                world.simulate_year()
+                result = {key: values[-1] for key, values in world.statistics.items()}
+                
+                # 每名存活修士以payload（迁徙率）的概率迁往其他区域（等概率选择目的地），只移出并送出迁徙修士
+                leaving = world.rng.random(sum(world.get_level_counts())) < payload
+                destinations = world.rng.integers(0, max(1, regions - 1), size=int(leaving.sum()))
+                emigrants = world.remove_population(leaving)
+                emigrants['destination'] = destinations + (destinations >= region)
+                result['emigrants'] = emigrants
+            elif command == 'arrive':
+                # 并入迁入修士，全部修士保持按编号排序
+                world.merge_population(payload)
+                result = None
+            elif command == 'summary':
+                result = {
+                    'levels': world.get_level_summaries(),
+                    'strongest': record(world.get_strongest()),
+                    'top_killer': record(world.get_top_killer()),
+                }
+            else:
+                raise ValueError(f"未知的区域指令: {command}")
+            conn.send(('ok', result))
+        except Exception as e:  # 将异常传回父进程
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+    conn.close()
+
+class RegionalWorld(CultivationWorld):
+    """分区修仙世界
+    
+    世界被划分为若干区域，每个区域是一个独立的世界（任选引擎），拥有自己的修士与每年新增
+    （总新增人数平均分配），由各自的工作进程模拟，相遇与战斗只发生在区域内部。每年模拟后，
+    各区域存活修士以migration_rate的概率迁往其他区域，迁徙修士以按列数组的形式在进程间传递。
+    世界的统计为各区域统计之和，杀戮之王与最强修士取全部区域中的最大者（并列时取编号最小者）。
+    各区域使用由根种子spawn出的独立随机流，相同种子与区域数的结果可复现。
+    """
+    
+    engine_name = 'regional'
+    
+    def __init__(self, config: SimulationConfig, regions: int, engine: str = 'object',
+                 migration_rate: float = 0.0, sink: StatisticsSink = None):
+        super().__init__(config, sink=sink)
+        if regions < 1:
+            raise ValueError("区域数必须大于0")
+        if self.monitor is not None and self.monitor.action == 'sparse':
+            raise ValueError("分区世界的均衡检测不支持稀疏采样")
+        if engine not in ENGINES:
+            raise ValueError(f"未知的模拟引擎: {engine}")
+        self.regions = regions
+        self.region_engine = engine
+        self.migration_rate = migration_rate
+        self._summary = None  # 本年各区域概况的缓存
+        
+        streams = self.random_streams.seed_sequence.spawn(regions)
+        self._connections = []
+        self._processes = []
+        for region in range(regions):
+            params = config.get_params()
+            params['convergence_window'] = 0  # 均衡检测针对整个世界的统计，由父进程进行
+            params['new_cultivators_per_year'] = (config.new_cultivators_per_year // regions
+                                                  + (region < config.new_cultivators_per_year % regions))
+            parent_conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_region_worker, daemon=True,
+                                              args=(child_conn, params, config.get_options(), streams[region], engine,
+                                                    region, regions))
+            process.start()
+            child_conn.close()
+            self._connections.append(parent_conn)
+            self._processes.append(process)
+    
+    def _broadcast(self, command: str, payloads: List = None) -> List:
+        """向全部区域发送指令并等待回复"""
+        for region, conn in enumerate(self._connections):
+            conn.send((command, payloads[region] if payloads is not None else None))
+        results = []
+        for region, conn in enumerate(self._connections):
+            status, result = conn.recv()
+            if status != 'ok':
+                raise RuntimeError(f"区域{region}模拟失败: {result}")
+            results.append(result)
+        return results
+    
+    def add_new_cultivators(self, count: int = None):
+        """各区域新增其份额的筑基修士"""
+        if count is not None:
+            raise ValueError("分区世界只能按各区域的每年新增人数添加修士")
+        self._broadcast('intake')
+        self._summary = None
+    
+    def simulate_year(self):
+        """模拟一年：各区域并行模拟，随后交换迁徙修士并合并统计"""
+        self.year += 1
+        rows = self._broadcast('step', [self.migration_rate] * self.regions)
+        
+        # 按目的地分发迁徙修士
+        emigrants = [row.pop('emigrants') for row in rows]
+        arrivals = []
+        for region in range(self.regions):
+            parts = [{field: column[group['destination'] == region] for field, column in group.items()
+                      if field != 'destination'} for group in emigrants]
+            arrivals.append({field: np.concatenate([part[field] for part in parts])
+                             for field in self.POPULATION_FIELDS})
+        self._broadcast('arrive', arrivals)
+        self._summary = None
+        
+        # 合并各区域统计
+        level_distribution = {level.name: sum(row['level_distribution'][level.name] for row in rows)
+                              for level in CultivationLevel}
+        top_killers = [row['top_killers'] for row in rows if row['top_killers'] is not None]
+        top_killer = min(top_killers, key=lambda k: (-k['defeats'], k['cultivator_id'])) if top_killers else None
+        if top_killer is not None:
+            top_killer = dict(top_killer, year=self.year)
+        self.record_row({
+            'year': self.year,
+            'total_cultivators': sum(row['total_cultivators'] for row in rows),
+            'battles': sum(row['battles'] for row in rows),
+            'deaths': sum(row['deaths'] for row in rows),
+            'level_distribution': level_distribution,
+            'top_killer': top_killer,
+        })
+    
+    def _get_summary(self) -> List[Dict]:
+        if self._summary is None:
+            self._summary = self._broadcast('summary')
+        return self._summary
+    
+    def _best(self, key: str, value_field: str) -> Optional[Cultivator]:
+        """全部区域中指定数值最大的修士（并列时取编号最小者）"""
+        records = [summary[key] for summary in self._get_summary() if summary[key] is not None]
+        if not records:
+            return None
+        best = min(records, key=lambda r: (-r[value_field], r['id']))
+        cultivator = Cultivator(best['id'], self.config, best['age'], best['courage'])
+        cultivator.cultivation_points = best['cultivation_points']
+        cultivator.level_index = best['level']
+        cultivator.max_lifespan = best['max_lifespan']
+        cultivator.defeats_count = best['defeats']
+        cultivator.battles_count = best['battles']
+        cultivator.birth_year = best['birth_year']
+        return cultivator
+    
+    def get_level_summaries(self) -> Dict[CultivationLevel, Tuple[int, float, float, float]]:
+        """合并各区域的(人数, 平均勇气, 平均战斗次数, 平均剩余寿元)"""
+        totals = {}
+        for summary in self._get_summary():
+            for level, (count, courage, battles, lifespan) in summary['levels'].items():
+                total = totals.setdefault(level, [0, 0.0, 0.0, 0.0])
+                total[0] += count
+                total[1] += count * courage
+                total[2] += count * battles
+                total[3] += count * lifespan
+        return {level: (count, courage / count, battles / count, lifespan / count)
+                for level, (count, courage, battles, lifespan) in sorted(totals.items(), key=lambda t: t[0].value)}
+    
+    def get_level_counts(self) -> List[int]:
+        """获取各等级存活修士数量（按等级值索引）"""
+        counts = [0] * len(CultivationLevel)
+        for level, summary in self.get_level_summaries().items():
+            counts[level.value] = summary[0]
+        return counts
+    
+    def get_strongest(self) -> Optional[Cultivator]:
+        """获取全部区域中修为最高的存活修士"""
+        return self._best('strongest', 'cultivation_points')
+    
+    def get_top_killer(self) -> Optional[Cultivator]:
+        """获取全部区域中击败人数最多的存活修士"""
+        return self._best('top_killer', 'defeats')
+    
+    # 修士保存在各区域工作进程中：不支持检查点与战斗日志（与均场引擎一样以ValueError拒绝）
+    
+    def export_population(self) -> Dict[str, np.ndarray]:
+        raise ValueError("分区世界不支持导出修士（不支持检查点）")
+    
+    def import_population(self, columns: Dict[str, np.ndarray]):
+        raise ValueError("分区世界不支持导入修士（不支持检查点）")
+    
+    def remove_population(self, selected: np.ndarray) -> Dict[str, np.ndarray]:
+        raise ValueError("分区世界的迁徙在各区域工作进程内进行，不支持直接移出修士")
+    
+    def merge_population(self, columns: Dict[str, np.ndarray]):
+        raise ValueError("分区世界的迁徙在各区域工作进程内进行，不支持直接并入修士")
+    
+    def enable_battle_log(self, path: str = None, capacity: int = 65536) -> BattleLog:
+        raise ValueError("分区世界不支持战斗日志")
+    
+    def close(self):
+        """结束各区域工作进程并关闭统计接收器（先取得最终概况，结束后仍可输出报告与绘图）"""
+        if self._connections:
+            self._get_summary()
+        for conn in self._connections:
+            try:
+                conn.send(('close', None))
+            except (BrokenPipeError, OSError):
+                pass
+            conn.close()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+        super().close()
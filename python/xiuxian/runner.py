@@ -0,0 +1,162 @@
+"""单次模拟的运行方式：演示、带进度的完整模拟与无界面运行"""
+from .core import CultivationLevel, Cultivator, RandomStreams, SimulationConfig
+from .sinks import StatisticsSink
+from .engines.base import CultivationWorld
+from .engines import create_world
+from .regional import RegionalWorld
+
+def run_demo(config: SimulationConfig):
+    """运行演示模式"""
+    print("=== 修仙世界模拟器演示 ===")
+    print(f"配置参数:")
+    print(f"- 模拟时长: {config.simulation_years}年")
+    print(f"- 修为吸取比率: {config.absorption_rate*100:.1f}%")
+    print(f"- 开始修炼年龄: 6-10岁正态分布（均值8岁）")
+    print(f"- 每年新增修士: {config.new_cultivators_per_year}人\n")
+    
+    # 分析修炼机制
+    print("=== 修炼机制分析 ===")
+    
+    # 创建几个测试修士
+    test_config = SimulationConfig()
+    cultivator1 = Cultivator(1, test_config)
+    cultivator1.cultivation_points = 50
+    cultivator1.level = CultivationLevel.ZHUJI
+    cultivator1.courage = 0.8  # 高勇气
+    
+    cultivator2 = Cultivator(2, test_config)
+    cultivator2.cultivation_points = 60
+    cultivator2.level = CultivationLevel.ZHUJI
+    cultivator2.courage = 0.3  # 低勇气
+    
+    print(f"修士1: 修为{cultivator1.cultivation_points}, 勇气{cultivator1.courage:.2f}, 击败{cultivator1.defeats_count}人")
+    print(f"修士2: 修为{cultivator2.cultivation_points}, 勇气{cultivator2.courage:.2f}, 击败{cultivator2.defeats_count}人")
+    
+    # 计算战斗概率
+    win_rate_1 = cultivator1.calculate_win_rate(cultivator2)
+    win_rate_2 = cultivator2.calculate_win_rate(cultivator1)
+    
+    print(f"\n如果相遇:")
+    print(f"修士1胜率: {win_rate_1:.2f}, 败率: {1-win_rate_1:.2f}")
+    print(f"修士2胜率: {win_rate_2:.2f}, 败率: {1-win_rate_2:.2f}")
+    
+    # 判断是否会战斗
+    will_fight_1 = cultivator1.will_fight(cultivator2)
+    will_fight_2 = cultivator2.will_fight(cultivator1)
+    
+    print(f"\n战斗意愿:")
+    print(f"修士1会战斗: {will_fight_1} (勇气{cultivator1.courage:.2f} > 败率{1-win_rate_1:.2f})")
+    print(f"修士2会战斗: {will_fight_2} (勇气{cultivator2.courage:.2f} > 败率{1-win_rate_2:.2f})")
+    
+    if will_fight_1 or will_fight_2:
+        print("\n结果: 将发生战斗!")
+        print(f"胜利者将吸收败者{config.absorption_rate*100:.1f}%的修为，并增加1次击败记录")
+    else:
+        print("\n结果: 双方都会退缩，无事发生")
+    
+    # 显示等级要求
+    print("\n=== 修炼等级要求 ===")
+    for level in CultivationLevel:
+        level_config = Cultivator.LEVEL_CONFIGS[level]
+        print(f"{level_config.name}期: 需要{level_config.required_cultivation}点修为, "
+              f"基础寿元{level_config.base_lifespan}年, 晋升奖励{level_config.lifespan_bonus}年")
+    
+    print("\n关键问题分析:")
+    print("- 修士开始修炼年龄为6-10岁（正态分布）")
+    print("- 筑基期修士寿元有限，必须通过战斗获得额外修为才能晋升")
+    print("- 每次战斗胜利都会记录击败人数，形成杀戮排行榜")
+    print("- 这解释了为什么修仙界充满杀戮和竞争")
+
+def run_simulation(config: SimulationConfig, show_progress: bool = True, engine: str = None,
+                   plot: bool = True, plot_output: str = None,
+                   checkpoint_path: str = None, checkpoint_interval: int = 0, resume_from: str = None,
+                   sink: StatisticsSink = None, profile: bool = False,
+                   regions: int = 1, migration_rate: float = 0.0,
+                   battle_log: str = None, battle_log_buffer: int = 65536):
+    """运行完整模拟
+    
+    指定checkpoint_path与checkpoint_interval时每隔若干年保存一次检查点；
+    指定resume_from时从检查点继续模拟（模拟参数与统计接收器以检查点为准，未指定引擎时沿用检查点的引擎）。
+    profile为True时记录各阶段耗时，定期输出性能剖析报告代替状态报告。
+    regions大于1时运行分区世界（见RegionalWorld），每个区域由一个工作进程模拟。
+    指定battle_log时把每场战斗记录到该文件（见BattleLog），结束时输出战斗日志报告；
+    检查点中已有战斗日志时沿用检查点的日志。
+    """
+    if resume_from is not None:
+        world = CultivationWorld.load_checkpoint(resume_from, engine, config.get_options())
+        config = world.config
+        print(f"\n=== 从第{world.year}年的检查点继续{config.simulation_years}年修仙世界模拟 ===")
+    else:
+        print(f"\n=== 开始{config.simulation_years}年修仙世界模拟 ===")
+        if regions > 1:
+            world = RegionalWorld(config, regions, engine or 'object', migration_rate, sink=sink)
+        else:
+            world = create_world(config, engine or 'object', sink=sink)
+        
+        # 初始化：添加第一批筑基修士（出生年份在加入时设置）
+        world.add_new_cultivators()
+    
+    if profile:
+        world.enable_profiling()
+    if battle_log is not None:
+        world.enable_battle_log(battle_log, battle_log_buffer)
+    
+    # 模拟指定年数
+    report_interval = max(1, config.simulation_years // 10)  # 每10%进度输出一次
+    
+    equilibrium_reported = world.equilibrium_year is not None
+    while not world.is_finished():
+        world.simulate_year()
+        year = world.year
+        
+        # 定期输出状态
+        if show_progress and year % report_interval == 0:
+            if profile:
+                print(world.profiler.get_report(config.simulation_years - year))
+            else:
+                print(world.get_status_report())
+        
+        if show_progress and not equilibrium_reported and world.equilibrium_year is not None:
+            equilibrium_reported = True
+            action = "结束模拟" if world.monitor.action == 'stop' else f"改为每{world.monitor.sparse_interval}年完整统计一次"
+            print(f"\n第{year}年检测到统计均衡（自第{world.equilibrium_year}年起），{action}")
+        
+        # 定期保存检查点
+        if checkpoint_path and checkpoint_interval > 0 and year % checkpoint_interval == 0:
+            world.save_checkpoint(checkpoint_path)
+    
+    world.close()
+    
+    # 显示最终统计
+    print("\n=== 模拟结束 ===")
+    if world.monitor is not None:
+        if world.equilibrium_year is not None:
+            print(f"均衡年份: 第{world.equilibrium_year}年（第{world.monitor.detected_year}年判定）")
+        else:
+            print("未检测到统计均衡")
+    print(world.get_status_report())
+    if profile:
+        print(world.profiler.get_report())
+    if world.battle_log is not None:
+        print(world.get_battle_log_report())
+    
+    # 绘制统计图表
+    if plot:
+        print("\n正在生成统计图表...")
+        world.plot_statistics(plot_output)
+        if plot_output is not None:
+            print(f"统计图表已保存到{plot_output}")
+    
+    return world
+
+def run_headless(config: SimulationConfig, engine: str = 'object', rng: RandomStreams = None) -> CultivationWorld:
+    """无界面运行完整模拟（不输出报告，不绘图），由调用者在使用结果后关闭世界；运行出错时关闭世界后抛出"""
+    world = create_world(config, engine, rng)
+    try:
+        world.add_new_cultivators()
+        while not world.is_finished():
+            world.simulate_year()
+    except BaseException:
+        world.close()
+        raise
+    return world
@@ -0,0 +1,494 @@
+"""本地模拟服务（asyncio，HTTP + WebSocket）"""
+import asyncio
+import base64
+import hashlib
+import numpy as np
+from typing import Dict, Tuple, Optional
+import json
+import threading
+
+from .core import CultivationLevel, Cultivator, SimulationConfig
+from .engines.base import CultivationWorld
+from .engines import ENGINES, create_world
+
+class SimulationSession:
+    """可控制的单次模拟：供模拟服务逐年推进并生成增量消息
+    
+    状态为idle（未开始）、running、paused或finished。start以给定参数新建世界，
+    reset丢弃当前世界回到idle。step推进一年并返回当年的增量（见year_delta）。
+    step通常在线程池中执行，读取世界的describe与history与之共用lock，不会读到模拟到一半的一年。
+    """
+    
+    STATES = ('idle', 'running', 'paused', 'finished')
+    
+    def __init__(self, config: SimulationConfig, engine: str = 'object'):
+        self.base_config = config
+        self.engine = engine
+        self.config: Optional[SimulationConfig] = None
+        self.world: Optional[CultivationWorld] = None
+        self.state = 'idle'
+        self.strongest_id = None
+        self.top_killer_id = None
+        self.lock = threading.RLock()
+    
+    def start(self, params: Dict = None, seed: int = None, engine: str = None):
+        """以给定模拟参数新建世界（未给出的参数沿用服务启动时的配置）"""
+        merged = self.base_config.get_params()
+        merged.update(params or {})
+        config = SimulationConfig.from_params(merged, seed=self.base_config.seed if seed is None else seed,
+                                              options=self.base_config.get_options())
+        engine = engine or self.engine
+        if engine not in ENGINES:
+            raise ValueError(f"未知的模拟引擎: {engine}")
+        if config.simulation_years <= 0:
+            raise ValueError("模拟时长必须大于0")
+        if not 0 < config.absorption_rate <= 1:
+            raise ValueError("修为吸取比率必须在0-1之间")
+        if engine == 'memmap' and config.encounter_mode != 'sequential':
+            raise ValueError("memmap引擎只支持逐个结算相遇")
+        with self.lock:
+            self.reset()
+            self.config = config
+            self.world = create_world(config, engine)
+            self.world.add_new_cultivators()
+            self.state = 'running'
+    
+    def reset(self):
+        """丢弃当前世界"""
+        with self.lock:
+            if self.world is not None:
+                self.world.close()
+            self.config = None
+            self.world = None
+            self.state = 'idle'
+            self.strongest_id = None
+            self.top_killer_id = None
+    
+    @property
+    def year(self) -> int:
+        return self.world.year if self.world is not None else 0
+    
+    def step(self) -> Dict:
+        """模拟一年，返回当年的增量"""
+        with self.lock:
+            self.world.simulate_year()
+            return self.year_delta()
+    
+    def is_complete(self) -> bool:
+        """是否已达到模拟时长（开启均衡检测并设置为均衡后结束时，达到均衡即完成）"""
+        return self.world is not None and self.world.is_finished()
+    
+    def year_delta(self) -> Dict:
+        """当年的增量消息
+        
+        字段固定：year、total_cultivators、battles、deaths、level_distribution（按等级值排列的人数）、
+        strongest与top_killer。最强修士与杀戮之王只在易主时给出{id, level, cultivation, defeats,
+        previous_id}，未变化时为null。
+        """
+        world = self.world
+        statistics = world.statistics
+        level_counts = [int(count) for count in world.get_level_counts()]
+        strongest = world.get_strongest()
+        top_killer = world.get_top_killer()
+        return {
+            'type': 'year',
+            'year': world.year,
+            'total_cultivators': sum(level_counts),
+            'battles': int(statistics['battles'][-1]),
+            'deaths': int(statistics['deaths'][-1]),
+            'level_distribution': level_counts,
+            'strongest': self._change('strongest_id', strongest),
+            'top_killer': self._change('top_killer_id', top_killer),
+        }
+    
+    def _change(self, attribute: str, cultivator: Optional[Cultivator]) -> Optional[Dict]:
+        """记录的修士易主时返回新修士的概况，否则返回None"""
+        current = cultivator.id if cultivator is not None else None
+        previous = getattr(self, attribute)
+        if current == previous:
+            return None
+        setattr(self, attribute, current)
+        if cultivator is None:
+            return {'id': None, 'previous_id': previous}
+        return {'id': int(cultivator.id), 'level': cultivator.level_index,
+                'cultivation': int(cultivator.cultivation_points), 'defeats': int(cultivator.defeats_count),
+                'previous_id': previous}
+    
+    def describe(self) -> Dict:
+        """当前状态消息（客户端连接时与每次状态变化时发送）"""
+        with self.lock:
+            return {
+                'type': 'state',
+                'state': self.state,
+                'year': self.year,
+                'engine': self.world.engine_name if self.world is not None else self.engine,
+                'equilibrium_year': self.world.equilibrium_year if self.world is not None else None,
+                'params': self.config.get_params() if self.config is not None else None,
+                'levels': [level.name for level in CultivationLevel],
+                'level_names': [Cultivator.LEVEL_CONFIGS[level].name for level in CultivationLevel],
+            }
+    
+    def history(self) -> Dict:
+        """已模拟各年的统计（按列），供中途连接的客户端补齐图表；稀疏采样未统计的年份为null"""
+        with self.lock:
+            if self.world is None:
+                return {'years': []}
+            statistics = self.world.statistics
+            return {
+                'years': list(range(1, len(statistics['total_cultivators']) + 1)),
+                'total_cultivators': [int(v) if v is not None else None for v in statistics['total_cultivators']],
+                'battles': [int(v) for v in statistics['battles']],
+                'deaths': [int(v) for v in statistics['deaths']],
+                'level_distribution': [[int(dist[level.name]) for level in CultivationLevel]
+                                       if dist is not None else None
+                                       for dist in statistics['level_distribution']],
+            }
+
+class WebSocketClosed(Exception):
+    """WebSocket连接已关闭"""
+
+class WebSocketConnection:
+    """服务端WebSocket连接（RFC 6455，仅文本帧）
+    
+    握手由HTTP处理函数完成。客户端发来的帧必须带掩码，分片消息在此拼接；
+    ping自动回复pong，close回复close后抛出WebSocketClosed。
+    """
+    
+    GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+    MAX_MESSAGE = 1 << 20
+    
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.closed = False
+    
+    @classmethod
+    def accept_key(cls, key: str) -> str:
+        """由客户端的Sec-WebSocket-Key计算Sec-WebSocket-Accept"""
+        return base64.b64encode(hashlib.sha1((key + cls.GUID).encode('ascii')).digest()).decode('ascii')
+    
+    async def _write_frame(self, opcode: int, payload: bytes):
+        length = len(payload)
+        if length < 126:
+            header = bytes((0x80 | opcode, length))
+        elif length < 1 << 16:
+            header = bytes((0x80 | opcode, 126)) + length.to_bytes(2, 'big')
+        else:
+            header = bytes((0x80 | opcode, 127)) + length.to_bytes(8, 'big')
+        self.writer.write(header + payload)
+        # drain在发送缓冲区超过高水位时等待，慢客户端由此向发送方施加背压
+        await self.writer.drain()
+    
+    async def send(self, message: Dict):
+        """发送一条JSON文本消息"""
+        if self.closed:
+            raise WebSocketClosed()
+        await self._write_frame(0x1, json.dumps(message, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    
+    async def receive(self) -> str:
+        """接收一条文本消息"""
+        fragments = []
+        while True:
+            try:
+                head = await self.reader.readexactly(2)
+                length = head[1] & 0x7F
+                if length == 126:
+                    length = int.from_bytes(await self.reader.readexactly(2), 'big')
+                elif length == 127:
+                    length = int.from_bytes(await self.reader.readexactly(8), 'big')
+                if not head[1] & 0x80 or length > self.MAX_MESSAGE:
+                    await self.close(1002 if not head[1] & 0x80 else 1009)
+                    raise WebSocketClosed()
+                mask = await self.reader.readexactly(4)
+                payload = await self.reader.readexactly(length)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                self.closed = True
+                raise WebSocketClosed()
+            payload = (np.frombuffer(payload, dtype=np.uint8)
+                       ^ np.resize(np.frombuffer(mask, dtype=np.uint8), length)).tobytes()
+            opcode = head[0] & 0x0F
+            if opcode == 0x8:
+                await self.close()
+                raise WebSocketClosed()
+            if opcode == 0x9:
+                await self._write_frame(0xA, payload)
+                continue
+            if opcode == 0xA:
+                continue
+            fragments.append(payload)
+            if sum(len(fragment) for fragment in fragments) > self.MAX_MESSAGE:
+                await self.close(1009)
+                raise WebSocketClosed()
+            if head[0] & 0x80:
+                return b''.join(fragments).decode('utf-8')
+    
+    async def close(self, code: int = 1000):
+        """发送close帧并关闭连接"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self._write_frame(0x8, code.to_bytes(2, 'big'))
+        except ConnectionError:
+            pass
+        self.writer.close()
+
+class SimulationServer:
+    """本地模拟服务（asyncio，HTTP + WebSocket）
+    
+    服务持有一个SimulationSession，逐年推进并把增量广播给所有WebSocket客户端（/ws）。
+    命令为JSON：{"command": "start", "params": {...}, "seed": 1, "engine": "vectorized"}、
+    {"command": "pause"}、{"command": "resume"}、{"command": "reset"}，可经WebSocket发送，
+    也可POST到/command。GET /state返回当前状态，GET /history返回已模拟各年的统计。
+    
+    背压：每个客户端有一个发送队列，由各自的发送任务写出并等待drain（发送缓冲区满时等待）。
+    任一客户端积压的消息达到max_lag条时模拟暂停推进，直到它跟上。浏览器会把收到的消息
+    全部缓存在内存中，传输层背压无法反映页面渲染的进度，因此客户端可经WebSocket发送
+    {"command": "ack", "year": N}确认已处理到第N年：发送过确认的客户端，模拟最多领先其
+    确认年份max_lag年。状态与错误消息直接入队，命令不会因慢客户端而阻塞。
+    每年的模拟在线程池中执行，事件循环在模拟期间仍能响应命令；状态与历史也在线程池中读取，
+    等待会话锁时不阻塞事件循环。
+    """
+    
+    def __init__(self, session: SimulationSession, host: str = '127.0.0.1', port: int = 8765,
+                 max_lag: int = 32):
+        if max_lag < 1:
+            raise ValueError("max_lag必须大于0")
+        self.session = session
+        self.host = host
+        self.port = port
+        self.max_lag = max_lag
+        self.clients: Dict[WebSocketConnection, asyncio.Queue] = {}
+        self.acks: Dict[WebSocketConnection, int] = {}  # 客户端确认已处理的年份
+        self._runner: Optional[asyncio.Task] = None
+        self._step: Optional[asyncio.Future] = None
+        self._resumed: Optional[asyncio.Event] = None
+        self._drained: Optional[asyncio.Event] = None
+        self._server = None
+        self._handlers: Dict[asyncio.Task, asyncio.StreamWriter] = {}  # 正在处理的连接
+    
+    async def start(self):
+        """开始监听"""
+        self._resumed = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+    
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+    
+    async def stop(self):
+        """停止模拟并关闭服务
+        
+        关闭全部连接并等待各连接的处理任务结束，不留下被事件循环取消的任务。
+        """
+        await self._stop_runner()
+        self.session.reset()
+        if self._server is not None:
+            self._server.close()
+        for connection in list(self.clients):
+            await connection.close(1001)
+        for writer in self._handlers.values():
+            writer.close()
+        if self._handlers:
+            await asyncio.wait(list(self._handlers))
+        if self._server is not None:
+            await self._server.wait_closed()
+    
+    async def _read(self, method):
+        """在线程池中读取会话状态（与模拟的一年共用会话锁）"""
+        return await asyncio.get_running_loop().run_in_executor(None, method)
+    
+    # ---- 命令 ----
+    
+    async def command(self, message: Dict) -> Dict:
+        """执行一条命令，返回执行后的状态消息；命令无效时抛出ValueError"""
+        if not isinstance(message, dict):
+            raise ValueError("命令必须是JSON对象")
+        name = message.get('command')
+        session = self.session
+        if name == 'start':
+            await self._stop_runner()
+            session.start(message.get('params'), message.get('seed'), message.get('engine'))
+            for connection in self.acks:
+                self.acks[connection] = 0
+            self._resumed.set()
+            self._runner = asyncio.get_running_loop().create_task(self._run())
+        elif name == 'pause':
+            if session.state != 'running':
+                raise ValueError(f"当前状态为{session.state}，无法暂停")
+            session.state = 'paused'
+            self._resumed.clear()
+        elif name == 'resume':
+            if session.state != 'paused':
+                raise ValueError(f"当前状态为{session.state}，无法继续")
+            session.state = 'running'
+            self._resumed.set()
+        elif name == 'reset':
+            await self._stop_runner()
+            session.reset()
+        else:
+            raise ValueError(f"未知的命令: {name}")
+        state = await self._read(session.describe)
+        self._broadcast(state)
+        return state
+    
+    async def _stop_runner(self):
+        """停止模拟任务，并等待线程池中正在模拟的一年结束"""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+        if self._step is not None:
+            try:
+                await self._step
+            except Exception:
+                pass
+            self._step = None
+        self._resumed.clear()
+    
+    async def _run(self):
+        """逐年模拟并广播增量，直到达到模拟时长"""
+        loop = asyncio.get_running_loop()
+        session = self.session
+        while not session.is_complete():
+            await self._resumed.wait()
+            while self._lagging():
+                self._drained.clear()
+                await self._drained.wait()
+            # shield保证取消模拟任务时线程池中的一年仍会完整结束，由_stop_runner等待
+            self._step = loop.run_in_executor(None, session.step)
+            delta = await asyncio.shield(self._step)
+            self._step = None
+            self._broadcast(delta)
+        session.state = 'finished'
+        self._broadcast(await self._read(session.describe))
+    
+    def _lagging(self) -> bool:
+        """是否有客户端落后过多（发送队列积压或确认年份落后达到max_lag）"""
+        year = self.session.year
+        return (any(queue.qsize() >= self.max_lag for queue in self.clients.values())
+                or any(year - acked >= self.max_lag for acked in self.acks.values()))
+    
+    def _broadcast(self, message: Dict):
+        """将消息放入每个客户端的发送队列"""
+        for queue in self.clients.values():
+            queue.put_nowait(message)
+    
+    # ---- 连接 ----
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个连接：解析HTTP请求，升级为WebSocket或返回JSON"""
+        task = asyncio.current_task()
+        self._handlers[task] = writer
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+            lines = head.decode('latin-1').split('\r\n')
+            method, path, _ = lines[0].split(' ', 2)
+            headers = {}
+            for line in lines[1:]:
+                if ':' in line:
+                    key, value = line.split(':', 1)
+                    headers[key.strip().lower()] = value.strip()
+            path = path.split('?', 1)[0]
+            if path == '/ws' and headers.get('upgrade', '').lower() == 'websocket':
+                await self._handle_websocket(reader, writer, headers)
+                return
+            body = b''
+            length = int(headers.get('content-length', 0))
+            if length:
+                body = await reader.readexactly(length)
+            status, payload = await self._handle_http(method, path, body)
+            await self._respond(writer, status, payload)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+            pass
+        finally:
+            del self._handlers[task]
+            writer.close()
+    
+    async def _handle_http(self, method: str, path: str, body: bytes) -> Tuple[str, Optional[Dict]]:
+        if method == 'OPTIONS':
+            return '204 No Content', None
+        if method == 'GET' and path == '/state':
+            return '200 OK', await self._read(self.session.describe)
+        if method == 'GET' and path == '/history':
+            return '200 OK', await self._read(self.session.history)
+        if method == 'POST' and path == '/command':
+            try:
+                return '200 OK', await self.command(json.loads(body or b'{}'))
+            except (ValueError, TypeError) as e:
+                return '400 Bad Request', {'type': 'error', 'message': str(e)}
+        return '404 Not Found', {'type': 'error', 'message': f"未知的请求: {method} {path}"}
+    
+    async def _respond(self, writer: asyncio.StreamWriter, status: str, payload: Optional[Dict]):
+        body = b'' if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        # 前端开发服务器运行在其他端口，允许跨域访问
+        writer.write((f"HTTP/1.1 {status}\r\n"
+                      "Content-Type: application/json; charset=utf-8\r\n"
+                      "Access-Control-Allow-Origin: *\r\n"
+                      "Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+                      "Access-Control-Allow-Headers: Content-Type\r\n"
+                      f"Content-Length: {len(body)}\r\n"
+                      "Connection: close\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+    
+    async def _handle_websocket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                                headers: Dict[str, str]):
+        key = headers.get('sec-websocket-key')
+        if not key:
+            await self._respond(writer, '400 Bad Request', {'type': 'error', 'message': "缺少Sec-WebSocket-Key"})
+            return
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\n"
+                      "Upgrade: websocket\r\n"
+                      "Connection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {WebSocketConnection.accept_key(key)}\r\n\r\n").encode('latin-1'))
+        await writer.drain()
+        
+        connection = WebSocketConnection(reader, writer)
+        queue = asyncio.Queue()
+        queue.put_nowait(await self._read(self.session.describe))
+        self.clients[connection] = queue
+        sender = asyncio.get_running_loop().create_task(self._send_loop(connection, queue))
+        try:
+            while not sender.done():
+                text = await connection.receive()
+                try:
+                    message = json.loads(text)
+                    if isinstance(message, dict) and message.get('command') == 'ack':
+                        self.acks[connection] = int(message['year'])
+                        self._drained.set()
+                    else:
+                        await self.command(message)
+                except KeyError:
+                    queue.put_nowait({'type': 'error', 'message': "ack命令缺少year"})
+                except (ValueError, TypeError) as e:
+                    queue.put_nowait({'type': 'error', 'message': str(e)})
+        except WebSocketClosed:
+            pass
+        finally:
+            # 移出客户端后通知模拟任务，避免它继续等待已断开客户端的队列
+            del self.clients[connection]
+            self.acks.pop(connection, None)
+            self._drained.set()
+            sender.cancel()
+            try:
+                await sender
+            except asyncio.CancelledError:
+                pass
+            await connection.close()
+    
+    async def _send_loop(self, connection: WebSocketConnection, queue: asyncio.Queue):
+        """逐条发送客户端队列中的消息"""
+        try:
+            while True:
+                message = await queue.get()
+                self._drained.set()
+                await connection.send(message)
+        except (WebSocketClosed, ConnectionError):
+            pass
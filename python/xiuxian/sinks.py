@@ -0,0 +1,396 @@
+"""逐年统计的列式表示与保存后端"""
+import numpy as np
+from typing import List, Dict, Tuple
+import csv
+import io
+import json
+import os
+
+from .core import CultivationLevel
+
+def empty_statistics() -> Dict:
+    """尚无任何年份的统计数据（按列表累积的结构）
+    
+    均衡后稀疏采样时，未完整统计的年份总人数、等级分布与杀戮之王均为None（缺失）。
+    """
+    return {
+        'total_cultivators': [],
+        'level_distribution': [],
+        'battles': [],
+        'deaths': [],
+        'top_killers': []  # 每年击败人数最多的修士
+    }
+
+def statistics_to_arrays(statistics: Dict) -> Dict[str, np.ndarray]:
+    """将统计数据转换为按列保存的数组
+    
+    杀戮之王缺失时编号记为-1；sampled列标记各年是否完整统计，未统计年份的总人数与等级分布记为0。
+    """
+    top_killers = statistics['top_killers']
+    sampled = [total is not None for total in statistics['total_cultivators']]
+    arrays = {
+        'sampled': np.array(sampled, dtype=bool),
+        'total_cultivators': np.array([total if total is not None else 0
+                                       for total in statistics['total_cultivators']], dtype=np.int64),
+        'battles': np.array(statistics['battles'], dtype=np.int64),
+        'deaths': np.array(statistics['deaths'], dtype=np.int64),
+        'level_distribution': np.array([[dist[level.name] if dist is not None else 0 for level in CultivationLevel]
+                                        for dist in statistics['level_distribution']],
+                                       dtype=np.int64).reshape(-1, len(CultivationLevel)),
+    }
+    for key, default in (('year', 0), ('cultivator_id', -1), ('defeats', 0), ('cultivation', 0)):
+        arrays['top_killer_' + key] = np.array([t[key] if t else default for t in top_killers], dtype=np.int64)
+    arrays['top_killer_level'] = np.array([CultivationLevel[t['level']].value if t else 0 for t in top_killers],
+                                          dtype=np.int8)
+    return arrays
+
+def decimate_minmax(values: np.ndarray, max_points: int = 1000) -> Tuple[np.ndarray, np.ndarray]:
+    """保形降采样：将序列等分为约max_points/2个桶，每桶保留最小值与最大值
+    
+    保留的点按原顺序排列，首尾点始终保留，因此尖峰与骤降不会被丢弃。返回(下标, 取值)。
+    max_points小于4时按4处理（至少两个桶，否则只剩首尾两点）。
+    """
+    max_points = max(4, max_points)
+    values = np.asarray(values)
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n), values
+    
+    bucket = -(-n // (max_points // 2))  # 每桶点数（向上取整）
+    padded = np.empty(-(-n // bucket) * bucket, dtype=np.float64)
+    padded[:n] = values
+    padded[n:] = values[-1]  # 以末尾值补齐最后一个桶，不会产生新的极值
+    buckets = padded.reshape(-1, bucket)
+    offsets = np.arange(0, len(padded), bucket)
+    lows = np.minimum(buckets.argmin(axis=1) + offsets, n - 1)
+    highs = np.minimum(buckets.argmax(axis=1) + offsets, n - 1)
+    indices = np.unique(np.concatenate([[0, n - 1], lows, highs]))
+    return indices, values[indices]
+
+def statistics_from_arrays(arrays: Dict[str, np.ndarray]) -> Dict:
+    """由按列保存的数组还原统计数据（没有sampled列时视为每年都完整统计）"""
+    sampled = arrays['sampled'].tolist() if 'sampled' in arrays else [True] * len(arrays['total_cultivators'])
+    statistics = {
+        'total_cultivators': [total if present else None
+                              for total, present in zip(arrays['total_cultivators'].tolist(), sampled)],
+        'level_distribution': [{level.name: count for level, count in zip(CultivationLevel, row)} if present else None
+                               for row, present in zip(arrays['level_distribution'].tolist(), sampled)],
+        'battles': arrays['battles'].tolist(),
+        'deaths': arrays['deaths'].tolist(),
+        'top_killers': [],
+    }
+    columns = zip(arrays['top_killer_year'].tolist(), arrays['top_killer_cultivator_id'].tolist(),
+                  arrays['top_killer_defeats'].tolist(), arrays['top_killer_level'].tolist(),
+                  arrays['top_killer_cultivation'].tolist())
+    for year, cultivator_id, defeats, level, cultivation in columns:
+        if cultivator_id < 0:
+            statistics['top_killers'].append(None)
+        else:
+            statistics['top_killers'].append({
+                'year': year,
+                'cultivator_id': cultivator_id,
+                'defeats': defeats,
+                'level': CultivationLevel(level).name,
+                'cultivation': cultivation
+            })
+    return statistics
+
+def statistics_rows(statistics: Dict):
+    """逐年生成统计行（与统计接收器接收的格式相同）"""
+    for i, total in enumerate(statistics['total_cultivators']):
+        yield {
+            'year': i + 1,
+            'total_cultivators': total,
+            'battles': statistics['battles'][i],
+            'deaths': statistics['deaths'][i],
+            'level_distribution': statistics['level_distribution'][i],
+            'top_killer': statistics['top_killers'][i],
+        }
+
+def flatten_row(row: Dict) -> Dict:
+    """将一行统计展开为扁平记录（等级分布与杀戮之王各占若干列）"""
+    flat = {
+        'year': row['year'],
+        'total_cultivators': row['total_cultivators'],
+        'battles': row['battles'],
+        'deaths': row['deaths'],
+    }
+    level_distribution = row['level_distribution']
+    flat.update({level.name: level_distribution[level.name] if level_distribution is not None else None
+                 for level in CultivationLevel})
+    top_killer = row['top_killer']
+    flat['top_killer_id'] = top_killer['cultivator_id'] if top_killer else None
+    flat['top_killer_defeats'] = top_killer['defeats'] if top_killer else 0
+    flat['top_killer_level'] = top_killer['level'] if top_killer else None
+    flat['top_killer_cultivation'] = top_killer['cultivation'] if top_killer else 0
+    return flat
+
+def unflatten_row(flat: Dict) -> Dict:
+    """由扁平记录还原一行统计（CSV读取的字符串会转换为整数，空值为缺失）"""
+    def value(field):
+        return int(flat[field]) if flat[field] not in (None, '') else None
+    
+    top_killer = None
+    if flat['top_killer_id'] not in (None, ''):
+        top_killer = {
+            'year': int(flat['year']),
+            'cultivator_id': int(flat['top_killer_id']),
+            'defeats': int(flat['top_killer_defeats']),
+            'level': flat['top_killer_level'],
+            'cultivation': int(flat['top_killer_cultivation'])
+        }
+    return {
+        'year': int(flat['year']),
+        'total_cultivators': value('total_cultivators'),
+        'battles': int(flat['battles']),
+        'deaths': int(flat['deaths']),
+        'level_distribution': ({level.name: value(level.name) for level in CultivationLevel}
+                               if flat[CultivationLevel(0).name] not in (None, '') else None),
+        'top_killer': top_killer,
+    }
+
+class StatisticsSink:
+    """统计数据接收器
+    
+    世界每年调用record写入一行统计：
+    {'year', 'total_cultivators', 'battles', 'deaths', 'level_distribution', 'top_killer'}。
+    get_statistics以原有的按列表累积的结构返回全部统计，供报告与绘图使用；
+    export_state/restore_state用于检查点。
+    """
+    
+    kind = None
+    
+    def record(self, row: Dict):
+        raise NotImplementedError
+    
+    def get_statistics(self) -> Dict:
+        raise NotImplementedError
+    
+    def get_arrays(self) -> Dict[str, np.ndarray]:
+        """以按列数组返回全部统计（格式同statistics_to_arrays）"""
+        return statistics_to_arrays(self.get_statistics())
+    
+    def __len__(self) -> int:
+        raise NotImplementedError
+    
+    def export_state(self) -> Dict[str, np.ndarray]:
+        raise NotImplementedError
+    
+    def restore_state(self, state: Dict[str, np.ndarray]):
+        raise NotImplementedError
+    
+    def close(self):
+        """结束写入"""
+    
+    @staticmethod
+    def create(kind: str, path: str = None) -> 'StatisticsSink':
+        """按类型创建统计接收器"""
+        if kind not in STATISTICS_SINKS:
+            raise ValueError(f"未知的统计接收器: {kind}")
+        sink_class = STATISTICS_SINKS[kind]
+        if issubclass(sink_class, StreamingSink):
+            if not path:
+                raise ValueError(f"统计接收器{kind}需要指定输出文件")
+            return sink_class(path)
+        return sink_class()
+    
+    @staticmethod
+    def from_state(kind: str, state: Dict[str, np.ndarray]) -> 'StatisticsSink':
+        """由检查点中导出的状态重建统计接收器"""
+        sink = StatisticsSink.create(kind, str(state['path']) if 'path' in state else None)
+        sink.restore_state(state)
+        return sink
+
+class ArraySink(StatisticsSink):
+    """列式统计接收器：以预分配、按需倍增的NumPy数组保存，每年不产生Python对象"""
+    
+    kind = 'array'
+    
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self.columns = statistics_to_arrays(empty_statistics())
+        self._reserve(capacity)
+    
+    def _reserve(self, capacity: int):
+        """确保各列至少可容纳capacity行"""
+        for key, column in self.columns.items():
+            if len(column) < capacity:
+                grown = np.zeros((capacity,) + column.shape[1:], dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                self.columns[key] = grown
+    
+    def record(self, row: Dict):
+        if self.size == len(self.columns['total_cultivators']):
+            self._reserve(max(1, 2 * self.size))
+        i = self.size
+        self.columns['battles'][i] = row['battles']
+        self.columns['deaths'][i] = row['deaths']
+        self.columns['sampled'][i] = row['total_cultivators'] is not None
+        if row['total_cultivators'] is not None:
+            self.columns['total_cultivators'][i] = row['total_cultivators']
+            level_distribution = row['level_distribution']
+            for level in CultivationLevel:
+                self.columns['level_distribution'][i, level.value] = level_distribution[level.name]
+        top_killer = row['top_killer']
+        if top_killer is None:
+            self.columns['top_killer_cultivator_id'][i] = -1
+        else:
+            self.columns['top_killer_year'][i] = top_killer['year']
+            self.columns['top_killer_cultivator_id'][i] = top_killer['cultivator_id']
+            self.columns['top_killer_defeats'][i] = top_killer['defeats']
+            self.columns['top_killer_level'][i] = CultivationLevel[top_killer['level']].value
+            self.columns['top_killer_cultivation'][i] = top_killer['cultivation']
+        self.size += 1
+    
+    def get_arrays(self) -> Dict[str, np.ndarray]:
+        """获取已记录部分的各列视图"""
+        return {key: column[:self.size] for key, column in self.columns.items()}
+    
+    def get_statistics(self) -> Dict:
+        return statistics_from_arrays(self.get_arrays())
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def export_state(self) -> Dict[str, np.ndarray]:
+        return self.get_arrays()
+    
+    def restore_state(self, state: Dict[str, np.ndarray]):
+        self.size = len(state['total_cultivators'])
+        self.columns = {key: np.array(column) for key, column in state.items()}
+        if 'sampled' not in self.columns:
+            self.columns['sampled'] = np.ones(self.size, dtype=bool)
+
+class MemorySink(ArraySink):
+    """内存统计接收器（默认）：与ArraySink一样按列保存，get_arrays直接返回列视图
+    
+    get_statistics返回原有的按列表累积的结构，只为上次调用之后新增的年份生成列表项。
+    """
+    
+    kind = 'memory'
+    
+    def __init__(self, capacity: int = 1024):
+        super().__init__(capacity)
+        self._statistics = empty_statistics()
+    
+    def get_statistics(self) -> Dict:
+        done = len(self._statistics['total_cultivators'])
+        if done < self.size:
+            added = statistics_from_arrays({key: column[done:self.size] for key, column in self.columns.items()})
+            for key, values in added.items():
+                self._statistics[key].extend(values)
+        return self._statistics
+    
+    def restore_state(self, state: Dict[str, np.ndarray]):
+        super().restore_state(state)
+        self._statistics = empty_statistics()
+
+class StreamingSink(StatisticsSink):
+    """流式统计接收器基类：逐行追加写入文件并立即刷新，内存占用恒定，外部工具可实时查看进度
+    
+    检查点只记录文件路径、已写行数与字节偏移；从检查点继续时将文件截断到该偏移后继续追加。
+    读回的统计缓存在内存中，再次读取时只解析上次读取之后追加的部分。
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self.offset = 0
+        self._file = None
+        self._append = False  # 从检查点恢复后以追加方式打开
+        self._parsed = MemorySink()  # 已从文件读回的统计
+        self._parsed_offset = 0      # 已读回部分在文件中的结束偏移
+    
+    def _encode(self, row: Dict) -> bytes:
+        raise NotImplementedError
+    
+    def _decode(self, f, at_start: bool) -> List[Dict]:
+        """解析f中的各行；at_start为False时f从文件中间（某一行的开头）开始"""
+        raise NotImplementedError
+    
+    def _read_appended(self) -> MemorySink:
+        """解析上次读取之后追加的行，返回累积读回的统计"""
+        if self._parsed_offset < self.offset:
+            with open(self.path, 'rb') as f:
+                f.seek(self._parsed_offset)
+                appended = io.BytesIO(f.read(self.offset - self._parsed_offset))
+            for row in self._decode(appended, self._parsed_offset == 0):
+                self._parsed.record(row)
+            self._parsed_offset = self.offset
+        return self._parsed
+    
+    def record(self, row: Dict):
+        if self._file is None:
+            self._file = open(self.path, 'ab' if self._append else 'wb')
+        self._file.write(self._encode(row))
+        self._file.flush()
+        self.offset = self._file.tell()
+        self.rows += 1
+    
+    def get_statistics(self) -> Dict:
+        """从文件读回全部统计（只解析新追加的行）"""
+        return self._read_appended().get_statistics()
+    
+    def get_arrays(self) -> Dict[str, np.ndarray]:
+        return self._read_appended().get_arrays()
+    
+    def __len__(self) -> int:
+        return self.rows
+    
+    def export_state(self) -> Dict[str, np.ndarray]:
+        return {'path': np.array(self.path), 'rows': np.array(self.rows), 'offset': np.array(self.offset)}
+    
+    def restore_state(self, state: Dict[str, np.ndarray]):
+        self.close()
+        self.path = str(state['path'])
+        self.rows = int(state['rows'])
+        self.offset = int(state['offset'])
+        os.truncate(self.path, self.offset)
+        self._append = True
+        self._parsed = MemorySink()
+        self._parsed_offset = 0
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._append = True
+
+class JsonlSink(StreamingSink):
+    """JSONL统计接收器：每年一行JSON"""
+    
+    kind = 'jsonl'
+    
+    def _encode(self, row: Dict) -> bytes:
+        return (json.dumps(row, ensure_ascii=False) + '\n').encode('utf-8')
+    
+    def _decode(self, f, at_start: bool) -> List[Dict]:
+        return [json.loads(line) for line in f]
+
+class CsvSink(StreamingSink):
+    """CSV统计接收器：每年一行扁平记录，等级分布与杀戮之王各占若干列"""
+    
+    kind = 'csv'
+    FIELDS = (['year', 'total_cultivators', 'battles', 'deaths'] + [level.name for level in CultivationLevel]
+              + ['top_killer_id', 'top_killer_defeats', 'top_killer_level', 'top_killer_cultivation'])
+    
+    def _encode(self, row: Dict) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=self.FIELDS)
+        if self.rows == 0:
+            writer.writeheader()
+        writer.writerow(flatten_row(row))
+        return buffer.getvalue().encode('utf-8')
+    
+    def _decode(self, f, at_start: bool) -> List[Dict]:
+        # 表头只在文件开头，从中间读起时按FIELDS解析
+        reader = csv.DictReader(io.TextIOWrapper(f, encoding='utf-8', newline=''),
+                                fieldnames=None if at_start else self.FIELDS)
+        return [unflatten_row(flat) for flat in reader]
+
+STATISTICS_SINKS = {
+    'memory': MemorySink,
+    'array': ArraySink,
+    'jsonl': JsonlSink,
+    'csv': CsvSink,
+}